@@ -2,9 +2,7 @@ import os
 import json
 import uuid
 import time
-import requests
 from typing import List, Dict, Optional
-from bs4 import BeautifulSoup
 import google.generativeai as genai
 from src.core.schema import KnowledgeBase, KnowledgeNode, Question, Difficulty, QuestionType
 from src.core.config import Config
@@ -17,17 +15,60 @@ import os
 import json
 import uuid
 import time
-import requests
-from typing import List, Dict, Optional
-from bs4 import BeautifulSoup
+import hashlib
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Callable, List, Dict, Optional
 import google.generativeai as genai
 from src.core.schema import KnowledgeBase, KnowledgeNode, Question, Difficulty, QuestionType
 from src.core.config import Config
+from src.core.kb_store import save_knowledge_base, load_knowledge_base
+from src.core.ingest_checkpoint import IngestCheckpoint
+from src.core.url_fetcher import UrlFetcher
+from src.core.retrieval import CorpusIndex, chunk_text
+from src.core.llm import generate_with_retry, stream_with_retry
+from src.core.json_stream import TreeLeafScanner
+from src.core.llm_cache import llm_cache
 
 # Configure Gemini
 if Config.get_api_key():
     genai.configure(api_key=Config.get_api_key())
 
+class IngestionCancelled(Exception):
+    """Raised inside load_topic once its cancel_event is set."""
+
+
+class SkeletonGenerationError(Exception):
+    """Raised when PASS 1 can't produce a topic structure (nothing is saved or checkpointed)."""
+
+
+# Root id of the one-node tree older versions saved when PASS 1 failed
+_FALLBACK_ROOT_ID = "root_fallback"
+
+
+class _LeafQueue:
+    """Leaf batches submitted for question generation. Shared by both passes so pass 1 can start pass 2 work early."""
+
+    def __init__(self, generate: Callable[[List[KnowledgeNode]], dict], workers: Optional[int] = None):
+        self._generate = generate
+        workers = workers or Config.INGEST_MAX_CONCURRENCY
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="leaf-gen")
+        self.futures: Dict[Future, List[KnowledgeNode]] = {}
+
+    def submit(self, batch: List[KnowledgeNode]):
+        self.futures[self._pool.submit(self._generate, batch)] = batch
+
+    def leaf_ids(self) -> set:
+        return {leaf.id for batch in self.futures.values() for leaf in batch}
+
+    def __enter__(self) -> "_LeafQueue":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # On errors, don't start batches nobody will collect
+        self._pool.shutdown(wait=True, cancel_futures=exc_type is not None)
+
+
 class IngestionAgent:
     """
     Responsible for ingesting content using a Two-Pass 'Architect -> Builder' approach.
@@ -35,9 +76,14 @@ class IngestionAgent:
     Pass 2: Generate questions for the leaf nodes (Content).
     """
 
-    def __init__(self, data_dir: str = "data/uploads"):
+    def __init__(self, data_dir: str = "data/uploads", use_cache: bool = Config.LLM_CACHE_ENABLED,
+                 db_dir: str = Config.KB_DB_DIR, checkpoint_dir: str = Config.INGEST_CHECKPOINT_DIR):
         self.data_dir = data_dir
+        self.db_dir = db_dir # Finished KBs; also where the previous KB is looked up for incremental re-ingestion
+        self.checkpoint_dir = checkpoint_dir
+        self.url_fetcher = UrlFetcher()
         self.model_name = Config.LLM_MODEL_NAME
+        self.use_cache = use_cache # Re-ingesting identical inputs replays responses from data/cache/llm
         
         # Initialize Model
         if Config.get_api_key():
@@ -47,14 +93,26 @@ class IngestionAgent:
              print("⚠️ IngestionAgent initialized without API Key. Real calls will fail.")
         
         self.node_map = {} 
-        self.usage_stats = {"input_tokens": 0, "output_tokens": 0, "calls": 0}
+        self.usage_stats = self._empty_stats()
+        self._stats_lock = threading.Lock() # Pass 2 updates usage_stats from worker threads
+
+        # Optional hooks for running as a background job
+        self.on_progress: Optional[Callable[[dict], None]] = None # Called with {"stage": ..., "usage": ..., ...}
+        self.cancel_event: Optional[threading.Event] = None      # Set it to stop load_topic at the next step
 
-    def load_topic(self, topic_name: str) -> KnowledgeBase:
+    def load_topic(self, topic_name: str, incremental: bool = True, resume: bool = True,
+                   save: bool = True) -> KnowledgeBase:
         """
         Main entry point.
+        With incremental=True and an existing KB in db_dir, only what changed is regenerated:
+        node ids (and so learner progress) are kept, and leaves whose sources are unchanged keep their questions.
+        Progress is checkpointed as it goes; with resume=True a crashed run continues from the
+        checkpoint and only retries leaves that are still missing questions.
+        With save=True the finished KB is written (atomically) to db_dir.
+        Raises SkeletonGenerationError if the structure can't be generated (retry later).
         """
         # Reset stats
-        self.usage_stats = {"input_tokens": 0, "output_tokens": 0, "calls": 0}
+        self.usage_stats = self._empty_stats()
         self.node_map = {}
         
         topic_path = os.path.join(self.data_dir, topic_name)
@@ -62,73 +120,119 @@ class IngestionAgent:
             raise FileNotFoundError(f"Topic directory not found: {topic_path}")
 
         print(f"📖 Scanning {topic_path}...")
-        context = self._load_raw_content(topic_path)
+        sources = self._load_sources(topic_path)
+        context = self._join_sources(sources)
+        source_hashes = {label: hashlib.sha256(text.encode("utf-8")).hexdigest() for label, text in sources.items()}
         print(f"🧠 Content loaded ({len(context)} chars).")
+        self._report("scanned", chars=len(context), sources=len(sources))
+        self._check_cancelled()
 
         start_time = time.time()
-        
-        # PASS 1: Generate Skeleton
-        print("🏗️  PASS 1: Architecting Structure (One-shot)...")
-        root_node = self._generate_full_skeleton(topic_name, context)
-        self.node_map[root_node.id] = root_node
-        
-        # PASS 2: Populate Questions
-        print("📝 PASS 2: Populating Content (Questions)...")
-        self._populate_leaves(root_node, context)
+        checkpoint = IngestCheckpoint(topic_name, self.checkpoint_dir)
+        corpus = CorpusIndex.from_sources(sources)
+        with _LeafQueue(lambda batch: self._generate_leaf_batch(batch, corpus)) as queue:
+            kb = checkpoint.load(source_hashes) if resume else None
+            if kb and kb.root.id == _FALLBACK_ROOT_ID:
+                # Checkpointed by an older version after a failed PASS 1: resuming would keep it forever
+                print("      🗑️  Checkpoint holds a fallback structure. Starting over.")
+                checkpoint.clear()
+                kb = None
+            if kb:
+                done = sum(1 for leaf in self._collect_leaves(kb.root) if any(leaf.questions.values()))
+                print(f"⏯️  Resuming from checkpoint ({done}/{len(self._collect_leaves(kb.root))} leaves already done).")
+            else:
+                previous = self._load_previous_kb(topic_name) if incremental else None
+                if previous and previous.root.id == _FALLBACK_ROOT_ID:
+                    print("🔁 Existing Knowledge Base is a fallback structure; rebuilding it.")
+                    previous = None
+                if previous and previous.source_hashes == source_hashes:
+                    missing = self._empty_leaves(previous.root)
+                    if not missing:
+                        print("✅ Sources unchanged since last ingestion. Reusing existing Knowledge Base.")
+                        return previous
+                    print(f"🔁 Sources unchanged; retrying {len(missing)} leaves without questions.")
+                    kb = previous
+                else:
+                    self._report("skeleton")
+                    kb = self._build_skeleton(topic_name, context, sources, source_hashes, previous, queue)
+                checkpoint.save_skeleton(kb)
+                self._check_cancelled()
+            self.node_map = kb.node_map
+
+            # PASS 2: Populate Questions (some may already be in flight from a streamed pass 1)
+            print("📝 PASS 2: Populating Content (Questions)...")
+            self._populate_leaves(kb.root, queue, on_batch_done=checkpoint.record_leaves)
         
         duration = time.time() - start_time
+        self._print_cost_summary(duration)
+
+        if save:
+            output_path = self._kb_path(topic_name)
+            save_knowledge_base(kb, output_path)
+            print(f"💾 Saved to {output_path}")
+            self._report("saved", kb_path=output_path)
+
+        missing = self._empty_leaves(kb.root)
+        if missing:
+            # Keep the checkpoint so the next run only pays for these
+            print(f"⚠️ {len(missing)} leaves have no questions ({[l.name for l in missing[:5]]}...). Re-run to retry them.")
+        else:
+            checkpoint.clear()
+        return kb
 
-        # Build KB
-        kb = KnowledgeBase(
+    def _build_skeleton(self, topic_name: str, context: str, sources: Dict[str, str],
+                        source_hashes: Dict[str, str], previous: Optional[KnowledgeBase],
+                        queue: Optional[_LeafQueue] = None) -> KnowledgeBase:
+        """PASS 1, reconciled against the previous KB (if any) for incremental re-ingestion."""
+        changed = None
+        if previous:
+            changed = {label for label in set(source_hashes) | set(previous.source_hashes)
+                       if source_hashes.get(label) != previous.source_hashes.get(label)}
+            print(f"🔁 Incremental re-ingestion: {len(changed)} changed source(s): {sorted(changed)}")
+
+        mode = "One-shot" if len(context) <= Config.SKELETON_WINDOW_CHARS else "Map-Reduce"
+        print(f"🏗️  PASS 1: Architecting Structure ({mode})...")
+        root_node = self._generate_full_skeleton(topic_name, context, sources, previous, queue)
+        if previous:
+            reused = self._reconcile_with_previous(root_node, previous, changed)
+            print(f"      ♻️  Kept questions for {reused} unchanged leaves.")
+
+        return KnowledgeBase(
             topic_name=topic_name,
             root=root_node,
-            node_map=self.node_map
+            node_map={n.id: n for n in self._walk(root_node)},
+            source_hashes=source_hashes
         )
-        
-        self._print_cost_summary(duration)
-        return kb
 
-    def _generate_full_skeleton(self, topic_name: str, context: str) -> KnowledgeNode:
+    def _generate_full_skeleton(self, topic_name: str, context: str, sources: Dict[str, str] = None,
+                                previous: Optional[KnowledgeBase] = None,
+                                queue: Optional[_LeafQueue] = None) -> KnowledgeNode:
         """
         Asks the LLM to plan the ENTIRE hierarchy in one go.
+        Corpora larger than Config.SKELETON_WINDOW_CHARS go through _map_reduce_skeleton instead
+        of being truncated. Given a queue (and no previous KB to reconcile with), the answer is
+        streamed and leaves are queued for questions as they arrive (see _stream_skeleton).
+        Each node is tagged with the source labels it draws on; a previous KB's outline is
+        offered so unchanged parts keep their names (and therefore their ids).
         """
-        prompt = f"""
-        You are a Senior Curriculum Architect. 
-        Create a hierarchical learning path for the topic: "{topic_name}".
-        
-        Output a Nested JSON Object representing the curriculum tree.
-        
-        Rules:
-        1. **Avoid Infinite Depth**: Max depth is {Config.MAX_HIERARCHY_DEPTH} (e.g. Topic -> Sub -> ... -> Leaf).
-        2. **Balanced Width**: Group related concepts logically ({Config.SUBTOPICS_PER_NODE[0]}-{Config.SUBTOPICS_PER_NODE[1]} items per group).
-        3. **Atomic Leaves**: The deepest nodes must be specific concepts testable by simple questions.
-        
-        JSON Structure:
-        {{
-            "name": "{topic_name}",
-            "description": "...",
-            "children": [
-                {{
-                    "name": "Sub Topic A",
-                    "description": "...",
-                    "children": [
-                        {{ "name": "Concept A1", "description": "...", "children": [] }},
-                        ...
-                    ]
-                }},
-                ...
-            ]
-        }}
-        
-        Content Reference:
-        {context[:80000]}
-        """
-        
+        sources = sources or {}
+        source_labels = list(sources)
+        streamed: Dict[str, KnowledgeNode] = {} # path -> leaf node already queued for questions
         try:
-            response = self._call_gemini_with_retry(prompt)
-            if not response: raise Exception("Failed to alert LLM")
-            
-            data = json.loads(response.text)
+            if sources and len(context) > Config.SKELETON_WINDOW_CHARS:
+                data = self._map_reduce_skeleton(topic_name, sources, previous)
+            else:
+                prompt = self._skeleton_prompt(topic_name, context[:Config.SKELETON_WINDOW_CHARS], source_labels, previous)
+                data = None
+                if queue is not None and previous is None and Config.SKELETON_STREAMING:
+                    try:
+                        data = self._stream_skeleton(prompt, source_labels, queue, streamed)
+                    except Exception as e:
+                        print(f"      ⚠️ Streaming structure generation failed ({e}). Retrying without streaming.")
+                if data is None:
+                    response = self._call_gemini_with_retry(prompt)
+                    if not response: raise Exception("Failed to alert LLM")
+                    data = json.loads(response.text)
             
             # Recursive helper to build KnowledgeNodes from JSON
             def build_node_recursive(data_dict, parent_path, parent_id):
@@ -137,6 +241,13 @@ class IngestionAgent:
                 
                 # Check if leaf (no children in JSON or empty children)
                 raw_children = data_dict.get("children", [])
+
+                # Leaves seen while streaming keep their node (and the questions being generated for it)
+                node = streamed.pop(current_path, None) if not raw_children else None
+                if node:
+                    node.parent_id = parent_id
+                    self.node_map[node.id] = node
+                    return node
                 
                 node = KnowledgeNode(
                     id=node_id,
@@ -145,7 +256,8 @@ class IngestionAgent:
                     path=current_path,
                     parent_id=parent_id,
                     is_leaf=(len(raw_children) == 0),
-                    children=[]
+                    children=[],
+                    sources=[src for src in data_dict.get("sources", []) if src in source_labels]
                 )
                 self.node_map[node_id] = node
                 
@@ -158,40 +270,439 @@ class IngestionAgent:
             return build_node_recursive(data, "", None)
 
         except Exception as e:
+            # No one-node stand-in: it would be saved, look up to date and never be rebuilt
             print(f"      ⚠️ Error in structure generation: {e}")
-            # Fallback root
-            fallback = KnowledgeNode(id="root_fallback", name=topic_name, description="Fallback", path=topic_name, is_leaf=True)
-            self.node_map[fallback.id] = fallback
-            return fallback
+            raise SkeletonGenerationError(f"Could not generate the structure of {topic_name}: {e}") from e
 
-    def _populate_leaves(self, node: KnowledgeNode, context: str):
+    def _stream_skeleton(self, prompt: str, source_labels: List[str], queue: _LeafQueue,
+                         streamed: Dict[str, KnowledgeNode]) -> dict:
         """
-        Traverses the tree. If it finds a LEAF, it generates questions.
+        One-shot skeleton, streamed. Each leaf is queued for question generation as soon as its
+        object is complete in the stream (consecutive siblings still share a batch, as in
+        _batch_siblings), so pass 2 overlaps pass 1. Queued leaves are recorded in `streamed`
+        by path for the final tree to reuse. Returns the parsed tree.
         """
-        if node.is_leaf:
-            print(f"      Generating questions for leaf: {node.name}")
-            node.questions = self._generate_leaf_questions(node, context)
-            return
-        
-        # Recurse
-        for child in node.children:
-            self._populate_leaves(child, context)
+        if not self.model: raise Exception("No model configured")
+        pending: List[KnowledgeNode] = []
+        pending_parent = [None]
 
-    def _generate_leaf_questions(self, node: KnowledgeNode, context: str) -> Dict[Difficulty, List[Question]]:
-        questions = {d: [] for d in Difficulty}
+        def flush():
+            if pending:
+                queue.submit(list(pending))
+                pending.clear()
+
+        def on_leaf(leaf: dict, ancestors: List[Optional[str]]):
+            if not leaf.get("name") or None in ancestors: return # Can't tell its path yet
+            parent_path = " > ".join(ancestors)
+            path = f"{parent_path} > {leaf['name']}" if parent_path else leaf["name"]
+            if path in streamed: return
+            if pending and (pending_parent[0] != parent_path or len(pending) >= Config.LEAF_BATCH_SIZE):
+                flush()
+            node = KnowledgeNode(
+                id=str(uuid.uuid4()),
+                name=leaf["name"],
+                description=leaf.get("description", ""),
+                path=path,
+                is_leaf=True,
+                sources=[src for src in leaf.get("sources", []) if src in source_labels]
+            )
+            streamed[path] = node
+            pending.append(node)
+            pending_parent[0] = parent_path
+
+        response = stream_with_retry(self.model, prompt, cache=llm_cache if self.use_cache else None)
+        scanner = TreeLeafScanner(on_leaf)
+        for fragment in response:
+            scanner.feed(fragment)
+        flush()
+        self._update_costs(response)
+        print(f"      ⚡ {len(streamed)} leaves were queued for questions while the structure streamed in.")
+        return json.loads(scanner.text)
+
+    def _skeleton_prompt(self, topic_name: str, content: str, source_labels: List[str],
+                         previous: Optional[KnowledgeBase] = None, excerpt: str = "") -> str:
+        previous_outline = ""
+        if previous:
+            previous_outline = f"""
+        Previous Curriculum (keep node names and structure unchanged wherever the content they cover is unchanged):
+        {json.dumps(self._outline(previous.root))}
+        """
+        return f"""
+        You are a Senior Curriculum Architect. 
+        Create a hierarchical learning path for the topic: "{topic_name}".
+        {excerpt}
+        Output a Nested JSON Object representing the curriculum tree.
+        
+        Rules:
+        1. **Avoid Infinite Depth**: Max depth is {Config.MAX_HIERARCHY_DEPTH} (e.g. Topic -> Sub -> ... -> Leaf).
+        2. **Balanced Width**: Group related concepts logically ({Config.SUBTOPICS_PER_NODE[0]}-{Config.SUBTOPICS_PER_NODE[1]} items per group).
+        3. **Atomic Leaves**: The deepest nodes must be specific concepts testable by simple questions.
+        4. **Sources**: Tag every node with the source labels (from {json.dumps(source_labels)}) whose content it covers.
         
+        JSON Structure:
+        {{
+            "name": "{topic_name}",
+            "description": "...",
+            "sources": ["FILE: ..."],
+            "children": [
+                {{
+                    "name": "Sub Topic A",
+                    "description": "...",
+                    "sources": ["FILE: ..."],
+                    "children": [
+                        {{ "name": "Concept A1", "description": "...", "sources": ["FILE: ..."], "children": [] }},
+                        ...
+                    ]
+                }},
+                ...
+            ]
+        }}
+        {previous_outline}
+        Content Reference:
+        {content}
+        """
+
+    def _map_reduce_skeleton(self, topic_name: str, sources: Dict[str, str],
+                             previous: Optional[KnowledgeBase] = None) -> dict:
+        """
+        Skeleton for corpora that don't fit one prompt.
+        Map: the corpus is cut into parts of ~Config.SKELETON_MAP_CHARS and each part gets its own
+        partial outline, in parallel. Reduce: one prompt merges the partial outlines into the final
+        tree. If the reduce call fails (or the outlines are too big for it), they are merged
+        deterministically instead.
+        """
+        parts = self._corpus_parts(sources, Config.SKELETON_MAP_CHARS)
+        print(f"      🗺️  Map: outlining {len(parts)} parts of the corpus...")
+
+        def outline_part(index: int, labels: List[str], content: str) -> Optional[dict]:
+            excerpt = f"""
+        NOTE: This is part {index + 1} of {len(parts)} of the material. Outline ONLY what this part covers;
+        the partial outlines will be merged afterwards, so use the plain topic name as the root.
+        """
+            response = self._call_gemini_with_retry(self._skeleton_prompt(topic_name, content, labels, excerpt=excerpt))
+            if not response: return None
+            data = json.loads(response.text)
+            return data if isinstance(data, dict) and data.get("name") else None
+
+        outlines = [None] * len(parts)
+        workers = max(1, min(Config.INGEST_MAX_CONCURRENCY, len(parts)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="skeleton-map") as pool:
+            futures = {pool.submit(outline_part, i, labels, content): i for i, (labels, content) in enumerate(parts)}
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    outlines[i] = future.result()
+                except Exception as e:
+                    print(f"      ⚠️ Outline for part {i + 1} failed: {e}")
+        outlines = [o for o in outlines if o]
+        if not outlines:
+            raise Exception("No partial outline could be generated")
+
+        print(f"      🧩 Reduce: merging {len(outlines)} partial outlines...")
+        merged = self._merge_outlines(topic_name, outlines)
+        outlines_json = json.dumps(outlines, ensure_ascii=False)
+        if len(outlines_json) <= Config.SKELETON_WINDOW_CHARS:
+            reduced = self._reduce_outlines(topic_name, outlines_json, list(sources), previous)
+            if reduced:
+                merged = reduced
+        # Whichever merge produced it, the final tree must respect both limits
+        self._cap_depth(merged, Config.MAX_HIERARCHY_DEPTH)
+        self._cap_width(merged, Config.MAX_HIERARCHY_DEPTH)
+        return merged
+
+    def _reduce_outlines(self, topic_name: str, outlines_json: str, source_labels: List[str],
+                         previous: Optional[KnowledgeBase]) -> Optional[dict]:
+        content = f"""
+        (Partial outlines, each generated from one part of the material - merge them into one tree.
+        Deduplicate overlapping subtopics, regroup where needed, keep every distinct concept,
+        and keep each node's "sources" as the union of the merged nodes' sources.)
+        {outlines_json}
+        """
+        response = self._call_gemini_with_retry(self._skeleton_prompt(topic_name, content, source_labels, previous))
+        try:
+            data = json.loads(response.text) if response else None
+        except ValueError:
+            data = None
+        if not (isinstance(data, dict) and data.get("name")):
+            print("      ⚠️ Reduce step failed. Falling back to a deterministic merge.")
+            return None
+        return data
+
+    def _corpus_parts(self, sources: Dict[str, str], part_chars: int) -> List[tuple]:
+        """Packs source chunks (with their headers) into parts of ~part_chars. Returns [(labels, content)]."""
+        parts, labels, content = [], [], ""
+        for label, text in sources.items():
+            for piece in chunk_text(text, part_chars):
+                block = f"\n--- {label} ---\n{piece}"
+                if content and len(content) + len(block) > part_chars:
+                    parts.append((labels, content))
+                    labels, content = [], ""
+                content += block
+                if label not in labels: labels.append(label)
+        if content:
+            parts.append((labels, content))
+        return parts
+
+    def _merge_outlines(self, topic_name: str, outlines: List[dict]) -> dict:
+        """Deterministic reduce: unions the outlines, merging same-named siblings (case-insensitive)."""
+        merged = {"name": topic_name, "description": "", "sources": [], "children": []}
+        for outline in outlines:
+            self._merge_outline_into(merged, outline)
+        return merged
+
+    def _merge_outline_into(self, target: dict, other: dict):
+        target["sources"] = list(dict.fromkeys(target["sources"] + list(other.get("sources") or [])))
+        if not target["description"]:
+            target["description"] = other.get("description", "")
+        by_name = {c["name"].strip().lower(): c for c in target["children"]}
+        for child in other.get("children") or []:
+            if not isinstance(child, dict) or not child.get("name"): continue
+            key = child["name"].strip().lower()
+            match = by_name.get(key)
+            if not match:
+                match = {"name": child["name"].strip(), "description": "", "sources": [], "children": []}
+                target["children"].append(match)
+                by_name[key] = match
+            self._merge_outline_into(match, child)
+
+    def _cap_width(self, node: dict, depth_left: int):
+        # Overfull groups are split into "Part n" subgroups, if the depth budget allows another level
+        # (depth wins: a node whose children already reach the depth limit stays wide)
+        children = node.get("children") or []
+        node["children"] = children
+        max_width = Config.SUBTOPICS_PER_NODE[1]
+        if len(children) > max_width and 2 + max(map(self._height, children)) <= depth_left:
+            size = -(-len(children) // max_width)
+            node["children"] = [
+                {"name": f"{node['name']} (Part {i // size + 1})", "description": node.get("description", ""),
+                 "sources": list(dict.fromkeys(s for c in children[i:i + size] for s in c.get("sources") or [])),
+                 "children": children[i:i + size]}
+                for i in range(0, len(children), size)
+            ]
+        for child in node["children"]:
+            self._cap_width(child, depth_left - 1)
+
+    def _height(self, node: dict) -> int:
+        children = node.get("children") or []
+        return 1 + max(map(self._height, children)) if children else 0
+
+    def _cap_depth(self, node: dict, depth_left: int):
+        # Max depth counts edges below the root; nodes at the limit become leaves
+        children = node.get("children") or []
+        if depth_left <= 0:
+            node["children"] = []
+            return
+        for child in children:
+            self._cap_depth(child, depth_left - 1)
+
+    def _populate_leaves(self, root: KnowledgeNode, queue: _LeafQueue,
+                         on_batch_done: Optional[Callable[[List[KnowledgeNode]], None]] = None):
+        """
+        Generates questions for every LEAF. Sibling leaves are grouped into batches of
+        Config.LEAF_BATCH_SIZE (one prompt each), and up to Config.INGEST_MAX_CONCURRENCY
+        batches run at a time. Each leaf's result is written back to its own node, so the
+        outcome doesn't depend on completion order, and one failing batch doesn't affect the others.
+        Each prompt carries only the corpus chunks retrieved for its leaves (see CorpusIndex).
+        Batches already in the queue (from a streamed pass 1) are waited for, not resubmitted.
+        on_batch_done is called (from this thread) with each finished batch, e.g. to checkpoint it.
+        """
+        # Leaves that already have questions (reused or checkpointed) or are in flight are skipped
+        in_flight = queue.leaf_ids()
+        leaves = [leaf for leaf in self._empty_leaves(root) if leaf.id not in in_flight]
+        for batch in self._batch_siblings(leaves, Config.LEAF_BATCH_SIZE):
+            queue.submit(batch)
+
+        total = sum(len(batch) for batch in queue.futures.values())
+        done = 0
+        self._report("questions", done=done, total=total)
+        for future in as_completed(list(queue.futures)):
+            batch = queue.futures.pop(future)
+            try:
+                results = future.result()
+            except Exception as e:
+                print(f"      ⚠️ Batch {[l.name for l in batch]} failed: {e}")
+                results = {}
+            for leaf in batch:
+                leaf.questions = results.get(leaf.id) or {d: [] for d in Difficulty}
+                done += 1
+                if leaf.id in results:
+                    print(f"      [{done}/{total}] Generated questions for leaf: {leaf.name}")
+                else:
+                    print(f"      [{done}/{total}] ⚠️ No questions for leaf: {leaf.name}")
+            if on_batch_done:
+                on_batch_done(batch)
+            self._report("questions", done=done, total=total)
+            self._check_cancelled()
+
+    def _collect_leaves(self, root: KnowledgeNode) -> List[KnowledgeNode]:
+        """Leaves in document order (DFS)."""
+        leaves = []
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if node.is_leaf:
+                leaves.append(node)
+            stack.extend(reversed(node.children))
+        return leaves
+
+    def _empty_leaves(self, root: KnowledgeNode) -> List[KnowledgeNode]:
+        return [leaf for leaf in self._collect_leaves(root) if not any(leaf.questions.values())]
+
+    def _walk(self, root: KnowledgeNode):
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def _outline(self, node: KnowledgeNode) -> dict:
+        """Names/sources only view of a tree, small enough to show the LLM."""
+        outline = {"name": node.name, "sources": node.sources}
+        if node.children:
+            outline["children"] = [self._outline(c) for c in node.children]
+        return outline
+
+    def _kb_path(self, topic_name: str) -> str:
+        return os.path.join(self.db_dir, f"{topic_name}.json")
+
+    def _load_previous_kb(self, topic_name: str) -> Optional[KnowledgeBase]:
+        path = self._kb_path(topic_name)
+        if not os.path.exists(path):
+            return None
+        try:
+            return load_knowledge_base(path)
+        except Exception as e:
+            print(f"      ⚠️ Could not read previous KB ({e}). Rebuilding from scratch.")
+            return None
+
+    def _reconcile_with_previous(self, root: KnowledgeNode, previous: KnowledgeBase, changed: set) -> int:
+        """
+        Matches new nodes to the previous KB by path. Matches keep their old id so session
+        progress stays attached; matching leaves also keep their questions unless one of their
+        sources changed. Returns how many leaves were reused.
+        """
+        old_by_path = {n.path: n for n in previous.node_map.values()}
+        used_ids = set()
+        reused = 0
+        for node in self._walk(root): # Parents come before children
+            old = old_by_path.get(node.path)
+            if old and old.id not in used_ids:
+                node.id = old.id
+                for child in node.children:
+                    child.parent_id = node.id
+            used_ids.add(node.id)
+
+            if not (node.is_leaf and old and old.is_leaf and any(old.questions.values())):
+                continue
+            node_sources = set(node.sources) | set(old.sources)
+            # Untagged leaves can't be attributed, so any change counts against them
+            affected = bool(node_sources & changed) if node_sources else bool(changed)
+            if not affected:
+                node.questions = old.questions
+                reused += 1
+        return reused
+
+    def _batch_siblings(self, leaves: List[KnowledgeNode], size: int) -> List[List[KnowledgeNode]]:
+        """Groups consecutive leaves sharing a parent into chunks of at most `size`."""
+        batches = []
+        for leaf in leaves:
+            last = batches[-1] if batches else None
+            if last and len(last) < size and last[0].parent_id == leaf.parent_id:
+                last.append(leaf)
+            else:
+                batches.append([leaf])
+        return batches
+
+    def _question_count_desc(self) -> str:
         # Build prompt counts dynamically from Config
         counts = Config.QUESTIONS_PER_LEAF
-        count_desc = f"- {counts.get('beginner', 2)} BEGINNER questions.\n" \
-                     f"- {counts.get('intermediate', 2)} INTERMEDIATE questions.\n" \
-                     f"- {counts.get('advanced', 1)} ADVANCED question."
+        return f"- {counts.get('beginner', 2)} BEGINNER questions.\n" \
+               f"- {counts.get('intermediate', 2)} INTERMEDIATE questions.\n" \
+               f"- {counts.get('advanced', 1)} ADVANCED question."
+
+    def _generate_leaf_batch(self, leaves: List[KnowledgeNode], corpus: CorpusIndex) -> Dict[str, Dict[Difficulty, List[Question]]]:
+        """
+        One prompt for several sibling leaves; the response is keyed per leaf.
+        Leaves missing from a response are split off and retried in smaller batches. If the
+        call itself failed (already retried by _call_gemini_with_retry), the batch is dropped:
+        splitting would only multiply the prompts sent to a failing or throttled API.
+        Returns leaf id -> question buckets.
+        """
+        if len(leaves) == 1:
+            questions = self._generate_leaf_questions(leaves[0], corpus)
+            return {leaves[0].id: questions} if any(questions.values()) else {}
+
+        keys = {str(i + 1): leaf for i, leaf in enumerate(leaves)}
+        context = corpus.context_for([self._leaf_query(leaf) for leaf in leaves])
+        concept_list = "\n".join(
+            f'        - "{key}": "{leaf.path}" ({leaf.description})' for key, leaf in keys.items()
+        )
+        prompt = f"""
+        Generate questions for EACH of these specific concepts (key: concept path):
+{concept_list}
+        
+        For EACH concept create:
+        {self._question_count_desc()}
+        
+        Output JSON, with one entry per concept key:
+        {{
+            "leaves": {{
+                "1": {{
+                    "questions": [
+                        {{
+                            "difficulty": "beginner" | "intermediate" | "advanced",
+                            "content": "Question text...",
+                            "options": ["A", "B", "C", "D"],
+                            "correct_answer": "A", 
+                            "explanation": "..."
+                        }}
+                    ]
+                }},
+                ...
+            }}
+        }}
+        
+        Each concept's questions must focus ONLY on valid sub-content relevant to that concept.
+        Context:
+        {context}
+        """
+        results = {}
+        response = self._call_gemini_with_retry(prompt)
+        if not response:
+            print(f"      ⚠️ Batch {[l.name for l in leaves]} failed; not splitting.")
+            return results
+        try:
+            data = json.loads(response.text).get("leaves", {})
+            for key, leaf in keys.items():
+                entry = data.get(key)
+                items = entry.get("questions", []) if isinstance(entry, dict) else []
+                if items:
+                    results[leaf.id] = self._parse_questions(items)
+        except Exception as e:
+            print(f"      ⚠️ Error parsing batch {[l.name for l in leaves]}: {e}")
+
+        missing = [leaf for leaf in leaves if leaf.id not in results]
+        if missing:
+            # Split and retry; halves keep one bad leaf from costing a full-size re-prompt
+            half = (len(missing) + 1) // 2
+            for part in (missing[:half], missing[half:]):
+                if part:
+                    results.update(self._generate_leaf_batch(part, corpus))
+        return results
 
+    def _leaf_query(self, node: KnowledgeNode) -> str:
+        return f"{node.path} {node.description}"
+
+    def _generate_leaf_questions(self, node: KnowledgeNode, corpus: CorpusIndex) -> Dict[Difficulty, List[Question]]:
+        questions = {d: [] for d in Difficulty}
+        context = corpus.context_for([self._leaf_query(node)])
+        
         prompt = f"""
         Generate questions for the specific concept: "{node.path}".
         Description: {node.description}
         
         Create:
-        {count_desc}
+        {self._question_count_desc()}
         
         Output JSON:
         {{
@@ -208,81 +719,88 @@ class IngestionAgent:
         
         Focus ONLY on valid sub-content relevant to: {node.name}
         Context:
-        {context[:30000]}
+        {context}
         """
         try:
             response = self._call_gemini_with_retry(prompt)
             if not response: return questions
 
             data = json.loads(response.text)
-            
-            for item in data.get("questions", []):
-                diff_str = item.get("difficulty", "beginner").lower()
-                try: diff_enum = Difficulty(diff_str)
-                except: diff_enum = Difficulty.BEGINNER
-                
-                q = Question(
-                    id=str(uuid.uuid4()),
-                    difficulty=diff_enum,
-                    type=QuestionType.MULTIPLE_CHOICE,
-                    content=item["content"],
-                    options=item.get("options", []),
-                    correct_answer=item.get("correct_answer", ""),
-                    explanation=item.get("explanation", ""),
-                    metadata={"generated_by": "gemini", "model": self.model_name}
-                )
-                questions[diff_enum].append(q)
-            return questions
+            return self._parse_questions(data.get("questions", []))
         except Exception as e:
             print(f"      ⚠️ Error generating questions for {node.name}: {e}")
             return questions
 
+    def _parse_questions(self, items: List[dict]) -> Dict[Difficulty, List[Question]]:
+        questions = {d: [] for d in Difficulty}
+        for item in items:
+            diff_str = item.get("difficulty", "beginner").lower()
+            try: diff_enum = Difficulty(diff_str)
+            except: diff_enum = Difficulty.BEGINNER
+            
+            q = Question(
+                id=str(uuid.uuid4()),
+                difficulty=diff_enum,
+                type=QuestionType.MULTIPLE_CHOICE,
+                content=item["content"],
+                options=item.get("options", []),
+                correct_answer=item.get("correct_answer", ""),
+                explanation=item.get("explanation", ""),
+                metadata={"generated_by": "gemini", "model": self.model_name}
+            )
+            questions[diff_enum].append(q)
+        return questions
+
     def _call_gemini_with_retry(self, prompt: str):
         """
-        Robust wrapper for API calls with Retries and Rate Limiting.
+        Robust wrapper for API calls: shared rate limiter, jittered retries, cost tracking.
+        Returns None if every attempt failed.
         """
         if not self.model: return None
-        
-        retries = Config.API_RETRY_COUNT
-        delay = Config.API_DELAY_SECONDS
-        
-        for attempt in range(retries + 1):
-            try:
-                response = self.model.generate_content(prompt, generation_config={"response_mime_type": "application/json"})
-                self._update_costs(response)
-                
-                # Success! Rate limit sleep
-                time.sleep(Config.API_DELAY_SECONDS)
-                return response
-                
-            except Exception as e:
-                is_last_attempt = (attempt == retries)
-                error_msg = str(e)
-                
-                # Check for 429
-                if "429" in error_msg:
-                    wait_time = Config.API_RETRY_DELAY_EXP ** (attempt + 1)
-                    print(f"      ⏳ Hit Rate Limit (429). Retrying in {wait_time}s... (Attempt {attempt+1}/{retries})")
-                    time.sleep(wait_time)
-                else:
-                    print(f"      ⚠️ API Error: {e}")
-                    if is_last_attempt: return None
-                    time.sleep(1) # Short wait for other errors
-        
-        return None
+
+        try:
+            response = generate_with_retry(self.model, prompt, cache=llm_cache if self.use_cache else None)
+        except Exception as e:
+            print(f"      ⚠️ API Error (giving up): {e}")
+            return None
+
+        self._update_costs(response)
+        return response
+
+    def _report(self, stage: str, **fields):
+        if self.on_progress:
+            with self._stats_lock:
+                usage = dict(self.usage_stats)
+            self.on_progress({"stage": stage, **fields, "usage": usage, "cost_usd": self._estimated_cost(usage)})
+
+    def _check_cancelled(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            print("🛑 Ingestion cancelled.")
+            raise IngestionCancelled()
+
+    @staticmethod
+    def _estimated_cost(usage: dict) -> float:
+        return (usage["input_tokens"] / 1_000_000) * Config.PRICE_PER_1M_INPUT_TOKENS \
+             + (usage["output_tokens"] / 1_000_000) * Config.PRICE_PER_1M_OUTPUT_TOKENS
+
+    @staticmethod
+    def _empty_stats() -> dict:
+        return {"input_tokens": 0, "output_tokens": 0, "calls": 0,
+                "cache_hits": 0, "cached_input_tokens": 0, "cached_output_tokens": 0}
 
     def _update_costs(self, response):
         try:
             if hasattr(response, 'usage_metadata'):
-                self.usage_stats["input_tokens"] += response.usage_metadata.prompt_token_count
-                self.usage_stats["output_tokens"] += response.usage_metadata.candidates_token_count
-                self.usage_stats["calls"] += 1
+                # Cache hits cost nothing; track them separately
+                prefix = "cached_" if getattr(response, "from_cache", False) else ""
+                with self._stats_lock:
+                    self.usage_stats[f"{prefix}input_tokens"] += response.usage_metadata.prompt_token_count
+                    self.usage_stats[f"{prefix}output_tokens"] += response.usage_metadata.candidates_token_count
+                    self.usage_stats["cache_hits" if prefix else "calls"] += 1
         except: pass
 
     def _print_cost_summary(self, duration: float):
-        in_cost = (self.usage_stats["input_tokens"] / 1_000_000) * Config.PRICE_PER_1M_INPUT_TOKENS
-        out_cost = (self.usage_stats["output_tokens"] / 1_000_000) * Config.PRICE_PER_1M_OUTPUT_TOKENS
-        total_cost = in_cost + out_cost
+        total_cost = self._estimated_cost(self.usage_stats)
         
         print("\n" + "="*50)
         print(f"💰 INGESTION COMPLETE in {duration:.2f}s")
@@ -291,35 +809,41 @@ class IngestionAgent:
         print(f"   Input Tokens:  {self.usage_stats['input_tokens']:,}")
         print(f"   Output Tokens: {self.usage_stats['output_tokens']:,}")
         print(f"   Est. Cost:     ${total_cost:.5f}")
+        if self.usage_stats["cache_hits"]:
+            saved = (self.usage_stats["cached_input_tokens"] / 1_000_000) * Config.PRICE_PER_1M_INPUT_TOKENS \
+                  + (self.usage_stats["cached_output_tokens"] / 1_000_000) * Config.PRICE_PER_1M_OUTPUT_TOKENS
+            print(f"   Cache Hits:    {self.usage_stats['cache_hits']} (saved ${saved:.5f})")
         print("="*50 + "\n")
     
     def _load_raw_content(self, topic_path: str) -> str:
-        buffer = ""
+        return self._join_sources(self._load_sources(topic_path))
+
+    def _load_sources(self, topic_path: str) -> Dict[str, str]:
+        """Source label (e.g. "FILE: intro.txt", "URL: https://...") -> text, in a stable order."""
+        sources = {}
         # 1. Files
         if os.path.exists(topic_path):
-            for f in os.listdir(topic_path):
+            for f in sorted(os.listdir(topic_path)):
                 if f.endswith(".txt") or f.endswith(".md"):
                     if f in ["links.txt", "urls.txt"]: continue
                     with open(os.path.join(topic_path, f), "r") as file:
-                        buffer += f"\n--- FILE: {f} ---\n{file.read()}"
+                        sources[f"FILE: {f}"] = file.read()
         # 2. URLs
         links = next((f for f in ["links.txt", "urls.txt"] if os.path.exists(os.path.join(topic_path, f))), None)
         if links:
             with open(os.path.join(topic_path, links), "r") as f:
                 urls = [l.strip() for l in f.readlines() if l.strip()]
-                for url in urls:
-                    buffer += f"\n--- URL: {url} ---\n{self._fetch_url_content(url)}"
-        return buffer
+            if urls:
+                print(f"🌐 Fetching {len(urls)} URLs...")
+            for url, text in self.url_fetcher.fetch_all(urls).items():
+                sources[f"URL: {url}"] = text
+        return sources
+
+    def _join_sources(self, sources: Dict[str, str]) -> str:
+        return "".join(f"\n--- {label} ---\n{text}" for label, text in sources.items())
 
     def _fetch_url_content(self, url: str) -> str:
-        try:
-            headers = {'User-Agent': 'Mozilla/5.0'}
-            resp = requests.get(url, headers=headers, timeout=10)
-            resp.raise_for_status()
-            soup = BeautifulSoup(resp.text, 'html.parser')
-            for s in soup(["script", "style", "nav", "footer"]): s.decompose()
-            return soup.get_text()[:20000]
-        except: return ""
+        return self.url_fetcher.fetch(url)
 
 if __name__ == "__main__":
     agent = IngestionAgent()
@@ -329,14 +853,8 @@ if __name__ == "__main__":
              with open("data/uploads/python_basics/intro_to_python.txt", "w") as f:
                  f.write("Python is a high-level programming language.")
 
-        kb = agent.load_topic("python_basics")
+        kb = agent.load_topic("python_basics") # Saves to data/db/python_basics.json
         print(f"✅ Success! Generated KnowledgeBase for '{kb.topic_name}'")
         
-        output_path = f"data/db/{kb.topic_name}.json"
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        with open(output_path, "w") as f:
-            f.write(kb.model_dump_json(indent=2))
-        print(f"💾 Saved to {output_path}")
-        
     except Exception as e:
         print(f"❌ Error: {e}")
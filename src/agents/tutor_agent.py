@@ -1,40 +1,82 @@
-import os
 import json
+import time
 import uuid
 import random
-from typing import Optional, Dict, List
+import asyncio
+import threading
+from typing import Optional, Set, Tuple
 import google.generativeai as genai
 
 from src.core.schema import (
-    KnowledgeBase, KnowledgeNode, Question, Difficulty, 
-    SessionState, UserSkillState, AssessmentResult, QuestionType
+    Question, Difficulty, 
+    SessionState, UserSkillState, AssessmentResult, QuestionType, AnswerEvent,
+    AnswerKey, IndexedQuestion
 )
 from src.core.config import Config
+from src.core.kb_cache import kb_cache
+from src.core.kb_view import CompactKnowledgeBase, NodeIndex
+from src.core.session_store import SessionStore, get_session_store
+from src.core.llm import generate_with_retry, agenerate_hedged
+from src.core.llm_cache import llm_cache
+from src.core.llm_guard import tutor_llm_breaker, tutor_llm_latency
+from src.core.question_pool import QuestionPrefetcher, question_prefetcher
+
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_background_loop_lock = threading.Lock()
+
+
+def _get_background_loop() -> asyncio.AbstractEventLoop:
+    """Event loop on a daemon thread: runs dynamic generations for synchronous callers (UI, CLI)."""
+    global _background_loop
+    with _background_loop_lock:
+        if _background_loop is None:
+            _background_loop = asyncio.new_event_loop()
+            threading.Thread(target=_background_loop.run_forever, name="tutor-llm", daemon=True).start()
+        return _background_loop
+
+
+def _variation_cache():
+    # "Generate a NEW question" must not replay a cached one unless explicitly opted in
+    return llm_cache if Config.LLM_CACHE_TUTOR_VARIATIONS else None
+
+
+class QuestionUnavailableError(RuntimeError):
+    """
+    Raised when the active node has no question to serve right now: its leaf has no static
+    questions (ingestion failed it) and none could be generated in time. Not the end of the topic.
+    """
+
 
 class TutorAgent:
     """
     Manages the practice session, serving questions adaptively based on user performance.
     """
-    def __init__(self, session_path: str = "data/sessions/current_session.json"):
-        self.session_path = session_path
-        self.kb: Optional[KnowledgeBase] = None
+    def __init__(self, session_id: str = "current_session", store: Optional[SessionStore] = None,
+                 prefetcher: Optional[QuestionPrefetcher] = None):
+        self.session_id = session_id
+        self.store = store or get_session_store()
+        self.prefetcher = prefetcher or question_prefetcher
+        self.breaker = tutor_llm_breaker
+        self.latency = tutor_llm_latency
+        self.kb: Optional[CompactKnowledgeBase] = None
         self.session: Optional[SessionState] = None
+        self.revision: Optional[str] = None # Store revision self.session reflects (None: unknown)
         self.model = genai.GenerativeModel(Config.LLM_MODEL_NAME) if Config.get_api_key() else None
 
-    def start_session(self, user_id: str, topic_name: str) -> str:
-        """Starts a new session (or loads existing) for a topic."""
+    def start_session(self, user_id: str, topic_name: str, resume: bool = False) -> str:
+        """
+        Starts a new session for a topic.
+        With resume=True, an existing saved session for the same user/topic is continued instead.
+        """
         # 1. Load Knowledge Base
-        kb_path = f"data/db/{topic_name}.json"
-        if not os.path.exists(kb_path):
-            raise FileNotFoundError(f"Knowledge Base for '{topic_name}' not found. Run ingestion first.")
-        
-        with open(kb_path, "r") as f:
-            data = json.load(f)
-            # Reconstruct Pydantic models? For now, dict access might be easier 
-            # or we parse back to schema. Let's parse strictly for type safety.
-            self.kb = KnowledgeBase(**data)
+        self.kb = kb_cache.get(topic_name)
+
+        # 2. Resume if we have saved progress for this learner
+        if resume and self.load_session():
+            if self.session.user_id == user_id and self.session.current_topic == topic_name:
+                return f"Session resumed for {topic_name}"
 
-        # 2. Init Session
+        # 3. Init Session
         self.session = SessionState(
             user_id=user_id,
             current_topic=topic_name,
@@ -42,27 +84,65 @@ class TutorAgent:
             coverage_map={},
             active_node_id=None
         )
-        self._save_session()
+        self.save_session()
         return f"Session started for {topic_name}"
 
     def get_next_question(self) -> Optional[Question]:
         """
         Core Logic: Determines the next question to ask.
-        Returns None if topic is fully mastered.
+        Returns None if topic is fully mastered; raises QuestionUnavailableError if nothing can be served yet.
+        Synchronous callers (UI, CLI) run aget_next_question on the background loop.
+        """
+        return asyncio.run_coroutine_threadsafe(self.aget_next_question(), _get_background_loop()).result()
+
+    async def aget_next_question(self, timeout: float = Config.TUTOR_LLM_DEADLINE) -> Optional[Question]:
+        """
+        get_next_question for async callers: a dynamic generation is awaited instead of blocking
+        the calling thread, and for at most `timeout` seconds (a static question is re-served instead).
+        """
+        active_node, target_diff, question = self._select_question()
+        if active_node is None:
+            return None # Implementation: All done!
+
+        if not question:
+            # Bucket empty? Trigger Dynamic Gen
+            # We generate dynamic questions for ANY difficulty if we run out, 
+            # ensuring the user must hit the streak to proceed.
+            print(f"      ⚠️ Running low on {target_diff.value} questions. Generating dynamic...")
+            question = await self._agenerate_dynamic_question(active_node, target_diff, timeout)
+            if not question:
+                # LLM slow, down or unavailable: better a repeat than a stalled learner
+                question = self._least_recently_seen(active_node, target_diff)
+            if not question:
+                # None means "mastered" to callers: an empty leaf must not end the topic
+                raise QuestionUnavailableError(f"No question available for {self.kb.name(active_node)} right now.")
+        if question.metadata.get("generated"):
+            # Another worker may grade it: keep it in the store too (off the event loop)
+            await asyncio.to_thread(self.store.remember_question, self.session_id, self.kb.ids[active_node], question)
+
+        # Top up the warm pool before this learner's static buckets run dry
+        self._prefetch_for(active_node, self.session.node_states[self.kb.ids[active_node]], served=question)
+        return question
+
+    def _select_question(self) -> Tuple[Optional[NodeIndex], Optional[Difficulty], Optional[Question]]:
+        """
+        Picks the active node and target difficulty, and a static (or prefetched) question if one is left.
+        Returns (None, None, None) once the topic is mastered; the question is None if one must be generated.
         """
         if not self.session or not self.kb:
             raise ValueError("Session not initialized.")
 
         # 1. Scope Selection (Graph Traversal)
         active_node = self._get_or_select_active_node()
-        if not active_node:
-            return None # Implementation: All done!
+        if active_node is None:
+            return None, None, None
 
         # 2. Difficulty Selection (Adaptive Probe)
-        node_state = self.session.node_states.get(active_node.id)
+        active_node_id = self.kb.ids[active_node]
+        node_state = self.session.node_states.get(active_node_id)
         # Default state if new node
         if not node_state:
-            node_state = UserSkillState(node_id=active_node.id)
+            node_state = UserSkillState(node_id=active_node_id)
             # Start at configured difficulty
             try:
                 # We store current_difficulty in UserSkillState? 
@@ -75,124 +155,125 @@ class TutorAgent:
                 # For this implementation, I will just pick based on history.
                 pass 
             except: pass
-            self.session.node_states[active_node.id] = node_state
+            self.session.node_states[active_node_id] = node_state
         
         # Determine current difficulty based on recent history
         target_diff = self._determine_difficulty(node_state)
         
         # 3. Fetch Question
-        question = self._fetch_available_question(active_node, target_diff, node_state.history)
-        
+        question = self._fetch_available_question(active_node, target_diff, node_state.seen)
+
         if not question:
-            # Bucket empty? Trigger Dynamic Gen
-            # We generate dynamic questions for ANY difficulty if we run out, 
-            # ensuring the user must hit the streak to proceed.
-            print(f"      ⚠️ Running low on {target_diff.value} questions. Generating dynamic...")
-            question = self._generate_dynamic_question(active_node, target_diff)
+            # Bucket empty? Serve a pre-generated variation if the warm pool has one
+            question = self._take_prefetched(active_node, target_diff)
 
-        return question
+        return active_node, target_diff, question
 
     def submit_answer(self, question_id: str, user_answer: str) -> AssessmentResult:
         """
         Evaluates answer, updates state (promote/demote), saves session.
         """
-        # Find question in KB (slow linear search or map? schema has node_map, but not global q map)
-        # Let's search efficient path: Active Node
-        q_obj = None
-        active_node = self.kb.node_map[self.session.active_node_id]
-        
-        # Search buckets
-        for diff in active_node.questions:
-            for q in active_node.questions[diff]:
-                if q.id == question_id:
-                    q_obj = q
-                    break
-            if q_obj: break
-        
-        if not q_obj:
-            raise ValueError("Question not found in active node.")
+        if not self.session or not self.kb:
+            raise ValueError("Session not initialized.")
 
-        # Check correctness
-        user_ans = user_answer.strip()
-        correct_ans = q_obj.correct_answer.strip().upper()
-        
-        is_correct = False
-        
-        # 1. Direct Match (Letter vs Letter OR Text vs Text)
-        if user_ans.upper() == correct_ans:
-            is_correct = True
-        # 2. Text vs Letter (User sent text, Correct is 'C')
-        elif user_ans in q_obj.options:
-             # Find which letter this text corresponds to
-             idx = q_obj.options.index(user_ans)
-             # Map index 0->A, 1->B, etc.
-             expected_letter = chr(ord('A') + idx) 
-             if expected_letter == correct_ans:
-                 is_correct = True
-
-        # Update State
-        node_state = self.session.node_states[active_node.id]
-        node_state.attempts += 1
-        node_state.history.append(question_id)
+        entry = self.find_question(question_id)
+        if not entry:
+            raise ValueError(f"Question not found: {question_id}")
+        q_obj = entry.question
+        node_id = entry.node_id
+
+        # Check correctness against the precomputed answer key
+        is_correct = entry.answer_key.matches(user_answer)
+
+        # Update State (of the node the question belongs to; usually the active one)
+        event = AnswerEvent(
+            question_id=question_id,
+            node_id=node_id,
+            is_correct=is_correct,
+            difficulty=q_obj.difficulty,
+            timestamp=time.time(),
+            generated=bool(q_obj.metadata.get("generated"))
+        )
+        node_state = self.session.apply_answer(event)
         
         feedback = ""
         
         if is_correct:
-            node_state.correct_streak += 1
             feedback = f"✅ Correct! {q_obj.explanation}"
             
-            # Promotion Logic
+            # Promotion Logic (state already updated by apply_answer)
             if q_obj.difficulty == Difficulty.INTERMEDIATE:
                 if node_state.correct_streak >= Config.TUTOR_MASTERY_STREAK:
                      feedback += "\n🚀 FAST-TRACK: Moving to Advanced!"
             elif q_obj.difficulty == Difficulty.ADVANCED:
-                if node_state.correct_streak >= Config.TUTOR_MASTERY_STREAK:
+                if self.session.coverage_map.get(node_id):
                      feedback += "\n🏆 CONCEPT MASTERED!"
-                     # Mark as done? We just clear active_node_id so loop picks next
-                     self.session.active_node_id = None
-                     self.session.coverage_map[active_node.id] = True
         else:
-            node_state.correct_streak = 0
             feedback = f"❌ Incorrect. Correct answer: {q_obj.correct_answer}.\n{q_obj.explanation}"
             # Demotion handled implicitly by _determine_difficulty next turn
         
-        self._save_session()
+        # O(1) persistence: append the event instead of rewriting the whole session.
+        # If someone else wrote since our copy was loaded, the revision comes back None and
+        # the next refresh() re-reads the session.
+        self.revision = self.store.append(self.session_id, event, self.revision)
         
         return AssessmentResult(
             question_id=question_id,
             user_answer=user_answer,
             is_correct=is_correct,
             feedback=feedback,
-            timestamp=0
+            timestamp=event.timestamp
         )
 
+    def find_question(self, question_id: str) -> Optional[IndexedQuestion]:
+        """The question, its node and answer key, or None if this session was never served it."""
+        # O(1) lookup in the KB's global question index (covers dynamic questions served here);
+        # a dynamic question served by another worker (or evicted here) is recalled from the store
+        return self.kb.get_question(question_id) or self._recall_question(question_id)
+
+    def load_session(self) -> bool:
+        """
+        Restores the saved session (and its Knowledge Base) from the store.
+        Returns False if there is nothing to restore.
+        """
+        # Read the revision first: a write landing in between only causes one extra reload
+        revision = self.store.revision(self.session_id)
+        session = self.store.load(self.session_id)
+        if not session:
+            return False
+
+        self.kb = kb_cache.get(session.current_topic)
+        self.session = session
+        self.revision = revision
+        return True
+
+    def refresh(self) -> bool:
+        """
+        Re-reads the session if another process (API worker, UI) has written to it since it was
+        loaded here. Returns True if it was reloaded.
+        """
+        if not self.session:
+            return False
+        if self.revision is not None and self.store.revision(self.session_id) == self.revision:
+            return False
+        return self.load_session()
+
+    def save_session(self):
+        """Writes a full snapshot of the session (new or reset sessions only: answers are appended)."""
+        self.revision = self.store.save(self.session_id, self.session)
+
     # --- Helpers ---
 
-    def _get_or_select_active_node(self) -> Optional[KnowledgeNode]:
-        """DFS (Document Order) to find next unmastered leaf."""
+    def _get_or_select_active_node(self) -> Optional[NodeIndex]:
+        """Next unmastered leaf in document order (the KB's precomputed leaf order)."""
         if self.session.active_node_id:
-            return self.kb.node_map[self.session.active_node_id]
-        
-        # Traversal: Find first LEAF that is NOT in coverage_map
-        # Use a stack for DFS (Last-In, First-Out)
-        # We start with Root
-        stack = [self.kb.root]
-        
-        while stack:
-            node = stack.pop() # Take from top
-            
-            if node.is_leaf:
-                if not self.session.coverage_map.get(node.id):
-                    # Found one!
-                    self.session.active_node_id = node.id
-                    return node
-            
-            # DFS: Push children in REVERSE order so the first child is popped first
-            # e.g. Children [A, B]. Push B, then A. Stack: [B, A]. Pop A.
-            for child in reversed(node.children):
-                stack.append(child)
-            
-        return None
+            return self.kb.index_of(self.session.active_node_id)
+
+        leaf_id = self.session.next_uncovered_leaf(self.kb.leaf_ids, self.kb.leaf_positions)
+        if not leaf_id:
+            return None
+        self.session.active_node_id = leaf_id
+        return self.kb.index_of(leaf_id)
 
     def _determine_difficulty(self, state: UserSkillState) -> Difficulty:
         """
@@ -202,7 +283,7 @@ class TutorAgent:
         - Fail on Int -> Beg
         - Fail on Adv -> Int
         """
-        if not state.history:
+        if not state.attempts:
             return Difficulty(Config.TUTOR_STARTING_DIFFICULTY)
         
         # Look at last attempt?
@@ -226,28 +307,164 @@ class TutorAgent:
         # Normal
         return Difficulty.INTERMEDIATE
 
-    def _fetch_available_question(self, node: KnowledgeNode, difficulty: Difficulty, history: List[str]) -> Optional[Question]:
-        available = node.questions.get(difficulty, [])
+    def _fetch_available_question(self, node: NodeIndex, difficulty: Difficulty, seen: Set[str]) -> Optional[Question]:
+        available = self.kb.question_range(node, difficulty)
         candidates = []
-        for q in available:
-            if q.id not in history:
-                candidates.append(q)
+        for pos in available:
+            if self.kb.question_id(pos) not in seen:
+                candidates.append(pos)
         
         if candidates:
             # Shuffle to ensure variety
             random.shuffle(candidates)
-            return candidates[0]
+            return self.kb.question_at(candidates[0])
         return None
 
-    def _generate_dynamic_question(self, node: KnowledgeNode, difficulty: Difficulty) -> Question:
-        """Call LLM to generate a fresh question similar to existing ones."""
+    def _take_prefetched(self, node: NodeIndex, difficulty: Difficulty) -> Optional[Question]:
+        q = self.prefetcher.take(self.kb.topic_name, self.kb.ids[node], difficulty)
+        if q:
+            # Register in the KB's question index so submit_answer can find it
+            self.kb.register_question(self.kb.ids[node], q)
+        return q
+
+    def _recall_question(self, question_id: str) -> Optional[IndexedQuestion]:
+        recalled = self.store.recall_question(self.session_id, question_id)
+        if not recalled:
+            return None
+        node_id, question = recalled
+        return IndexedQuestion(node_id, question, AnswerKey.for_question(question))
+
+    def _least_recently_seen(self, node: NodeIndex, difficulty: Difficulty) -> Optional[Question]:
+        """
+        Fallback when no fresh question can be had: the static question of this difficulty the
+        learner saw longest ago (any difficulty if the bucket is empty).
+        """
+        candidates = self.kb.question_range(node, difficulty) or self.kb.node_question_range(node)
+        if not candidates:
+            print(f"      ⚠️ No static questions to fall back on for {self.kb.name(node)}.")
+            return None
+        # Questions that dropped out of the recent ring were seen longest ago
+        recent = self.session.node_states[self.kb.ids[node]].recent
+        last_seen = {qid: i for i, qid in enumerate(recent)}
+        return self.kb.question_at(min(candidates, key=lambda pos: last_seen.get(self.kb.question_id(pos), -1)))
+
+    def _prefetch_for(self, node: NodeIndex, state: UserSkillState, served: Optional[Question] = None):
+        """
+        Asks the prefetcher to top up every difficulty this learner could be served next on node.
+        Gated on the breaker like the hot path: nothing while it is open, a single generation
+        as the half-open probe.
+        """
         if not self.model:
-            raise Exception("No LLM available for dynamic generation.")
-            
-        prompt = f"""
-        Generate a NEW 1-shot practice question for concept: "{node.name}".
+            return
+        probing = not self.breaker.is_closed
+        if probing and not self.breaker.allow():
+            return
+        served_id = served.id if served else None
+        node_id = self.kb.ids[node]
+        for difficulty in Difficulty:
+            remaining = sum(
+                1 for pos in self.kb.question_range(node, difficulty)
+                if self.kb.question_id(pos) not in state.seen and self.kb.question_id(pos) != served_id
+            )
+            # The prompt is built now: the worker must not read self.kb, which may change topic meanwhile
+            scheduled = self.prefetcher.top_up(
+                self.kb.topic_name, node_id, difficulty, remaining,
+                lambda d=difficulty, prompt=self._dynamic_prompt(node, difficulty):
+                    self._create_dynamic_question(prompt, node_id, d, retries=Config.API_RETRY_COUNT),
+                limit=1 if probing else None
+            )
+            if probing and scheduled:
+                return
+
+    async def _agenerate_dynamic_question(self, node: NodeIndex, difficulty: Difficulty,
+                                          timeout: float) -> Optional[Question]:
+        """
+        Call LLM to generate a fresh question similar to existing ones.
+        Waits at most `timeout` seconds for a variation. A generation that misses the deadline keeps
+        running (up to TUTOR_LLM_TIMEOUT) and its question goes to the warm pool for the next request;
+        the breaker counts how that generation ends, not the missed deadline.
+        Returns None on timeout, failure, or while the circuit breaker is open.
+        """
+        if not self.model or not self.breaker.allow():
+            return None
+
+        task = asyncio.ensure_future(self._agenerate_hedged_question(node, difficulty, self._variation_salt(node)))
+        try:
+            q = await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            print(f"      ⏱️ Dynamic Gen missed the {timeout}s deadline. Serving a static question.")
+            topic, node_id = self.kb.topic_name, self.kb.ids[node]
+            task.add_done_callback(lambda t: self._pool_late_question(t, topic, node_id, difficulty))
+            return None
+
+        if not q:
+            self.breaker.record_failure()
+            return None
+        self.breaker.record_success()
+        # Register in the KB's question index (not the node's buckets) so submit_answer can find it!
+        self.kb.register_question(self.kb.ids[node], q)
+        return q
+
+    async def _agenerate_hedged_question(self, node: NodeIndex, difficulty: Difficulty,
+                                         cache_salt: str) -> Optional[Question]:
+        hedge_after = None
+        if Config.TUTOR_HEDGE_ENABLED:
+            hedge_after = self.latency.percentile(Config.TUTOR_HEDGE_PERCENTILE) or Config.TUTOR_HEDGE_DEFAULT_DELAY
+        try:
+            resp = await asyncio.wait_for(
+                agenerate_hedged(self.model, self._dynamic_prompt(node, difficulty), hedge_after,
+                                 latency=self.latency, retries=Config.TUTOR_LLM_RETRIES,
+                                 cache=_variation_cache(), cache_salt=cache_salt),
+                Config.TUTOR_LLM_TIMEOUT
+            )
+            return self._parse_dynamic_question(resp.text, self.kb.ids[node], difficulty)
+        except asyncio.TimeoutError:
+            print(f"Dynamic Gen Timed Out after {Config.TUTOR_LLM_TIMEOUT}s")
+        except Exception as e:
+            print(f"Dynamic Gen Failed: {e}")
+        return None
+
+    def _pool_late_question(self, task: "asyncio.Future", topic: str, node_id: str, difficulty: Difficulty):
+        if task.cancelled():
+            return
+        if not task.result():
+            self.breaker.record_failure()
+            return
+        self.breaker.record_success()
+        self.prefetcher.put(topic, node_id, difficulty, task.result())
+
+    def _variation_salt(self, node: NodeIndex) -> str:
+        # Only matters with LLM_CACHE_TUTOR_VARIATIONS: the learner's attempt count on this node,
+        # so learners at the same point share (cached) variations.
+        state = self.session.node_states.get(self.kb.ids[node])
+        attempts = state.attempts if state else 0
+        return f"variation-{attempts}"
+
+    def _create_dynamic_question(self, prompt: str, node_id: str, difficulty: Difficulty,
+                                 retries: int = Config.TUTOR_LLM_RETRIES) -> Optional[Question]:
+        """
+        Builds one LLM variation from a _dynamic_prompt. Touches no session or KB state, so the
+        prefetcher can run it on a background thread. Returns None on failure.
+        Never goes through the response cache: pool stock must be new after a restart and in every worker.
+        """
+        try:
+            resp = generate_with_retry(self.model, prompt, retries=retries, cache=None)
+            q = self._parse_dynamic_question(resp.text, node_id, difficulty)
+        except Exception as e:
+            print(f"Dynamic Gen Failed: {e}")
+            q = None
+        # An unusable answer counts against the LLM just like an error
+        if not q:
+            self.breaker.record_failure()
+            return None
+        self.breaker.record_success()
+        return q
+
+    def _dynamic_prompt(self, node: NodeIndex, difficulty: Difficulty) -> str:
+        return f"""
+        Generate a NEW 1-shot practice question for concept: "{self.kb.name(node)}".
         Difficulty: {difficulty.value}
-        Description: {node.description}
+        Description: {self.kb.description(node)}
         
         The user has exhausted static questions. Create a variation.
         
@@ -259,40 +476,25 @@ class TutorAgent:
              "explanation": "..."
         }}
         """
-        try:
-            resp = self.model.generate_content(prompt, generation_config={"response_mime_type": "application/json"})
-            data = json.loads(resp.text)
-            
-            # Handle edge case where LLM returns a list instead of single object
-            if isinstance(data, list):
-                if not data: raise ValueError("Empty response list")
-                data = data[0]
-                
-            q = Question(
-                id=str(uuid.uuid4()),
-                difficulty=difficulty,
-                type=QuestionType.MULTIPLE_CHOICE,
-                content=data["content"],
-                options=data.get("options", []),
-                correct_answer=data["correct_answer"],
-                explanation=data.get("explanation", ""),
-                metadata={"generated": True}
-            )
-            
-            # CRITICAL FIX: Save to node so submit_answer can find it!
-            if difficulty not in node.questions:
-                node.questions[difficulty] = []
-            node.questions[difficulty].append(q)
-            
-            return q
-        except Exception as e:
-            print(f"Dynamic Gen Failed: {e}")
-            return None
 
-    def _save_session(self):
-        os.makedirs(os.path.dirname(self.session_path), exist_ok=True)
-        with open(self.session_path, "w") as f:
-            f.write(self.session.model_dump_json(indent=2))
+    def _parse_dynamic_question(self, text: str, node_id: str, difficulty: Difficulty) -> Question:
+        data = json.loads(text)
+        
+        # Handle edge case where LLM returns a list instead of single object
+        if isinstance(data, list):
+            if not data: raise ValueError("Empty response list")
+            data = data[0]
+            
+        return Question(
+            id=str(uuid.uuid4()),
+            difficulty=difficulty,
+            type=QuestionType.MULTIPLE_CHOICE,
+            content=data["content"],
+            options=data.get("options", []),
+            correct_answer=data["correct_answer"],
+            explanation=data.get("explanation", ""),
+            metadata={"generated": True, "node_id": node_id}
+        )
 
 if __name__ == "__main__":
     # CLI Demo
@@ -303,7 +505,11 @@ if __name__ == "__main__":
         # Simulate 3 turns
         for i in range(3):
             print(f"\n--- Turn {i+1} ---")
-            q = agent.get_next_question()
+            try:
+                q = agent.get_next_question()
+            except QuestionUnavailableError as e:
+                print(f"⏳ {e}")
+                break
             if not q:
                 print("🎉 Session Complete!")
                 break
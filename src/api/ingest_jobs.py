@@ -0,0 +1,182 @@
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from src.agents.ingestion_agent import IngestionAgent, IngestionCancelled
+from src.core.config import Config
+from src.core.kb_cache import kb_cache
+
+
+class JobNotFoundError(KeyError):
+    """Raised for an unknown (or already forgotten) job id."""
+
+
+class TopicBusyError(RuntimeError):
+    """Raised when a topic already has an ingestion job queued or running."""
+
+    def __init__(self, job: "IngestJob"):
+        super().__init__(f"Topic '{job.topic_name}' is already being ingested (job {job.id})")
+        self.job = job
+
+
+class IngestJob:
+    """
+    One background ingestion run. Every status change and progress report is appended to
+    an event log (numbered by `seq`), which the SSE endpoint replays from any position.
+    """
+
+    ACTIVE = ("queued", "running")
+
+    def __init__(self, topic_name: str):
+        self.id = uuid.uuid4().hex
+        self.topic_name = topic_name
+        self.status = "queued" # queued | running | succeeded | failed | cancelled
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.progress: dict = {}
+        self.kb_path: Optional[str] = None
+        self.error: Optional[str] = None
+        self.cancel_event = threading.Event()
+        self._events: List[dict] = []
+        self._lock = threading.Lock()
+        self._questions_started: Optional[float] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status not in self.ACTIVE
+
+    def events_since(self, seq: int) -> List[dict]:
+        with self._lock:
+            return self._events[seq:]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "topic_name": self.topic_name,
+                "status": self.status,
+                "progress": dict(self.progress),
+                "kb_path": self.kb_path,
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+
+    # --- Called from the worker ---
+
+    def set_status(self, status: str, **fields):
+        with self._lock:
+            self.status = status
+            for key, value in fields.items():
+                setattr(self, key, value)
+            if status == "running":
+                self.started_at = time.time()
+            elif status not in self.ACTIVE:
+                self.finished_at = time.time()
+        self._publish("status", status=status, **fields)
+
+    def on_progress(self, progress: dict):
+        progress = dict(progress)
+        if progress["stage"] == "questions":
+            # ETA from the leaf rate so far
+            if self._questions_started is None:
+                self._questions_started = time.time()
+            done, total = progress["done"], progress["total"]
+            if done:
+                rate = (time.time() - self._questions_started) / done
+                progress["eta_seconds"] = round(rate * (total - done), 1)
+        with self._lock:
+            self.progress = progress
+        self._publish("progress", **progress)
+
+    def _publish(self, event_type: str, **data):
+        with self._lock:
+            self._events.append({"seq": len(self._events), "type": event_type, "job_id": self.id, **data})
+
+
+class IngestJobManager:
+    """
+    Runs IngestionAgent.load_topic on a small worker pool so API requests return immediately.
+    At most one job per topic is queued or running at a time; each job gets its own agent.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = Config.INGEST_JOB_WORKERS,
+        agent_factory: Callable[[], IngestionAgent] = IngestionAgent,
+        max_finished: int = Config.INGEST_JOBS_KEPT,
+    ):
+        self.agent_factory = agent_factory
+        self.max_finished = max_finished
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest-job")
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._active: Dict[str, IngestJob] = {} # topic -> queued/running job
+        self._lock = threading.Lock()
+
+    def submit(self, topic_name: str) -> IngestJob:
+        with self._lock:
+            active = self._active.get(topic_name)
+            if active:
+                raise TopicBusyError(active)
+            job = IngestJob(topic_name)
+            self._jobs[job.id] = job
+            self._active[topic_name] = job
+            self._forget_finished_locked()
+        job.set_status("queued")
+        self._pool.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> IngestJob:
+        job = self._jobs.get(job_id)
+        if not job:
+            raise JobNotFoundError(job_id)
+        return job
+
+    def list(self) -> List[IngestJob]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> IngestJob:
+        """Requests cancellation; a running job stops after its in-flight LLM calls finish."""
+        job = self.get(job_id)
+        job.cancel_event.set()
+        return job
+
+    def shutdown(self):
+        for job in self.list():
+            job.cancel_event.set()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    # --- Helpers ---
+
+    def _run(self, job: IngestJob):
+        try:
+            if job.cancel_event.is_set():
+                raise IngestionCancelled()
+            job.set_status("running")
+            agent = self.agent_factory()
+            agent.on_progress = job.on_progress
+            agent.cancel_event = job.cancel_event
+            kb = agent.load_topic(job.topic_name)
+            kb_cache.invalidate(kb.topic_name)
+            job.set_status("succeeded", kb_path=os.path.join(agent.db_dir, f"{kb.topic_name}.json"))
+        except IngestionCancelled:
+            job.set_status("cancelled")
+        except Exception as e:
+            print(f"❌ Ingestion job {job.id} ({job.topic_name}) failed: {e}")
+            job.set_status("failed", error=str(e))
+        finally:
+            with self._lock:
+                if self._active.get(job.topic_name) is job:
+                    del self._active[job.topic_name]
+
+    def _forget_finished_locked(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
@@ -10,14 +10,33 @@ class IngestResponse(BaseModel):
     kb_path: str
     cost_summary: Optional[str] = None
 
+class IngestJobResponse(BaseModel):
+    job_id: str
+    topic_name: str
+    status: str
+    status_url: str # Poll for a snapshot...
+    events_url: str # ...or follow progress as Server-Sent Events
+
+class IngestJobStatus(BaseModel):
+    job_id: str
+    topic_name: str
+    status: str # queued | running | succeeded | failed | cancelled
+    progress: Dict[str, Any] = {} # Latest report: stage, done/total leaves, usage, cost_usd, eta_seconds
+    kb_path: Optional[str] = None
+    error: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
 # Session Management
 class StartSessionRequest(BaseModel):
     user_id: str
     topic_name: str
+    reset: bool = False # Discard saved progress instead of resuming
 
 class StartSessionResponse(BaseModel):
     message: str
-    session_id: str # Path or UUID
+    session_id: str # Pass back on every /api/session/* call
 
 # Question Serving
 class QuestionResponse(BaseModel):
@@ -27,14 +46,12 @@ class QuestionResponse(BaseModel):
     difficulty: str
     
 class QuestionRequest(BaseModel):
-    # GET request usually implies fetching for current active session
-    # But for statelessness, maybe pass user_id?
-    # We'll use the singleton TutorAgent for this MVP or simple instantiation
     user_id: str
     topic_name: str
 
 # Answer Submission
 class SubmitAnswerRequest(BaseModel):
+    session_id: str
     question_id: str
     user_answer: str
 
@@ -42,3 +59,15 @@ class SubmitAnswerResponse(BaseModel):
     is_correct: bool
     feedback: str
     correct_answer: Optional[str] = None # Only show if wrong? Algo says show always.
+
+# Submit-and-advance (one round trip per answer)
+class GraphNodeStatus(BaseModel):
+    id: str
+    status: str # active | mastered | pending
+
+class AnswerResponse(BaseModel):
+    is_correct: bool
+    feedback: str
+    next_question: Optional[QuestionResponse] # id "DONE" once the topic is mastered; None if none can be served yet (GET /api/session/next later)
+    status: Dict[str, Any] # Same shape as GET /api/session/status
+    graph_delta: List[GraphNodeStatus] = [] # Only the graph nodes whose status changed
@@ -1,14 +1,21 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from src.api.models import (
-    IngestRequest, IngestResponse,
+    IngestRequest, IngestJobResponse, IngestJobStatus,
     StartSessionRequest, StartSessionResponse,
-    QuestionResponse, SubmitAnswerRequest, SubmitAnswerResponse
+    QuestionResponse, SubmitAnswerRequest, SubmitAnswerResponse,
+    AnswerResponse, GraphNodeStatus
 )
 from src.core.schema import AssessmentResult
-from src.agents.ingestion_agent import IngestionAgent
-from src.agents.tutor_agent import TutorAgent
+from src.api.ingest_jobs import IngestJobManager, JobNotFoundError, TopicBusyError
+from src.api.session_manager import SessionManager, SessionNotFoundError
+from src.agents.tutor_agent import QuestionUnavailableError
 from src.core.config import Config
+from src.core.kb_cache import kb_cache
+from typing import Optional
+import asyncio
+import json
 import os
 
 app = FastAPI(title="Smart Practice API")
@@ -22,18 +29,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global Agent Instances (For MVP - ideally per-session or DB backed)
-# We will reload TutorAgent per request based on session file persistence, 
-# ensuring statelessness across restarts.
-tutor_agent = TutorAgent()
-ingestion_agent = IngestionAgent()
+# One TutorAgent per (user, topic), held in a bounded LRU and persisted to
+# data/sessions/, so learners survive restarts and don't clobber each other.
+session_manager = SessionManager()
+# Ingestion runs for minutes, so it is a background job rather than a request.
+ingest_jobs = IngestJobManager()
+
+@app.on_event("startup")
+def warm_kb_cache():
+    # Parse every topic once up front so session starts are a cache hit.
+    kb_cache.preload_in_background()
+
+@app.on_event("shutdown")
+def shutdown_jobs():
+    # Sessions need no flush: every answer was appended to the store when it was graded
+    ingest_jobs.shutdown()
 
 @app.get("/api/health")
 def health_check():
     return {"status": "running"}
 
-@app.post("/api/ingest", response_model=IngestResponse)
+@app.get("/api/ready")
+def readiness_check():
+    """Ready once every topic in data/db has been preloaded into the KB cache."""
+    status = kb_cache.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+@app.post("/api/ingest", response_model=IngestJobResponse, status_code=202)
 def ingest_topic(req: IngestRequest):
+    """Queues an ingestion job and returns at once; follow it via status_url or events_url."""
+    if not req.topic_name or os.sep in req.topic_name or req.topic_name.startswith("."):
+        raise HTTPException(status_code=400, detail=f"Invalid topic name: {req.topic_name!r}")
     try:
         # Check if dummy data exists for specific known demos
         topic_path = os.path.join("data/uploads", req.topic_name)
@@ -43,38 +69,95 @@ def ingest_topic(req: IngestRequest):
              with open(os.path.join(topic_path, "intro.txt"), "w") as f:
                  f.write(f"Introduction to {req.topic_name}.")
 
-        kb = ingestion_agent.load_topic(req.topic_name)
-        
-        # Save happens inside agent, but let's confirm
-        kb_path = f"data/db/{kb.topic_name}.json"
-        
-        return IngestResponse(
-            message=f"Successfully ingested {req.topic_name}",
-            kb_path=kb_path
-        )
+        job = ingest_jobs.submit(req.topic_name)
+    except TopicBusyError as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "job_id": e.job.id})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    return IngestJobResponse(
+        job_id=job.id,
+        topic_name=job.topic_name,
+        status=job.status,
+        status_url=f"/api/ingest/jobs/{job.id}",
+        events_url=f"/api/ingest/jobs/{job.id}/events"
+    )
+
+@app.get("/api/ingest/jobs")
+def list_ingest_jobs():
+    return {"jobs": [job.snapshot() for job in ingest_jobs.list()]}
+
+@app.get("/api/ingest/jobs/{job_id}", response_model=IngestJobStatus)
+def get_ingest_job(job_id: str):
+    return IngestJobStatus(**_get_job(job_id).snapshot())
+
+@app.post("/api/ingest/jobs/{job_id}/cancel", response_model=IngestJobStatus)
+def cancel_ingest_job(job_id: str):
+    try:
+        job = ingest_jobs.cancel(job_id)
+    except JobNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return IngestJobStatus(**job.snapshot())
+
+@app.get("/api/ingest/jobs/{job_id}/events")
+async def ingest_job_events(job_id: str, since: int = 0, last_event_id: Optional[str] = Header(None)):
+    """
+    Server-Sent Events: every status change and progress report (per-leaf counts, token
+    usage, cost, ETA) from `since` on, or after Last-Event-ID when the browser reconnects.
+    The stream ends once the job has finished and its last event was sent.
+    """
+    job = _get_job(job_id)
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id) + 1
+
+    async def stream():
+        seq, idle = since, 0.0
+        while True:
+            finished = job.done # Read before draining, so the final events are never skipped
+            events = job.events_since(seq)
+            for event in events:
+                yield f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+            seq += len(events)
+            if finished and not events:
+                return
+            if events:
+                idle = 0.0
+            elif idle >= 15:
+                yield ": keep-alive\n\n"
+                idle = 0.0
+            await asyncio.sleep(0.5)
+            idle += 0.5
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def _get_job(job_id: str):
+    try:
+        return ingest_jobs.get(job_id)
+    except JobNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+
 @app.get("/api/topics")
 def list_topics():
     """Returns list of available topics from data/db"""
     try:
-        if not os.path.exists("data/db"):
-            return {"topics": []}
-            
-        files = os.listdir("data/db")
-        topics = [f.replace(".json", "") for f in files if f.endswith(".json")]
-        return {"topics": sorted(topics)}
+        return {"topics": kb_cache.list_topics()}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# The tutor hot path is async: a question that has to be generated awaits the LLM on the
+# event loop instead of pinning one of the (few) threadpool workers for seconds.
+
 @app.post("/api/session/start", response_model=StartSessionResponse)
-def start_session(req: StartSessionRequest):
+async def start_session(req: StartSessionRequest):
     try:
-        msg = tutor_agent.start_session(req.user_id, req.topic_name)
+        # Loads the KB and session from disk
+        session_id, msg = await asyncio.to_thread(
+            session_manager.start, req.user_id, req.topic_name, reset=req.reset
+        )
         return StartSessionResponse(
             message=msg,
-            session_id=tutor_agent.session_path
+            session_id=session_id
         )
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -82,94 +165,163 @@ def start_session(req: StartSessionRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/session/next", response_model=QuestionResponse)
-def get_next_question():
+async def get_next_question(session_id: str):
     try:
-        # Assuming single active session for MVP
-        # In prod, we'd need session_id lookup
-        q = tutor_agent.get_next_question()
-        
-        if not q:
-            # Signal completion? 
-            # Return a special "Done" question or 204?
-            # Let's return a dummy "Session Complete" question object for frontend simplicity
-            return QuestionResponse(
-                id="DONE",
-                content="🎉 Topic Mastered! You have completed all available concepts.",
-                options=[],
-                difficulty="completed"
-            )
-            
-        return QuestionResponse(
-            id=q.id,
-            content=q.content,
-            options=q.options,
-            difficulty=q.difficulty.value
-        )
+        async with session_manager.asession(session_id) as tutor_agent:
+            q = await tutor_agent.aget_next_question()
+        return _question_response(q)
+    except SessionNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Unknown session: {session_id}")
+    except QuestionUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e),
+                            headers={"Retry-After": str(Config.TUTOR_RETRY_AFTER_SECONDS)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/session/submit", response_model=SubmitAnswerResponse)
-def submit_answer(req: SubmitAnswerRequest):
+async def submit_answer(req: SubmitAnswerRequest):
     try:
-        result = tutor_agent.submit_answer(req.question_id, req.user_answer)
+        async with session_manager.asession(req.session_id) as tutor_agent:
+            # Appends to the session store (fsync), so keep it off the event loop
+            result = await asyncio.to_thread(tutor_agent.submit_answer, req.question_id, req.user_answer)
         return SubmitAnswerResponse(
             is_correct=result.is_correct,
             feedback=result.feedback,
             correct_answer=None # Hidden unless we want to expilcitly show it separate from feedback
         )
+    except SessionNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Unknown session: {req.session_id}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/session/answer", response_model=AnswerResponse)
+async def answer_and_advance(req: SubmitAnswerRequest):
+    """
+    submit + next + status + graph in one round trip: grades the answer, then returns the
+    feedback, the next question, the status bar and only the graph nodes whose status changed.
+    """
+    try:
+        async with session_manager.asession(req.session_id) as tutor_agent:
+            session = tutor_agent.session
+            # Resolved like submit_answer does (may read the store for a recalled dynamic question)
+            entry = await asyncio.to_thread(tutor_agent.find_question, req.question_id) if tutor_agent.kb else None
+            # Only the answered node, the active node before and the active node after can change
+            old_active = session.active_node_id
+            before = {n: _node_status(n, old_active, session.coverage_map)
+                      for n in (old_active, entry.node_id if entry else None) if n}
+
+            result = await asyncio.to_thread(tutor_agent.submit_answer, req.question_id, req.user_answer)
+            try:
+                next_question = _question_response(await tutor_agent.aget_next_question())
+            except QuestionUnavailableError:
+                # The answer is recorded either way; the client asks /api/session/next later
+                next_question = None
+
+            new_active = session.active_node_id
+            if new_active and new_active not in before:
+                before[new_active] = _node_status(new_active, old_active, session.coverage_map)
+            delta = []
+            for node_id, status in before.items():
+                now = _node_status(node_id, new_active, session.coverage_map)
+                if now != status:
+                    delta.append(GraphNodeStatus(id=node_id, status=now))
+
+            return AnswerResponse(
+                is_correct=result.is_correct,
+                feedback=result.feedback,
+                next_question=next_question,
+                status=_build_status(tutor_agent),
+                graph_delta=delta
+            )
+    except SessionNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Unknown session: {req.session_id}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _question_response(q) -> QuestionResponse:
+    if not q:
+        # Signal completion? 
+        # Return a special "Done" question or 204?
+        # Let's return a dummy "Session Complete" question object for frontend simplicity
+        return QuestionResponse(
+            id="DONE",
+            content="🎉 Topic Mastered! You have completed all available concepts.",
+            options=[],
+            difficulty="completed"
+        )
+
+    return QuestionResponse(
+        id=q.id,
+        content=q.content,
+        options=q.options,
+        difficulty=q.difficulty.value
+    )
+
 from fastapi.staticfiles import StaticFiles
 import os
 
 # ... existing endpoints ...
 
 @app.get("/api/kb/graph")
-def get_graph():
+async def get_graph(session_id: str):
     """Returns the Knowledge Graph structure for Cytoscape.js"""
-    if not tutor_agent.kb:
+    try:
+        async with session_manager.asession(session_id) as tutor_agent:
+            return _build_graph(tutor_agent)
+    except SessionNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Unknown session: {session_id}")
+
+def _build_graph(tutor_agent):
+    kb = tutor_agent.kb
+    if not kb:
         return {"elements": []}
     
     elements = []
+    active_id = tutor_agent.session.active_node_id
+    coverage = tutor_agent.session.coverage_map
     
-    # BFS Traversal
-    stack = [tutor_agent.kb.root]
-    while stack:
-        node = stack.pop(0)
-        
-        # Determine Status
-        status = "pending"
-        if node.id == tutor_agent.session.active_node_id:
-            status = "active"
-        elif tutor_agent.session.coverage_map.get(node.id):
-            status = "mastered"
+    # Nodes are numbered in document order with parents first: one pass over the arrays
+    for i, node_id in enumerate(kb.ids):
+        status = _node_status(node_id, active_id, coverage)
             
         # Add Node
         elements.append({
             "data": {
-                "id": node.id,
-                "label": node.name,
+                "id": node_id,
+                "label": kb.name(i),
                 "status": status,
-                "type": "leaf" if node.is_leaf else "topic"
+                "type": "leaf" if kb.is_leaf(i) else "topic"
             }
         })
         
         # Add Edge
-        if node.parent_id:
+        parent = kb.parent[i]
+        if parent >= 0:
             elements.append({
                 "data": {
-                    "source": node.parent_id,
-                    "target": node.id
+                    "source": kb.ids[parent],
+                    "target": node_id
                 }
             })
-            
-        stack.extend(node.children)
         
     return {"elements": elements}
 
+def _node_status(node_id: str, active_id: Optional[str], coverage: dict) -> str:
+    if node_id == active_id:
+        return "active"
+    if coverage.get(node_id):
+        return "mastered"
+    return "pending"
+
 @app.get("/api/session/status")
-def get_session_status():
+async def get_session_status(session_id: str):
+    try:
+        async with session_manager.asession(session_id) as tutor_agent:
+            return _build_status(tutor_agent)
+    except SessionNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Unknown session: {session_id}")
+
+def _build_status(tutor_agent):
     if not tutor_agent.session:
         return {"active": False}
         
@@ -177,8 +329,8 @@ def get_session_status():
     if not active_id:
         return {"active": True, "mastered_all": True}
         
-    node = tutor_agent.kb.node_map.get(active_id)
-    breadcrumb = node.path.replace(" > ", " / ") if node else ""
+    node = tutor_agent.kb.index_of(active_id)
+    breadcrumb = tutor_agent.kb.path(node).replace(" > ", " / ") if node is not None else ""
     
     state = tutor_agent.session.node_states.get(active_id)
     streak = state.correct_streak if state else 0
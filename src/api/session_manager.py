@@ -0,0 +1,179 @@
+import re
+import json
+import time
+import hashlib
+import asyncio
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from src.agents.tutor_agent import TutorAgent
+from src.core.config import Config
+from src.core.session_store import SessionStore, get_session_store
+
+
+# Session ids become file names in the session store
+_SAFE_ID = re.compile(r"[A-Za-z0-9_-][A-Za-z0-9_.-]*")
+
+
+def _legacy_session_id(user_id: str, topic_name: str) -> str:
+    safe = lambda s: re.sub(r"[^A-Za-z0-9_.-]", "_", s).lstrip(".")
+    return f"{safe(user_id)}__{safe(topic_name)}"
+
+
+async def _acquire_in_thread(lock: threading.Lock):
+    # Blocks a worker thread, not the event loop. If we're cancelled while waiting, the
+    # lock is released as soon as the thread gets it.
+    acquiring = asyncio.ensure_future(asyncio.to_thread(lock.acquire))
+    try:
+        await asyncio.shield(acquiring)
+    except asyncio.CancelledError:
+        acquiring.add_done_callback(lambda f: f.cancelled() or f.exception() or lock.release())
+        raise
+
+
+class SessionNotFoundError(KeyError):
+    """Raised when a session id has neither a live agent nor a saved session on disk."""
+
+
+class _SessionEntry:
+    def __init__(self, agent: TutorAgent):
+        self.agent = agent
+        # A plain Lock (not RLock): async requests acquire it on the event loop thread and
+        # may release it after work handed off to a worker thread.
+        self.lock = threading.Lock()
+        # Queues async requests on this session without polling; they still take `lock`
+        # to exclude synchronous callers (start, eviction)
+        self.async_lock = asyncio.Lock()
+        self.last_access = time.monotonic()
+
+
+class SessionManager:
+    """
+    Registry of live TutorAgents, one per (user_id, topic).
+    Keeps a bounded LRU in memory; idle or overflowing sessions are simply dropped (every
+    answer is already in the session store) and transparently reloaded on their next request.
+    Several workers can serve the same session: each request first re-reads the session if
+    another process has written to it.
+    """
+
+    def __init__(
+        self,
+        store: Optional[SessionStore] = None,
+        max_sessions: int = Config.SESSION_CACHE_SIZE,
+        idle_seconds: float = Config.SESSION_IDLE_SECONDS,
+    ):
+        self.store = store or get_session_store()
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self._entries: "OrderedDict[str, _SessionEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_session_id(user_id: str, topic_name: str) -> str:
+        """
+        Deterministic, filesystem-safe id so a learner resumes the same session after restarts.
+        The readable part is lossy ("a@b" and "a#b" both read "a_b"); the hash of the exact
+        (user_id, topic) pair keeps ids of different learners apart.
+        """
+        digest = hashlib.sha256(json.dumps([user_id, topic_name]).encode("utf-8")).hexdigest()[:16]
+        return f"{_legacy_session_id(user_id, topic_name)[:80]}__{digest}"
+
+    def start(self, user_id: str, topic_name: str, reset: bool = False) -> tuple:
+        """Starts (or resumes) the session for user/topic. Returns (session_id, message)."""
+        session_id = self.make_session_id(user_id, topic_name)
+        entry = self._get_entry(session_id, create=True)
+        with entry.lock:
+            if not reset:
+                self._adopt_legacy_session(session_id, user_id, topic_name)
+            msg = entry.agent.start_session(user_id, topic_name, resume=not reset)
+        return session_id, msg
+
+    @asynccontextmanager
+    async def asession(self, session_id: str) -> AsyncIterator[TutorAgent]:
+        """
+        Yields the live agent for session_id, serialising requests on the same session.
+        Loading an evicted session (disk I/O) runs in a worker thread, and waiting for the
+        session's lock never blocks the event loop.
+        """
+        entry = await asyncio.to_thread(self._get_entry, session_id)
+        async with entry.async_lock:
+            if not entry.lock.acquire(blocking=False):
+                await _acquire_in_thread(entry.lock) # Held by a synchronous caller
+            try:
+                entry.last_access = time.monotonic()
+                await asyncio.to_thread(entry.agent.refresh)
+                yield entry.agent
+            finally:
+                entry.lock.release()
+
+    def evict_idle(self):
+        """Drops sessions that have not been touched for idle_seconds."""
+        cutoff = time.monotonic() - self.idle_seconds
+        with self._lock:
+            # Entries are kept in recency order, so idle ones sit at the front.
+            for session_id, entry in list(self._entries.items()):
+                if entry.last_access > cutoff:
+                    break
+                self._evict_locked(session_id, entry)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # --- Helpers ---
+
+    def _get_entry(self, session_id: str, create: bool = False) -> _SessionEntry:
+        self.evict_idle()
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry:
+                self._entries.move_to_end(session_id)
+                return entry
+
+        if not _SAFE_ID.fullmatch(session_id):
+            raise SessionNotFoundError(session_id)
+
+        # Load outside the registry lock: it may parse a KB and replay a log, and other
+        # sessions' requests must not queue behind it
+        agent = TutorAgent(session_id=session_id, store=self.store)
+        if not create and not agent.load_session():
+            raise SessionNotFoundError(session_id)
+
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry:
+                # Another request loaded it meanwhile: share that agent
+                self._entries.move_to_end(session_id)
+                return entry
+            entry = _SessionEntry(agent)
+            self._entries[session_id] = entry
+            self._shrink_locked()
+            return entry
+
+    def _adopt_legacy_session(self, session_id: str, user_id: str, topic_name: str):
+        # Sessions saved under the old "<user>__<topic>" id are moved over once, and only by
+        # the learner they belong to (the old ids could collide between learners)
+        legacy_id = _legacy_session_id(user_id, topic_name)
+        if not _SAFE_ID.fullmatch(legacy_id) or self.store.revision(session_id) is not None:
+            return
+        legacy = self.store.load(legacy_id)
+        if legacy and legacy.user_id == user_id and legacy.current_topic == topic_name:
+            self.store.save(session_id, legacy)
+
+    def _shrink_locked(self):
+        # Drop least recently used sessions; skip ones that are mid-request.
+        for session_id, entry in list(self._entries.items()):
+            if len(self._entries) <= self.max_sessions:
+                break
+            self._evict_locked(session_id, entry)
+
+    def _evict_locked(self, session_id: str, entry: _SessionEntry):
+        # No snapshot here: a full save from this worker's copy would overwrite answers other
+        # workers appended since. Everything this agent recorded is already in the store.
+        if not entry.lock.acquire(blocking=False):
+            return
+        try:
+            del self._entries[session_id]
+        finally:
+            entry.lock.release()
@@ -7,9 +7,6 @@ class Config:
     # We will use Gemini 1.5 Flash rates as a proxy for "Estimated Cost" if it were paid.
     LLM_MODEL_NAME = "gemini-2.0-flash-lite" 
     
-    # Ingestion Settings
-    MAX_HIERARCHY_DEPTH = 3
-    SUBTOPICS_PER_NODE = (3, 5) # (Min, Max) width
     # Ingestion Settings
     MAX_HIERARCHY_DEPTH = 3
     SUBTOPICS_PER_NODE = (3, 5) # (Min, Max) width
@@ -18,16 +15,90 @@ class Config:
         "intermediate": 2,
         "advanced": 1
     }
+
+    # Ingestion Pipeline (leaf question pass, checkpoints, background jobs)
+    INGEST_MAX_CONCURRENCY = 4  # Leaf question prompts in flight at once (pass 2)
+    LEAF_BATCH_SIZE = 4         # Sibling leaves sharing one question prompt (1 = one prompt per leaf)
+    INGEST_CHECKPOINT_DIR = "data/ingest"  # Per-topic skeleton + finished leaves, for resuming a crashed run
+    INGEST_JOB_WORKERS = 2                 # Background ingestion jobs run at once (API server)
+    INGEST_JOBS_KEPT = 100                 # Finished jobs kept for status queries
+
+    # Skeleton Generation (pass 1)
+    SKELETON_WINDOW_CHARS = 80000  # Corpora up to this size get a one-shot skeleton prompt...
+    SKELETON_MAP_CHARS = 60000     # ...larger ones are outlined in parts of this size, then merged
+    SKELETON_STREAMING = True      # Stream one-shot skeletons and start leaf questions as leaves arrive
+
+    # Corpus Retrieval (per-leaf context for question prompts)
+    RETRIEVAL_CHUNK_CHARS = 1000  # Corpus chunk size for per-leaf context retrieval (BM25)
+    RETRIEVAL_TOP_K = 3           # Chunks retrieved per leaf for its question prompt
     
-    # Rate Limiting
+    # Rate Limiting (shared by every LLM call in the process)
     API_RETRY_COUNT = 3
     API_RETRY_DELAY_EXP = 2 # Exponential backoff base
-    API_DELAY_SECONDS = 2   # Sleep between calls
+    API_RETRY_MAX_DELAY = 60 # Cap for a single backoff sleep (seconds)
+    LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "30"))
+    LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "1000000"))
+    LLM_BURST_SECONDS = 10               # Max quota that can accumulate while idle
+    LLM_MIN_CAPACITY_FRACTION = 0.1      # Floor when shrinking capacity after 429s
+    LLM_CAPACITY_RECOVERY_STEP = 0.05    # Capacity regained per successful call
+    LLM_EXPECTED_OUTPUT_TOKENS = 1000    # Reserved per call until real usage is known
+
+    # LLM Response Cache (content-addressed, on disk)
+    LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "1") != "0"  # LLM_CACHE=0 to opt out
+    LLM_CACHE_DIR = "data/cache/llm"
+    LLM_CACHE_MAX_BYTES = 512 * 1024 * 1024
+    # The tutor's "new question" variations bypass the cache unless LLM_CACHE_TUTOR=1: cached ones are
+    # shared by every learner at the same attempt count on a node, and replayed after a reset
+    LLM_CACHE_TUTOR_VARIATIONS = os.getenv("LLM_CACHE_TUTOR", "0") == "1"
+
+    # URL Fetching (links.txt / urls.txt during ingestion)
+    URL_FETCH_CONCURRENCY = 8              # Parallel fetches (and pooled connections per host)
+    URL_FETCH_TIMEOUT = 10                 # Seconds for connect / between bytes, and for the whole body
+    URL_FETCH_MAX_BYTES = 5 * 1024 * 1024  # Bodies are streamed and cut off past this
+    URL_TEXT_MAX_CHARS = 20000             # Extracted text kept per URL
+    URL_CACHE_DIR = "data/cache/urls"      # Extracted text + ETag/Last-Modified for conditional refetches
 
     # Tutor Settings
     TUTOR_MASTERY_STREAK = 3      # Correct answers needed to promote difficulty
     TUTOR_STARTING_DIFFICULTY = "intermediate"
     TUTOR_MAX_DYNAMIC_RETRIES = 3 # Max dynamic questions if user keeps failing
+    TUTOR_HISTORY_SIZE = 20       # Recent answers kept per node (older ones only survive as counters)
+    TUTOR_LLM_RETRIES = 1         # A learner is waiting: retry dynamic generation at most once
+    TUTOR_LLM_DEADLINE = 0.8      # Seconds a learner waits for a dynamic question before getting a static one
+    TUTOR_LLM_TIMEOUT = 15        # Hard cap on a generation that missed the deadline (its question is pooled)
+    TUTOR_HEDGE_ENABLED = os.getenv("LLM_HEDGE", "1") != "0"
+    TUTOR_HEDGE_PERCENTILE = 95   # Send a second, identical request once the first is slower than this
+    TUTOR_HEDGE_DEFAULT_DELAY = 0.4 # Hedge delay (seconds) until enough latencies have been observed
+    TUTOR_RETRY_AFTER_SECONDS = 5 # Retry-After sent when no question can be served yet (empty leaf, LLM down)
+
+    # LLM Circuit Breaker (tutor hot path)
+    LLM_BREAKER_FAILURES = 5      # Consecutive failures/deadline misses before we stop calling the LLM
+    LLM_BREAKER_RESET_SECONDS = 30 # How long it stays open before a single probe call is let through
+    LLM_LATENCY_WINDOW = 200      # Recent call latencies kept for the hedging percentile
+    LLM_LATENCY_MIN_SAMPLES = 20
+
+    # Dynamic Question Prefetch (warm pool per node & difficulty)
+    PREFETCH_ENABLED = os.getenv("PREFETCH", "1") != "0"
+    PREFETCH_POOL_DEPTH = 2       # Pre-generated questions kept ready per (topic, node, difficulty)
+    PREFETCH_LOW_WATERMARK = 1    # Start topping up once a learner has this many unseen static questions left
+    PREFETCH_MAX_CONCURRENCY = 4  # Background generations in flight across all sessions
+    PREFETCH_MAX_POOLED = 10000   # Total pooled questions kept in memory (least recently used pools dropped)
+
+    # Knowledge Base Cache
+    KB_DB_DIR = "data/db"
+    KB_CACHE_MAX_BYTES = 256 * 1024 * 1024  # Budget measured in on-disk JSON bytes
+    KB_DYNAMIC_QUESTIONS_MAX = 5000 # Generated questions kept gradeable per cached KB (LRU; sessions also keep their own)
+
+    # Session Settings (API server)
+    SESSIONS_DIR = "data/sessions"
+    SESSION_STORE_BACKEND = os.getenv("SESSION_STORE_BACKEND", "file")  # "file" (JSON + event log) or "sqlite"
+    SESSION_DB_PATH = "data/sessions/sessions.db"
+    SESSION_CACHE_SIZE = 1000       # Max live TutorAgents kept in memory (LRU)
+    SESSION_IDLE_SECONDS = 15 * 60  # Idle sessions are dropped from memory (every answer is already stored)
+    SESSION_SNAPSHOT_EVERY = 50     # Answer events appended before the log is compacted into a snapshot
+    SESSION_SNAPSHOT_FORMAT = os.getenv("SESSION_SNAPSHOT_FORMAT", "compact")  # "compact" (bitsets/arrays) or "json"
+    SESSION_SERVED_QUESTIONS = 8    # Dynamic questions per session kept gradeable by every worker
+    SESSION_DB_COMMIT_BATCH = 64    # SQLite store: queued answers committed together in one transaction at most
 
     # Pricing (USD per 1M tokens) - Based on Gemini 1.5 Flash rates as placeholder
     PRICE_PER_1M_INPUT_TOKENS = 0.10
@@ -0,0 +1,20 @@
+import os
+import tempfile
+
+
+def atomic_write_text(path: str, content: str):
+    """Writes content to path via a temp file + rename, so readers never see a partial file."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.basename(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".tmp-{base}-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
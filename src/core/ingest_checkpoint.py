@@ -0,0 +1,90 @@
+import os
+import json
+import shutil
+from typing import Dict, List, Optional
+
+from src.core.schema import KnowledgeBase, KnowledgeNode, Question, Difficulty
+from src.core.config import Config
+from src.core.kb_store import save_knowledge_base, load_knowledge_base
+
+
+class IngestCheckpoint:
+    """
+    On-disk progress of one topic's ingestion, so a crashed or rate-limited run can resume.
+
+    Layout under checkpoint_dir/{topic}/:
+      skeleton.json - the pass 1 tree (KB format v2), incl. source_hashes of the inputs it was built from
+      leaves.jsonl  - one line per finished leaf: {"node_id": ..., "questions": {difficulty: [...]}}
+    Only leaves that actually got questions are recorded, so a resume retries failed/empty ones.
+    """
+
+    def __init__(self, topic_name: str, checkpoint_dir: str = Config.INGEST_CHECKPOINT_DIR):
+        self.topic_name = topic_name
+        self.dir = os.path.join(checkpoint_dir, topic_name)
+        self.skeleton_path = os.path.join(self.dir, "skeleton.json")
+        self.leaves_path = os.path.join(self.dir, "leaves.jsonl")
+
+    def exists(self) -> bool:
+        return os.path.exists(self.skeleton_path)
+
+    def save_skeleton(self, kb: KnowledgeBase):
+        """Starts a new checkpoint: writes the skeleton and drops any previously finished leaves."""
+        save_knowledge_base(kb, self.skeleton_path)
+        if os.path.exists(self.leaves_path):
+            os.remove(self.leaves_path)
+
+    def record_leaves(self, leaves: List[KnowledgeNode]):
+        """Appends finished leaves (durably) to the log; leaves without questions are skipped."""
+        lines = []
+        for leaf in leaves:
+            if not any(leaf.questions.values()): continue
+            questions = {d.value: [q.model_dump(mode="json") for q in qs] for d, qs in leaf.questions.items()}
+            lines.append(json.dumps({"node_id": leaf.id, "questions": questions}, ensure_ascii=False) + "\n")
+        if not lines: return
+        os.makedirs(self.dir, exist_ok=True)
+        with open(self.leaves_path, "a") as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def load(self, source_hashes: Dict[str, str]) -> Optional[KnowledgeBase]:
+        """
+        Returns the checkpointed KB with finished leaves filled in, or None if there is no
+        checkpoint or it was built from different inputs (then it's stale and gets discarded).
+        """
+        if not self.exists(): return None
+        try:
+            kb = load_knowledge_base(self.skeleton_path, auto_migrate=False)
+        except Exception as e:
+            print(f"      ⚠️ Unreadable ingestion checkpoint ({e}). Starting over.")
+            self.clear()
+            return None
+        if kb.source_hashes != source_hashes:
+            print("      🗑️  Sources changed since the checkpoint was taken. Starting over.")
+            self.clear()
+            return None
+
+        for leaf_id, questions in self._read_leaves().items():
+            node = kb.node_map.get(leaf_id)
+            if node: node.questions = questions
+        return kb
+
+    def clear(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    # --- Helpers ---
+
+    def _read_leaves(self) -> Dict[str, Dict[Difficulty, List[Question]]]:
+        leaves = {}
+        if not os.path.exists(self.leaves_path): return leaves
+        with open(self.leaves_path, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue # Torn last line from a crash mid-write
+                questions = {d: [] for d in Difficulty}
+                for diff, items in entry["questions"].items():
+                    questions[Difficulty(diff)] = [Question.model_validate(q) for q in items]
+                leaves[entry["node_id"]] = questions
+        return leaves
@@ -0,0 +1,87 @@
+import json
+from typing import Callable, List, Optional
+
+
+class _Frame:
+    __slots__ = ("is_object", "start", "key", "expect_key", "fields", "has_children")
+
+    def __init__(self, is_object: bool, start: int, key: Optional[str] = None):
+        self.is_object = is_object
+        self.start = start
+        self.key = key           # Objects: the key being read/filled. Arrays: the key they are the value of.
+        self.expect_key = True
+        self.fields = {}         # Scalar string fields seen so far (e.g. "name")
+        self.has_children = False
+
+
+class TreeLeafScanner:
+    """
+    Incremental scanner for a streamed JSON tree of {"name": ..., "children": [...]} objects.
+
+    Feed it text fragments as they arrive; on_leaf(leaf_dict, ancestor_names) fires as soon as
+    a node with no children is closed, so leaves can be processed before the rest of the tree
+    has been generated. ancestor_names are the "name" fields of the enclosing nodes (root first),
+    None where a parent's name hadn't been seen before its children.
+    """
+
+    def __init__(self, on_leaf: Callable[[dict, List[Optional[str]]], None], children_key: str = "children"):
+        self.on_leaf = on_leaf
+        self.children_key = children_key
+        self._text = ""
+        self._pos = 0
+        self._stack: List[_Frame] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far."""
+        return self._text
+
+    def feed(self, fragment: str):
+        self._text += fragment
+        text = self._text
+        stack = self._stack
+        for i in range(self._pos, len(text)):
+            c = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._on_string(json.loads(text[self._string_start:i + 1]))
+                continue
+
+            if c == '"':
+                self._in_string = True
+                self._string_start = i
+            elif c == "{":
+                if stack and not stack[-1].is_object and stack[-1].key == self.children_key and len(stack) > 1:
+                    stack[-2].has_children = True
+                stack.append(_Frame(True, i))
+            elif c == "[":
+                stack.append(_Frame(False, i, stack[-1].key if stack and stack[-1].is_object else None))
+            elif c == "}":
+                frame = stack.pop()
+                parent = stack[-1] if stack else None
+                if not frame.has_children and parent and not parent.is_object and parent.key == self.children_key:
+                    ancestors = [f.fields.get("name") for f in stack if f.is_object]
+                    self.on_leaf(json.loads(text[frame.start:i + 1]), ancestors)
+            elif c == "]":
+                stack.pop()
+            elif c == "," and stack and stack[-1].is_object:
+                stack[-1].expect_key = True
+        self._pos = len(text)
+
+    def _on_string(self, value: str):
+        if not self._stack or not self._stack[-1].is_object:
+            return
+        frame = self._stack[-1]
+        if frame.expect_key:
+            frame.key = value
+            frame.expect_key = False
+        else:
+            frame.fields[frame.key] = value
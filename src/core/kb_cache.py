@@ -0,0 +1,140 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from src.core.kb_store import load_knowledge_base
+from src.core.kb_view import CompactKnowledgeBase
+from src.core.config import Config
+
+
+class _CacheEntry:
+    def __init__(self, kb: CompactKnowledgeBase, fingerprint: Tuple[int, int]):
+        self.kb = kb
+        self.fingerprint = fingerprint  # (mtime_ns, size) of the file it was parsed from
+        self.cost = fingerprint[1]      # On-disk size is our proxy for in-memory footprint
+
+
+class KnowledgeBaseCache:
+    """
+    Process-wide, read-only cache of parsed KnowledgeBases, held as CompactKnowledgeBase views
+    (the Pydantic tree is dropped once the view is built).
+    Entries are keyed by topic and invalidated when the file's mtime/size changes;
+    least recently used topics are evicted once the byte budget is exceeded.
+    Views handed out are shared between sessions and must not be mutated (beyond registering dynamic questions).
+    """
+
+    def __init__(self, db_dir: str = Config.KB_DB_DIR, max_bytes: int = Config.KB_CACHE_MAX_BYTES):
+        self.db_dir = db_dir
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._topic_locks: Dict[str, threading.Lock] = {}
+        self._ready = threading.Event()
+        self._preload_errors: Dict[str, str] = {}
+
+    def path_for(self, topic_name: str) -> str:
+        return os.path.join(self.db_dir, f"{topic_name}.json")
+
+    def get(self, topic_name: str) -> CompactKnowledgeBase:
+        """Returns the parsed KB for a topic, loading (or reloading) it from disk if needed."""
+        path = self.path_for(topic_name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self.invalidate(topic_name)
+            raise FileNotFoundError(f"Knowledge Base for '{topic_name}' not found. Run ingestion first.")
+        fingerprint = (stat.st_mtime_ns, stat.st_size)
+
+        cached = self._lookup(topic_name, fingerprint)
+        if cached:
+            return cached
+
+        # One loader per topic; concurrent requests for the same topic wait for it.
+        with self._topic_lock(topic_name):
+            cached = self._lookup(topic_name, fingerprint)
+            if cached:
+                return cached
+
+            kb = CompactKnowledgeBase(load_knowledge_base(path))
+            # Loading may have migrated the file in place; fingerprint what is on disk now.
+            stat = os.stat(path)
+            self._store(topic_name, _CacheEntry(kb, (stat.st_mtime_ns, stat.st_size)))
+            return kb
+
+    def invalidate(self, topic_name: str):
+        with self._lock:
+            entry = self._entries.pop(topic_name, None)
+            if entry:
+                self._total_bytes -= entry.cost
+
+    def list_topics(self) -> List[str]:
+        if not os.path.exists(self.db_dir):
+            return []
+        return sorted(
+            f[:-len(".json")] for f in os.listdir(self.db_dir)
+            if f.endswith(".json") and not f.startswith(".")  # Skip in-flight atomic writes
+        )
+
+    # --- Warm-up ---
+
+    def preload_all(self):
+        """Parses every topic in db_dir. Failures are recorded, not raised."""
+        try:
+            for topic in self.list_topics():
+                try:
+                    self.get(topic)
+                except Exception as e:
+                    self._preload_errors[topic] = str(e)
+                    print(f"      ⚠️ Failed to preload KB '{topic}': {e}")
+        finally:
+            self._ready.set()
+
+    def preload_in_background(self) -> threading.Thread:
+        thread = threading.Thread(target=self.preload_all, name="kb-preload", daemon=True)
+        thread.start()
+        return thread
+
+    def status(self) -> dict:
+        with self._lock:
+            loaded = list(self._entries.keys())
+            total = self._total_bytes
+        return {
+            "ready": self._ready.is_set(),
+            "topics_loaded": sorted(loaded),
+            "cached_bytes": total,
+            "max_bytes": self.max_bytes,
+            "errors": dict(self._preload_errors),
+        }
+
+    # --- Helpers ---
+
+    def _lookup(self, topic_name: str, fingerprint: Tuple[int, int]) -> Optional[CompactKnowledgeBase]:
+        with self._lock:
+            entry = self._entries.get(topic_name)
+            if entry and entry.fingerprint == fingerprint:
+                self._entries.move_to_end(topic_name)
+                return entry.kb
+        return None
+
+    def _store(self, topic_name: str, entry: _CacheEntry):
+        with self._lock:
+            old = self._entries.pop(topic_name, None)
+            if old:
+                self._total_bytes -= old.cost
+            self._entries[topic_name] = entry
+            self._total_bytes += entry.cost
+
+            # Evict LRU topics, but always keep the one we just loaded.
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._total_bytes -= evicted.cost
+
+    def _topic_lock(self, topic_name: str) -> threading.Lock:
+        with self._lock:
+            return self._topic_locks.setdefault(topic_name, threading.Lock())
+
+
+# Shared by every TutorAgent in the process
+kb_cache = KnowledgeBaseCache()
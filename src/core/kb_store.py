@@ -0,0 +1,103 @@
+import os
+import json
+from typing import List
+
+from src.core.schema import KnowledgeBase, KnowledgeNode
+from src.core.config import Config
+from src.core.fs_utils import atomic_write_text
+
+# v1: KnowledgeBase.model_dump_json() - the recursive `root` tree PLUS a flat `node_map`,
+#     so every node and question is stored (and validated) twice.
+# v2: Every node stored once, in document order, with a parent reference.
+#     `children` and `node_map` are rebuilt on load.
+KB_FORMAT_VERSION = 2
+
+
+def save_knowledge_base(kb: KnowledgeBase, path: str):
+    """Writes kb in the normalized format. Atomic: readers see either the old or the new file."""
+    nodes = []
+    stack = [kb.root]
+    while stack:
+        node = stack.pop()
+        nodes.append(node.model_dump(mode="json", exclude={"children"}))
+        stack.extend(reversed(node.children))
+
+    payload = {
+        "format_version": KB_FORMAT_VERSION,
+        "topic_name": kb.topic_name,
+        "root_id": kb.root.id,
+        "source_hashes": kb.source_hashes,
+        "nodes": nodes,
+    }
+    atomic_write_text(path, json.dumps(payload, indent=2, ensure_ascii=False))
+
+
+def load_knowledge_base(path: str, auto_migrate: bool = True) -> KnowledgeBase:
+    """Reads a KB in any supported format; v1 files are rewritten as v2 when auto_migrate is set."""
+    with open(path, "r") as f:
+        data = json.load(f)
+
+    version = data.get("format_version", 1)
+    if version == KB_FORMAT_VERSION:
+        return _from_normalized(data)
+    if version != 1:
+        raise ValueError(f"Unsupported KB format_version {version} in {path}")
+
+    kb = _from_legacy(data)
+    if auto_migrate:
+        try:
+            save_knowledge_base(kb, path)
+            print(f"      🔁 Migrated {path} to KB format v{KB_FORMAT_VERSION}")
+        except OSError as e:
+            print(f"      ⚠️ Could not migrate {path}: {e}")
+    return kb
+
+
+def migrate_all(db_dir: str = Config.KB_DB_DIR) -> List[str]:
+    """Upgrades every v1 KB in db_dir in place. Returns the migrated paths."""
+    migrated = []
+    for f in sorted(os.listdir(db_dir)):
+        if not f.endswith(".json"): continue
+        path = os.path.join(db_dir, f)
+        with open(path, "r") as fh:
+            version = json.load(fh).get("format_version", 1)
+        if version == 1:
+            load_knowledge_base(path, auto_migrate=True)
+            migrated.append(path)
+    return migrated
+
+# --- Helpers ---
+
+def _from_normalized(data: dict) -> KnowledgeBase:
+    node_map = {}
+    for raw in data["nodes"]:
+        node = KnowledgeNode.model_validate(raw)
+        node_map[node.id] = node
+        # Parents precede children (document order), so the parent is already built.
+        if node.parent_id and node.parent_id in node_map:
+            node_map[node.parent_id].children.append(node)
+
+    return KnowledgeBase(
+        topic_name=data["topic_name"],
+        root=node_map[data["root_id"]],
+        node_map=node_map,
+        source_hashes=data.get("source_hashes", {})
+    )
+
+
+def _from_legacy(data: dict) -> KnowledgeBase:
+    # Only the tree is authoritative; rebuild node_map from it so both share the same objects
+    # (validating node_map separately would produce detached copies).
+    root = KnowledgeNode.model_validate(data["root"])
+    node_map = {}
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        node_map[node.id] = node
+        stack.extend(node.children)
+    return KnowledgeBase(topic_name=data["topic_name"], root=root, node_map=node_map)
+
+
+if __name__ == "__main__":
+    for p in migrate_all():
+        print(f"✅ {p}")
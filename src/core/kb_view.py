@@ -0,0 +1,239 @@
+import sys
+import hashlib
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from src.core.schema import KnowledgeBase, Question, QuestionType, Difficulty, AnswerKey, IndexedQuestion
+from src.core.config import Config
+
+NodeIndex = int # Dense node index into a CompactKnowledgeBase; -1 means "none"
+
+_DIFFICULTIES = tuple(Difficulty)
+_DIFFICULTY_SLOT = {d: i for i, d in enumerate(_DIFFICULTIES)}
+_QUESTION_TYPES = tuple(QuestionType)
+_QUESTION_TYPE_SLOT = {t: i for i, t in enumerate(_QUESTION_TYPES)}
+_PATH_SEPARATOR = " > "
+
+
+class NodeTable:
+    """
+    A topic's node ids in dense-index order. The fingerprint identifies this exact numbering,
+    so data encoded against it (see session_codec) can tell whether a KB still matches.
+    """
+
+    def __init__(self, ids: List[str]):
+        self.ids = ids
+        self._index: Dict[str, NodeIndex] = {node_id: i for i, node_id in enumerate(ids)}
+        self.fingerprint = hashlib.sha256("\n".join(ids).encode("utf-8")).hexdigest()[:16]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def index_of(self, node_id: str) -> Optional[NodeIndex]:
+        return self._index.get(node_id)
+
+
+class CompactKnowledgeBase:
+    """
+    Read-only, array-backed runtime view of a KnowledgeBase, used for serving.
+
+    Nodes are numbered 0..size-1 in document (DFS pre-) order, so the root is 0, a parent
+    always precedes its children and the leaves in index order are the teaching order.
+    The tree is held as parent / first-child / next-sibling int arrays plus a leaf bitmap;
+    paths as interned segments (a node's path is its ancestors' segments joined by " > ");
+    and every question sits in one flat table of parallel field columns, sliced per
+    (node, difficulty) by an offsets array. A Question model is only built when one is read
+    (see question_at); answer keys are derived at grading time. Dynamically generated questions can still be registered for grading; only the most
+    recent `max_dynamic` are kept (sessions keep the ones they served, see SessionStore).
+    """
+
+    def __init__(self, kb: KnowledgeBase, max_dynamic: int = Config.KB_DYNAMIC_QUESTIONS_MAX):
+        self.topic_name = kb.topic_name
+
+        order, parents = [], []
+        stack = [(kb.root, -1)]
+        while stack:
+            node, p = stack.pop()
+            i = len(order)
+            order.append(node)
+            parents.append(p)
+            stack.extend((child, i) for child in reversed(node.children))
+        n = len(order)
+
+        self.ids: List[str] = [node.id for node in order]
+        self.node_table = NodeTable(self.ids)
+        self.parent = array("i", parents)
+        self.first_child = array("i", [-1] * n)
+        self.next_sibling = array("i", [-1] * n)
+        self._leaf_bits = bytearray((n + 7) // 8)
+        self._names: List[str] = []
+        self._descriptions: List[str] = []
+        self._segments: List[str] = []        # Interned path segments
+        self._segment_of = array("i", [0] * n) # Node -> its own (last) path segment
+        self._path_overrides: Dict[NodeIndex, str] = {} # Full paths that aren't "<parent path> > <segment>"
+
+        # Question table: one column per Question field, row = position in the table
+        self._q_ids: List[str] = []
+        self._q_difficulty = array("B")   # Index into _DIFFICULTIES
+        self._q_type = array("B")         # Index into _QUESTION_TYPES
+        self._q_content: List[str] = []
+        self._q_options: List[Optional[Tuple[str, ...]]] = []
+        self._q_correct: List[str] = []
+        self._q_explanation: List[str] = []
+        self._q_metadata = array("i")     # Index into _metadata (ingestion repeats the same few dicts)
+        self._metadata: List[Dict[str, Any]] = []
+        self._question_node = array("i")
+        self._question_offsets = array("i", [0] * (n * len(_DIFFICULTIES) + 1))
+        self._question_pos: Dict[str, int] = {}
+        self._dynamic: "OrderedDict[str, IndexedQuestion]" = OrderedDict()
+        self._dynamic_lock = threading.Lock()
+        self.max_dynamic = max_dynamic
+
+        segment_ids: Dict[str, int] = {}
+        metadata_ids: Dict[str, int] = {}
+        last_child = array("i", [-1] * n)
+        for i, node in enumerate(order):
+            self._names.append(sys.intern(node.name))
+            self._descriptions.append(node.description)
+            if node.is_leaf:
+                self._leaf_bits[i >> 3] |= 1 << (i & 7)
+
+            p = parents[i]
+            if p >= 0:
+                # Children are numbered in order: link each one after its previous sibling
+                if last_child[p] < 0:
+                    self.first_child[p] = i
+                else:
+                    self.next_sibling[last_child[p]] = i
+                last_child[p] = i
+
+            prefix = order[p].path + _PATH_SEPARATOR if p >= 0 else ""
+            if node.path.startswith(prefix):
+                segment = node.path[len(prefix):]
+            else:
+                segment = node.name
+                self._path_overrides[i] = node.path
+            if segment not in segment_ids:
+                segment_ids[segment] = len(self._segments)
+                self._segments.append(sys.intern(segment))
+            self._segment_of[i] = segment_ids[segment]
+
+            for slot, difficulty in enumerate(_DIFFICULTIES):
+                for q in node.questions.get(difficulty, []):
+                    self._question_pos[q.id] = len(self._q_ids)
+                    self._add_question(q, i, metadata_ids)
+                self._question_offsets[i * len(_DIFFICULTIES) + slot + 1] = len(self._q_ids)
+
+        self.leaf_order = array("i", [i for i in range(n) if self.is_leaf(i)])
+        self.leaf_ids: List[str] = [self.ids[i] for i in self.leaf_order]
+        # Leaf id -> index in leaf_ids: sessions bind their mastered-leaf bitsets to this one dict
+        self.leaf_positions: Dict[str, int] = {node_id: pos for pos, node_id in enumerate(self.leaf_ids)}
+
+    def _add_question(self, q: Question, node: NodeIndex, metadata_ids: Dict[str, int]):
+        self._q_ids.append(q.id)
+        self._q_difficulty.append(_DIFFICULTY_SLOT[q.difficulty])
+        self._q_type.append(_QUESTION_TYPE_SLOT[q.type])
+        self._q_content.append(q.content)
+        self._q_options.append(tuple(sys.intern(opt) for opt in q.options) if q.options is not None else None)
+        self._q_correct.append(sys.intern(q.correct_answer))
+        self._q_explanation.append(q.explanation)
+        key = repr(sorted(q.metadata.items()))
+        if key not in metadata_ids:
+            metadata_ids[key] = len(self._metadata)
+            self._metadata.append(dict(q.metadata))
+        self._q_metadata.append(metadata_ids[key])
+        self._question_node.append(node)
+
+    @property
+    def size(self) -> int:
+        return len(self.ids)
+
+    @property
+    def root(self) -> NodeIndex:
+        return 0
+
+    # --- Nodes ---
+
+    def index_of(self, node_id: str) -> Optional[NodeIndex]:
+        return self.node_table.index_of(node_id)
+
+    def is_leaf(self, i: NodeIndex) -> bool:
+        return bool(self._leaf_bits[i >> 3] >> (i & 7) & 1)
+
+    def name(self, i: NodeIndex) -> str:
+        return self._names[i]
+
+    def description(self, i: NodeIndex) -> str:
+        return self._descriptions[i]
+
+    def path(self, i: NodeIndex) -> str:
+        segments = []
+        while i >= 0:
+            override = self._path_overrides.get(i)
+            if override is not None:
+                segments.append(override)
+                break
+            segments.append(self._segments[self._segment_of[i]])
+            i = self.parent[i]
+        return _PATH_SEPARATOR.join(reversed(segments))
+
+    def children(self, i: NodeIndex) -> Iterator[NodeIndex]:
+        child = self.first_child[i]
+        while child >= 0:
+            yield child
+            child = self.next_sibling[child]
+
+    # --- Questions ---
+
+    def question_range(self, i: NodeIndex, difficulty: Difficulty) -> range:
+        """Table positions of a node's static questions at one difficulty, in ingestion order."""
+        slot = i * len(_DIFFICULTIES) + _DIFFICULTY_SLOT[difficulty]
+        return range(self._question_offsets[slot], self._question_offsets[slot + 1])
+
+    def node_question_range(self, i: NodeIndex) -> range:
+        start = i * len(_DIFFICULTIES)
+        return range(self._question_offsets[start], self._question_offsets[start + len(_DIFFICULTIES)])
+
+    def question_id(self, pos: int) -> str:
+        return self._q_ids[pos]
+
+    def question_at(self, pos: int) -> Question:
+        """Builds the Question stored at a table position (fields were validated at ingestion)."""
+        options = self._q_options[pos]
+        return Question.model_construct(
+            id=self._q_ids[pos],
+            difficulty=_DIFFICULTIES[self._q_difficulty[pos]],
+            type=_QUESTION_TYPES[self._q_type[pos]],
+            content=self._q_content[pos],
+            options=list(options) if options is not None else None,
+            correct_answer=self._q_correct[pos],
+            explanation=self._q_explanation[pos],
+            metadata=dict(self._metadata[self._q_metadata[pos]])
+        )
+
+    def questions(self, i: NodeIndex, difficulty: Difficulty) -> Sequence[Question]:
+        """The static questions of a node at one difficulty, in ingestion order (built on each call)."""
+        return [self.question_at(pos) for pos in self.question_range(i, difficulty)]
+
+    def all_questions(self, i: NodeIndex) -> Sequence[Question]:
+        return [self.question_at(pos) for pos in self.node_question_range(i)]
+
+    def get_question(self, question_id: str) -> Optional[IndexedQuestion]:
+        pos = self._question_pos.get(question_id)
+        if pos is None:
+            with self._dynamic_lock:
+                return self._dynamic.get(question_id)
+        question = self.question_at(pos)
+        return IndexedQuestion(self.ids[self._question_node[pos]], question, AnswerKey.for_question(question))
+
+    def register_question(self, node_id: str, question: Question) -> IndexedQuestion:
+        """Makes a dynamically generated question gradeable (it is not added to the node's buckets)."""
+        entry = IndexedQuestion(node_id, question, AnswerKey.for_question(question))
+        with self._dynamic_lock:
+            self._dynamic[question.id] = entry
+            self._dynamic.move_to_end(question.id)
+            while len(self._dynamic) > self.max_dynamic:
+                self._dynamic.popitem(last=False)
+        return entry
@@ -0,0 +1,288 @@
+import time
+import json
+import random
+import asyncio
+from typing import Any, Iterator, Optional
+
+from src.core.config import Config
+from src.core.rate_limiter import TokenBucketRateLimiter, llm_rate_limiter
+from src.core.llm_cache import LLMResponseCache, llm_cache
+from src.core.llm_guard import LatencyTracker
+
+JSON_GENERATION_CONFIG = {"response_mime_type": "application/json"}
+
+
+def is_rate_limit_error(e: Exception) -> bool:
+    # google.api_core raises ResourceExhausted (HTTP 429); fall back to sniffing the message.
+    return type(e).__name__ in ("ResourceExhausted", "TooManyRequests") or "429" in str(e)
+
+
+def estimate_tokens(prompt: str) -> int:
+    """Rough pre-call estimate (~4 chars/token) plus the output we expect back."""
+    return len(prompt) // 4 + Config.LLM_EXPECTED_OUTPUT_TOKENS
+
+
+def actual_tokens(response: Any) -> Optional[int]:
+    usage = getattr(response, "usage_metadata", None)
+    if not usage:
+        return None
+    return (usage.prompt_token_count or 0) + (usage.candidates_token_count or 0)
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter, so parallel callers don't retry in lockstep."""
+    cap = min(Config.API_RETRY_MAX_DELAY, Config.API_RETRY_DELAY_EXP ** (attempt + 1))
+    return random.uniform(0, cap)
+
+
+def generate_with_retry(
+    model,
+    prompt: str,
+    generation_config: Optional[dict] = None,
+    retries: int = Config.API_RETRY_COUNT,
+    limiter: TokenBucketRateLimiter = llm_rate_limiter,
+    cache: Optional[LLMResponseCache] = llm_cache,
+    cache_salt: str = "",
+):
+    """
+    Calls model.generate_content through the response cache and the shared rate limiter.
+    Cache hits come back as CachedResponse (from_cache=True) without touching the API.
+    Retries with jittered backoff; 429s also shrink the limiter's capacity.
+    Raises the last error once retries are exhausted.
+    Pass cache=None to bypass the cache; cache_salt separates otherwise identical prompts.
+    """
+    config = generation_config or JSON_GENERATION_CONFIG
+
+    key = None
+    if cache is not None and cache.enabled:
+        key = cache.make_key(model_name_of(model), prompt, config, cache_salt)
+        cached = cache.get(key)
+        if cached:
+            return cached
+
+    estimate = estimate_tokens(prompt)
+
+    for attempt in range(retries + 1):
+        limiter.acquire(estimate)
+        try:
+            response = model.generate_content(prompt, generation_config=config)
+        except Exception as e:
+            limiter.reconcile(estimate, 0)
+            if attempt == retries:
+                raise
+            time.sleep(_retry_wait(e, attempt, retries, limiter))
+            continue
+
+        limiter.on_success()
+        used = actual_tokens(response)
+        if used is not None:
+            limiter.reconcile(estimate, used)
+        if key and _is_cacheable(response, config):
+            cache.put(key, response)
+        return response
+
+
+async def agenerate_with_retry(
+    model,
+    prompt: str,
+    generation_config: Optional[dict] = None,
+    retries: int = Config.API_RETRY_COUNT,
+    limiter: TokenBucketRateLimiter = llm_rate_limiter,
+    cache: Optional[LLMResponseCache] = llm_cache,
+    cache_salt: str = "",
+):
+    """
+    Coroutine version of generate_with_retry (same cache, limiter and retry policy).
+    Waiting - for quota, backoff or the model - suspends the coroutine instead of holding a thread.
+    Uses model.generate_content_async, or runs generate_content in a worker thread for models without it.
+    Cancelling it (e.g. asyncio.wait_for timing out) gives the reserved quota back.
+    The response cache is read and written in worker threads (it's on disk: a put fsyncs).
+    """
+    config = generation_config or JSON_GENERATION_CONFIG
+
+    key = None
+    if cache is not None and cache.enabled:
+        key = cache.make_key(model_name_of(model), prompt, config, cache_salt)
+        cached = await asyncio.to_thread(cache.get, key)
+        if cached:
+            return cached
+
+    estimate = estimate_tokens(prompt)
+
+    for attempt in range(retries + 1):
+        await limiter.acquire_async(estimate)
+        try:
+            if hasattr(model, "generate_content_async"):
+                response = await model.generate_content_async(prompt, generation_config=config)
+            else:
+                response = await asyncio.to_thread(model.generate_content, prompt, generation_config=config)
+        except asyncio.CancelledError:
+            limiter.reconcile(estimate, 0)
+            raise
+        except Exception as e:
+            limiter.reconcile(estimate, 0)
+            if attempt == retries:
+                raise
+            await asyncio.sleep(_retry_wait(e, attempt, retries, limiter))
+            continue
+
+        limiter.on_success()
+        used = actual_tokens(response)
+        if used is not None:
+            limiter.reconcile(estimate, used)
+        if key and _is_cacheable(response, config):
+            await asyncio.to_thread(cache.put, key, response)
+        return response
+
+
+async def agenerate_hedged(
+    model,
+    prompt: str,
+    hedge_after: Optional[float],
+    latency: Optional[LatencyTracker] = None,
+    **kwargs,
+):
+    """
+    agenerate_with_retry with a hedged request: if the first call hasn't answered after
+    `hedge_after` seconds (or has already failed), an identical second call is sent and whichever
+    succeeds first wins; the other is cancelled. hedge_after=None disables hedging.
+    Raises the last error if every call fails. Successful call latencies are recorded in `latency`.
+    """
+    loop = asyncio.get_running_loop()
+    started = {}
+
+    def launch():
+        task = asyncio.ensure_future(agenerate_with_retry(model, prompt, **kwargs))
+        started[task] = loop.time()
+        return task
+
+    pending = {launch()}
+    hedged = hedge_after is None
+    error = None
+    try:
+        while pending:
+            timeout = None if hedged else max(0.0, hedge_after - (loop.time() - min(started.values())))
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.cancelled():
+                    continue
+                if task.exception() is None:
+                    if latency:
+                        latency.record(loop.time() - started[task])
+                    return task.result()
+                error = task.exception()
+            if not hedged:
+                hedged = True
+                pending.add(launch())
+    finally:
+        for task in pending:
+            task.cancel()
+    raise error or RuntimeError("All hedged LLM requests were cancelled")
+
+
+class StreamedResponse:
+    """
+    Iterable over the text fragments of a streamed generation (see stream_with_retry).
+    Once fully consumed, .text and .usage_metadata are available like on a regular response.
+    """
+
+    def __init__(self, fragments: Iterator[str]):
+        self._fragments = fragments
+        self._parts = []
+        self.usage_metadata = None
+        self.from_cache = False
+
+    def __iter__(self) -> Iterator[str]:
+        for fragment in self._fragments:
+            self._parts.append(fragment)
+            yield fragment
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+
+def stream_with_retry(
+    model,
+    prompt: str,
+    generation_config: Optional[dict] = None,
+    retries: int = Config.API_RETRY_COUNT,
+    limiter: TokenBucketRateLimiter = llm_rate_limiter,
+    cache: Optional[LLMResponseCache] = llm_cache,
+    cache_salt: str = "",
+) -> StreamedResponse:
+    """
+    Streaming counterpart of generate_with_retry: returns a StreamedResponse that yields text
+    as the model produces it. Failures before the first fragment are retried like
+    generate_with_retry; a failure mid-stream is raised to the consumer (the partial text
+    can't be taken back). Shares the cache key space with generate_with_retry, so a cached
+    non-streamed answer is replayed here (as a single fragment) and vice versa.
+    """
+    config = generation_config or JSON_GENERATION_CONFIG
+    key = cache.make_key(model_name_of(model), prompt, config, cache_salt) \
+        if cache is not None and cache.enabled else None
+    cached = cache.get(key) if key else None
+    result = StreamedResponse(iter(()))
+
+    def fragments() -> Iterator[str]:
+        if cached:
+            result.usage_metadata, result.from_cache = cached.usage_metadata, True
+            yield cached.text
+            return
+
+        estimate = estimate_tokens(prompt)
+        for attempt in range(retries + 1):
+            limiter.acquire(estimate)
+            started = False
+            try:
+                response = model.generate_content(prompt, generation_config=config, stream=True)
+                for chunk in response:
+                    text = chunk.text
+                    if text:
+                        started = True
+                        yield text
+            except Exception as e:
+                limiter.reconcile(estimate, 0)
+                if started or attempt == retries:
+                    raise
+                time.sleep(_retry_wait(e, attempt, retries, limiter))
+                continue
+
+            limiter.on_success()
+            result.usage_metadata = getattr(response, "usage_metadata", None)
+            used = actual_tokens(result)
+            if used is not None:
+                limiter.reconcile(estimate, used)
+            if key and _is_cacheable(result, config):
+                cache.put(key, result)
+            return
+
+    result._fragments = fragments()
+    return result
+
+
+def model_name_of(model) -> str:
+    return getattr(model, "model_name", None) or type(model).__name__
+
+
+def _retry_wait(e: Exception, attempt: int, retries: int, limiter: TokenBucketRateLimiter) -> float:
+    """How long to back off after a failed attempt; 429s also shrink the limiter's capacity."""
+    if is_rate_limit_error(e):
+        limiter.on_throttle()
+        wait_time = backoff_delay(attempt)
+        print(f"      ⏳ Hit Rate Limit (429). Retrying in {wait_time:.1f}s... (Attempt {attempt+1}/{retries})")
+    else:
+        wait_time = random.uniform(0.5, 1.5) # Short wait for other errors
+        print(f"      ⚠️ API Error: {e}")
+    return wait_time
+
+
+def _is_cacheable(response: Any, config: dict) -> bool:
+    # Don't pin a broken answer in the cache: JSON calls must return parseable JSON.
+    try:
+        text = response.text
+        if config.get("response_mime_type") == "application/json":
+            json.loads(text)
+        return True
+    except Exception:
+        return False
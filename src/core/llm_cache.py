@@ -0,0 +1,119 @@
+import os
+import json
+import hashlib
+import threading
+from types import SimpleNamespace
+from typing import Any, Optional
+
+from src.core.config import Config
+from src.core.fs_utils import atomic_write_text
+
+
+class CachedResponse:
+    """Stand-in for a Gemini response replayed from disk (exposes .text and .usage_metadata)."""
+    from_cache = True
+
+    def __init__(self, text: str, prompt_tokens: int = 0, output_tokens: int = 0):
+        self.text = text
+        self.usage_metadata = SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=output_tokens)
+
+
+class LLMResponseCache:
+    """
+    Content-addressed cache of LLM responses on disk.
+    Key = sha256(model name, prompt, generation config[, salt]); value = response text + token usage.
+    Reads refresh a file's mtime, and the least recently used files are deleted once
+    the directory grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir: str = Config.LLM_CACHE_DIR, max_bytes: int = Config.LLM_CACHE_MAX_BYTES,
+                 enabled: bool = Config.LLM_CACHE_ENABLED):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._total_bytes: Optional[int] = None  # Computed lazily on first write
+
+    @staticmethod
+    def make_key(model_name: str, prompt: str, generation_config: Optional[dict] = None, salt: str = "") -> str:
+        payload = json.dumps([model_name, prompt, generation_config or {}, salt], sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            os.utime(path)  # LRU: a hit makes this entry the most recent
+        except (OSError, ValueError):
+            return None
+        return CachedResponse(data["text"], data.get("prompt_tokens", 0), data.get("output_tokens", 0))
+
+    def put(self, key: str, response: Any):
+        if not self.enabled:
+            return
+        usage = getattr(response, "usage_metadata", None)
+        content = json.dumps({
+            "text": response.text,
+            "prompt_tokens": getattr(usage, "prompt_token_count", 0) or 0,
+            "output_tokens": getattr(usage, "candidates_token_count", 0) or 0,
+        })
+        path = self._path(key)
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_size()
+            existing = os.path.getsize(path) if os.path.exists(path) else 0
+            atomic_write_text(path, content)
+            self._total_bytes += len(content.encode("utf-8")) - existing
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def clear(self):
+        with self._lock:
+            for path, _, _ in self._entries():
+                os.remove(path)
+            self._total_bytes = 0
+
+    # --- Helpers ---
+
+    def _path(self, key: str) -> str:
+        # Shard by key prefix to keep directories small
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _entries(self):
+        if not os.path.exists(self.cache_dir):
+            return []
+        entries = []
+        for shard in os.listdir(self.cache_dir):
+            shard_dir = os.path.join(self.cache_dir, shard)
+            if not os.path.isdir(shard_dir): continue
+            for f in os.listdir(shard_dir):
+                if not f.endswith(".json"): continue
+                path = os.path.join(shard_dir, f)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, st.st_mtime, st.st_size))
+        return entries
+
+    def _scan_size(self) -> int:
+        return sum(size for _, _, size in self._entries())
+
+    def _evict(self):
+        # Drop least recently used entries until we are back under ~90% of the budget
+        target = self.max_bytes * 0.9
+        for path, _, size in sorted(self._entries(), key=lambda e: e[1]):
+            if self._total_bytes <= target:
+                break
+            try:
+                os.remove(path)
+                self._total_bytes -= size
+            except OSError:
+                pass
+
+
+# Shared by every LLM caller in the process
+llm_cache = LLMResponseCache()
@@ -0,0 +1,86 @@
+import time
+import threading
+from collections import deque
+from typing import Deque, Optional
+
+from src.core.config import Config
+
+
+class LatencyTracker:
+    """Sliding window of recent successful LLM call latencies, used to pick the hedging delay."""
+
+    def __init__(self, window: int = Config.LLM_LATENCY_WINDOW, min_samples: int = Config.LLM_LATENCY_MIN_SAMPLES):
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """The pct-th percentile in seconds, or None until min_samples calls have been seen."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < max(1, self.min_samples):
+            return None
+        return samples[min(len(samples) - 1, round(pct / 100 * (len(samples) - 1)))]
+
+
+class CircuitBreaker:
+    """
+    Stops calling a dependency that keeps failing.
+
+    closed: calls go through; `failure_threshold` consecutive failures open it.
+    open: allow() is False for `reset_seconds`, then the breaker goes half-open.
+    half-open: a single probe call is allowed; its success closes the breaker, its failure reopens it.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = Config.LLM_BREAKER_FAILURES,
+                 reset_seconds: float = Config.LLM_BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def is_closed(self) -> bool:
+        return self.state == self.CLOSED
+
+    def allow(self) -> bool:
+        """True if a call may be made now (in half-open state this claims the one probe)."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            # Open, or a half-open probe that never reported back: wait out reset_seconds
+            if time.monotonic() - self._opened_at < self.reset_seconds:
+                return False
+            self.state = self.HALF_OPEN
+            self._opened_at = time.monotonic()
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                print(f"      🔌 {self.name} circuit closed again.")
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                print(f"      🔌 {self.name} circuit open after {self.failures} failures. "
+                      f"Serving static questions for {self.reset_seconds}s.")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+# Shared by every TutorAgent in the process: LLM health is process-wide
+tutor_llm_latency = LatencyTracker()
+tutor_llm_breaker = CircuitBreaker("LLM")
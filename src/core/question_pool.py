@@ -0,0 +1,117 @@
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+from src.core.schema import Question, Difficulty
+from src.core.config import Config
+
+PoolKey = Tuple[str, str, Difficulty] # (topic, node_id, difficulty)
+
+
+class QuestionPrefetcher:
+    """
+    Warm pool of pre-generated dynamic questions per (topic, node, difficulty).
+
+    Tutors call top_up() as a learner works through a node; once the learner's unseen static
+    questions for a difficulty drop to the low watermark, variations are generated in the
+    background (at most max_concurrency at a time, process-wide) until `depth` are ready.
+    take() then serves one from memory instead of blocking the learner on the LLM.
+    Pools are shared by every learner on the same topic; each question is handed out once.
+    """
+
+    def __init__(
+        self,
+        depth: int = Config.PREFETCH_POOL_DEPTH,
+        low_watermark: int = Config.PREFETCH_LOW_WATERMARK,
+        max_concurrency: int = Config.PREFETCH_MAX_CONCURRENCY,
+        max_pooled: int = Config.PREFETCH_MAX_POOLED,
+        enabled: bool = Config.PREFETCH_ENABLED,
+    ):
+        self.depth = depth
+        self.low_watermark = low_watermark
+        self.max_concurrency = max_concurrency
+        self.max_pooled = max_pooled
+        self.enabled = enabled
+
+        self._pools: "OrderedDict[PoolKey, deque[Question]]" = OrderedDict()
+        self._in_flight: Dict[PoolKey, int] = {}
+        self._pooled = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix="q-prefetch")
+        self.hits = 0
+        self.misses = 0
+
+    def take(self, topic: str, node_id: str, difficulty: Difficulty) -> Optional[Question]:
+        key = (topic, node_id, difficulty)
+        with self._lock:
+            pool = self._pools.get(key)
+            if not pool:
+                self.misses += 1
+                return None
+            self._pools.move_to_end(key)
+            self._pooled -= 1
+            self.hits += 1
+            return pool.popleft()
+
+    def top_up(self, topic: str, node_id: str, difficulty: Difficulty, remaining_static: int,
+               generate: Callable[[], Optional[Question]], limit: Optional[int] = None) -> int:
+        """
+        Schedules background generation for (topic, node, difficulty) if the learner is about
+        to run out of static questions. generate() builds one question (on a worker thread).
+        Schedules at most `limit` generations; returns how many were scheduled.
+        """
+        if not self.enabled or remaining_static > self.low_watermark:
+            return 0
+        key = (topic, node_id, difficulty)
+        with self._lock:
+            pool = self._pools.get(key)
+            missing = self.depth - (len(pool) if pool else 0) - self._in_flight.get(key, 0)
+            # Keep the backlog bounded: don't queue more than ~2 rounds of work
+            room = 2 * self.max_concurrency - sum(self._in_flight.values())
+            count = max(0, min(missing, room, limit if limit is not None else missing))
+            for _ in range(count):
+                self._in_flight[key] = self._in_flight.get(key, 0) + 1
+                self._executor.submit(self._fill, key, generate)
+            return count
+
+    def put(self, topic: str, node_id: str, difficulty: Difficulty, question: Question):
+        """Pools a question generated elsewhere (e.g. one that arrived after its learner gave up waiting)."""
+        with self._lock:
+            self._add_locked((topic, node_id, difficulty), question)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"pools": len(self._pools), "pooled": self._pooled,
+                    "in_flight": sum(self._in_flight.values()), "hits": self.hits, "misses": self.misses}
+
+    # --- Helpers ---
+
+    def _fill(self, key: PoolKey, generate: Callable[[], Optional[Question]]):
+        question = None
+        try:
+            question = generate()
+        except Exception as e:
+            print(f"      ⚠️ Prefetch failed for {key[1]} ({key[2].value}): {e}")
+        finally:
+            with self._lock:
+                self._in_flight[key] -= 1
+                if not self._in_flight[key]:
+                    del self._in_flight[key]
+                if question:
+                    self._add_locked(key, question)
+
+    def _add_locked(self, key: PoolKey, question: Question):
+        self._pools.setdefault(key, deque()).append(question)
+        self._pools.move_to_end(key)
+        self._pooled += 1
+        self._evict_locked()
+
+    def _evict_locked(self):
+        while self._pooled > self.max_pooled and self._pools:
+            _, pool = self._pools.popitem(last=False)
+            self._pooled -= len(pool)
+
+
+# Shared by every TutorAgent in the process
+question_prefetcher = QuestionPrefetcher()
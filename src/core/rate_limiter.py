@@ -0,0 +1,109 @@
+import time
+import asyncio
+import threading
+from typing import Optional
+
+from src.core.config import Config
+
+
+class TokenBucketRateLimiter:
+    """
+    Process-wide limiter for LLM calls: one bucket for requests/min, one for tokens/min.
+
+    Buckets refill continuously and hold at most `burst_seconds` worth of quota, so idle
+    periods don't turn into a throttling burst. On a 429 the effective capacity is cut
+    (multiplicative decrease) and recovers a little with every success (additive increase).
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = Config.LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = Config.LLM_TOKENS_PER_MINUTE,
+        burst_seconds: float = Config.LLM_BURST_SECONDS,
+        min_fraction: float = Config.LLM_MIN_CAPACITY_FRACTION,
+        recovery_step: float = Config.LLM_CAPACITY_RECOVERY_STEP,
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.burst_seconds = burst_seconds
+        self.min_fraction = min_fraction
+        self.recovery_step = recovery_step
+
+        self.capacity_fraction = 1.0
+        self._lock = threading.Lock()
+        self._last = time.monotonic()
+        self._requests = self._max_requests()
+        self._tokens = self._max_tokens()
+
+    def acquire(self, tokens: int = 0):
+        """Blocks until one request and `tokens` tokens are available, then takes them."""
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait is None:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int = 0):
+        """acquire() for coroutines: waits with asyncio.sleep instead of blocking the thread."""
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait is None:
+                return
+            await asyncio.sleep(wait)
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: int):
+        """Corrects the token bucket once real usage is known."""
+        with self._lock:
+            self._tokens = min(self._tokens + estimated_tokens - actual_tokens, self._max_tokens())
+
+    def on_throttle(self):
+        """The API said 429: halve our effective quota and drain what we thought we had."""
+        with self._lock:
+            self.capacity_fraction = max(self.min_fraction, self.capacity_fraction / 2)
+            self._requests = min(self._requests, 0)
+            self._tokens = min(self._tokens, 0)
+
+    def on_success(self):
+        with self._lock:
+            self.capacity_fraction = min(1.0, self.capacity_fraction + self.recovery_step)
+
+    # --- Helpers ---
+
+    def _try_acquire(self, tokens: int) -> Optional[float]:
+        """Takes the quota and returns None, or returns how long to wait before trying again."""
+        with self._lock:
+            self._refill()
+            # A single call bigger than the bucket may go once the bucket is full.
+            need_tokens = min(tokens, self._max_tokens())
+            if self._requests >= 1 and self._tokens >= need_tokens:
+                self._requests -= 1
+                self._tokens -= need_tokens
+                return None
+            wait = max(
+                (1 - self._requests) / self._request_rate(),
+                (need_tokens - self._tokens) / self._token_rate(),
+            )
+        return min(max(wait, 0.01), 1.0)
+
+    def _request_rate(self) -> float:
+        return self.requests_per_minute * self.capacity_fraction / 60
+
+    def _token_rate(self) -> float:
+        return self.tokens_per_minute * self.capacity_fraction / 60
+
+    def _max_requests(self) -> float:
+        return max(1.0, self._request_rate() * self.burst_seconds)
+
+    def _max_tokens(self) -> float:
+        return self._token_rate() * self.burst_seconds
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._last
+        self._last = now
+        self._requests = min(self._max_requests(), self._requests + elapsed * self._request_rate())
+        self._tokens = min(self._max_tokens(), self._tokens + elapsed * self._token_rate())
+
+
+# Shared by every LLM caller in the process (ingestion and tutor)
+llm_rate_limiter = TokenBucketRateLimiter()
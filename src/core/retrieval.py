@@ -0,0 +1,100 @@
+import re
+import math
+from collections import Counter, defaultdict
+from typing import Dict, List, NamedTuple, Tuple
+
+from src.core.config import Config
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with "
+    "what which how why when can does do not you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall(text.lower()) if len(t) > 1 and t not in _STOPWORDS]
+
+
+def chunk_text(text: str, chunk_chars: int = Config.RETRIEVAL_CHUNK_CHARS) -> List[str]:
+    """Splits text into ~chunk_chars pieces, packing whole paragraphs where possible."""
+    chunks, current = [], ""
+    for para in re.split(r"\n\s*\n", text):
+        para = para.strip()
+        if not para: continue
+        pieces = [para[i:i + chunk_chars] for i in range(0, len(para), chunk_chars)]
+        for piece in pieces:
+            if current and len(current) + len(piece) + 2 > chunk_chars:
+                chunks.append(current)
+                current = ""
+            current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class Chunk(NamedTuple):
+    source: str  # Source label, e.g. "FILE: intro.txt"
+    text: str
+
+
+class CorpusIndex:
+    """
+    Local BM25 index over the chunks of an ingested corpus (no network, no extra deps).
+    Used to give each leaf prompt only the passages relevant to that leaf
+    instead of the same prefix of the whole corpus.
+    """
+
+    def __init__(self, chunks: List[Chunk], k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+
+        self._postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list) # term -> [(chunk idx, tf)]
+        self._lengths: List[int] = []
+        for idx, chunk in enumerate(chunks):
+            terms = tokenize(chunk.text)
+            self._lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                self._postings[term].append((idx, tf))
+        self._avg_len = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+
+    @classmethod
+    def from_sources(cls, sources: Dict[str, str], chunk_chars: int = Config.RETRIEVAL_CHUNK_CHARS) -> "CorpusIndex":
+        return cls([Chunk(label, piece) for label, text in sources.items() for piece in chunk_text(text, chunk_chars)])
+
+    @property
+    def total_chars(self) -> int:
+        return sum(len(c.text) for c in self.chunks)
+
+    def search(self, query: str, k: int = Config.RETRIEVAL_TOP_K) -> List[int]:
+        """Indices of the k best-scoring chunks for query, best first."""
+        n = len(self.chunks)
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings: continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for idx, tf in postings:
+                norm = 1 - self.b + self.b * self._lengths[idx] / self._avg_len
+                scores[idx] += idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+        return sorted(scores, key=lambda idx: (-scores[idx], idx))[:k]
+
+    def context_for(self, queries: List[str], k: int = Config.RETRIEVAL_TOP_K) -> str:
+        """
+        Top-k chunks per query, deduplicated and rendered in corpus order under their source headers.
+        A corpus that fits in the budget anyway is returned whole.
+        """
+        if self.total_chars <= k * len(queries) * Config.RETRIEVAL_CHUNK_CHARS:
+            picked = range(len(self.chunks))
+        else:
+            picked = sorted({idx for q in queries for idx in self.search(q, k)}) or range(min(k, len(self.chunks)))
+
+        parts, last_source = [], None
+        for idx in picked:
+            chunk = self.chunks[idx]
+            if chunk.source != last_source:
+                parts.append(f"--- {chunk.source} ---")
+                last_source = chunk.source
+            parts.append(chunk.text)
+        return "\n".join(parts)
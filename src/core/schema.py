@@ -1,6 +1,8 @@
-from typing import List, Optional, Dict, Any, ForwardRef
+from typing import List, Optional, Dict, Any, ForwardRef, FrozenSet, Iterator, NamedTuple, Set, Tuple
 from enum import Enum
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr, model_validator
+from pydantic_core import core_schema
+from src.core.config import Config
 
 class Difficulty(str, Enum):
     BEGINNER = "beginner"
@@ -24,6 +26,36 @@ class Question(BaseModel):
     explanation: str = Field(..., description="Explanation of why the answer is correct")
     metadata: Dict[str, Any] = Field(default_factory=dict, description="Source file, generation timestamp, etc.")
 
+class AnswerKey(NamedTuple):
+    """Pre-normalised grading data for a question, so grading is a couple of set/str compares."""
+    correct: str                 # Stripped, upper-cased correct answer (usually a letter)
+    option_texts: FrozenSet[str] # Option strings the learner may send instead of the letter
+
+    @classmethod
+    def for_question(cls, q: "Question") -> "AnswerKey":
+        correct = q.correct_answer.strip().upper()
+        option_texts = set()
+        seen = set()
+        for idx, opt in enumerate(q.options or []):
+            # First occurrence wins, mirroring options.index(); map index 0->A, 1->B, etc.
+            if opt in seen: continue
+            seen.add(opt)
+            if chr(ord('A') + idx) == correct:
+                option_texts.add(opt)
+        return cls(correct=correct, option_texts=frozenset(option_texts))
+
+    def matches(self, user_answer: str) -> bool:
+        ans = user_answer.strip()
+        # 1. Direct Match (Letter vs Letter OR Text vs Text)
+        # 2. Text vs Letter (User sent option text, Correct is 'C')
+        return ans.upper() == self.correct or ans in self.option_texts
+
+class IndexedQuestion(NamedTuple):
+    """Entry of KnowledgeBase's global question index."""
+    node_id: str
+    question: "Question"
+    answer_key: AnswerKey
+
 # Forward reference for recursive definition
 KnowledgeNodeRef = ForwardRef('KnowledgeNode')
 
@@ -48,6 +80,9 @@ class KnowledgeNode(BaseModel):
     # Progression
     prerequisites: List[str] = Field(default_factory=list, description="IDs of other nodes")
 
+    # Provenance: labels of the uploads this node was derived from, e.g. "FILE: intro.txt"
+    sources: List[str] = Field(default_factory=list)
+
     class Config:
         arbitrary_types_allowed = True
 
@@ -57,6 +92,8 @@ class KnowledgeBase(BaseModel):
     root: KnowledgeNode
     # Flat map for O(1) lookups during specific operations
     node_map: Dict[str, KnowledgeNode] = Field(default_factory=dict, description="ID -> Node reference")
+    # Source label -> content hash at ingestion time (drives incremental re-ingestion)
+    source_hashes: Dict[str, str] = Field(default_factory=dict)
 
 class AssessmentResult(BaseModel):
     """The result of a user answering a question."""
@@ -67,13 +104,151 @@ class AssessmentResult(BaseModel):
     feedback: str
     timestamp: float
 
+class AnswerEvent(BaseModel):
+    """One graded answer, as appended to a session's event log."""
+    question_id: str
+    node_id: str
+    is_correct: bool
+    difficulty: Difficulty
+    timestamp: float
+    generated: bool = False # Dynamic (LLM) question: never served twice, so not tracked as seen
+
 class UserSkillState(BaseModel):
-    """Tracks the user's progress on a specific node."""
+    """
+    Tracks the user's progress on a specific node.
+    Sized by the node, not by practice time: `seen` only holds the node's static questions,
+    `recent` is a ring of the last TUTOR_HISTORY_SIZE answers, and the rest are counters.
+    """
     node_id: str
     mastery_score: float = 0.0
     attempts: int = 0
     correct_streak: int = 0
-    history: List[str] = Field(default_factory=list)
+    correct_count: int = 0
+    seen: Set[str] = Field(default_factory=set)     # Static question ids answered (O(1) "already asked?")
+    recent: List[str] = Field(default_factory=list) # Most recent question ids answered, oldest first
+
+    @model_validator(mode="before")
+    @classmethod
+    def _upgrade_history(cls, data: Any) -> Any:
+        # Sessions saved before seen/recent kept the full list of answered ids in `history`
+        if isinstance(data, dict) and "history" in data:
+            data = dict(data)
+            history = data.pop("history") or []
+            data.setdefault("seen", set(history))
+            data.setdefault("recent", history[-Config.TUTOR_HISTORY_SIZE:])
+        return data
+
+    def record(self, question_id: str, is_correct: bool, generated: bool = False):
+        """Counts one answer on this node (streaks and coverage are SessionState.apply_answer's job)."""
+        self.attempts += 1
+        if is_correct:
+            self.correct_count += 1
+        if not generated:
+            self.seen.add(question_id)
+        self.recent.append(question_id)
+        if len(self.recent) > Config.TUTOR_HISTORY_SIZE:
+            del self.recent[:len(self.recent) - Config.TUTOR_HISTORY_SIZE]
+
+class CoverageSet:
+    """
+    SessionState.coverage_map: node id -> mastered, behaving like the Dict[str, bool] it serializes to.
+
+    Once bound to a KB's leaf positions (leaf id -> index in the KB's leaf order, one dict shared
+    by every session on that KB), mastered leaves are bits of a bitset over those positions, so
+    a learner costs one bit per leaf and the tutor's leaf cursor tests positions directly.
+    Ids the KB doesn't know, and values other than True, stay in a small dict (lossless).
+    """
+
+    def __init__(self, data: Optional[Dict[str, bool]] = None):
+        self._positions: Dict[str, int] = {}
+        self._bits = bytearray()
+        self._other: Dict[str, bool] = dict(data or {})
+
+    @property
+    def positions(self) -> Dict[str, int]:
+        return self._positions
+
+    def bind(self, positions: Dict[str, int]):
+        """Re-keys the mastered leaves to bits over `positions`."""
+        entries = self.to_dict()
+        self._positions = positions
+        self._bits = bytearray((len(positions) + 7) // 8)
+        self._other = {}
+        for node_id, covered in entries.items():
+            self[node_id] = covered
+
+    def has_position(self, pos: int) -> bool:
+        return bool(self._bits[pos >> 3] >> (pos & 7) & 1)
+
+    def get(self, node_id: str, default: Any = None) -> Any:
+        pos = self._positions.get(node_id)
+        if pos is not None and self.has_position(pos):
+            return True
+        return self._other.get(node_id, default)
+
+    def __getitem__(self, node_id: str) -> bool:
+        if node_id not in self:
+            raise KeyError(node_id)
+        return self.get(node_id)
+
+    def __setitem__(self, node_id: str, covered: bool):
+        pos = self._positions.get(node_id)
+        if pos is not None:
+            self._bits[pos >> 3] &= ~(1 << (pos & 7)) & 0xFF
+            if covered is True:
+                self._bits[pos >> 3] |= 1 << (pos & 7)
+                self._other.pop(node_id, None)
+                return
+        self._other[node_id] = covered
+
+    def __contains__(self, node_id: object) -> bool:
+        pos = self._positions.get(node_id)
+        return (pos is not None and self.has_position(pos)) or node_id in self._other
+
+    def items(self) -> Iterator[Tuple[str, bool]]:
+        for node_id, pos in self._positions.items():
+            if self.has_position(pos):
+                yield node_id, True
+        yield from self._other.items()
+
+    def keys(self) -> Iterator[str]:
+        return (node_id for node_id, _ in self.items())
+
+    def __iter__(self) -> Iterator[str]:
+        return self.keys()
+
+    def __len__(self) -> int:
+        return sum(bin(b).count("1") for b in self._bits) + len(self._other)
+
+    def to_dict(self) -> Dict[str, bool]:
+        return dict(self.items())
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, CoverageSet):
+            other = other.to_dict()
+        return self.to_dict() == other if isinstance(other, dict) else NotImplemented
+
+    def __repr__(self) -> str:
+        return f"CoverageSet({self.to_dict()!r})"
+
+    def __copy__(self) -> "CoverageSet":
+        copy = CoverageSet(self._other)
+        copy._positions, copy._bits = self._positions, bytearray(self._bits)
+        return copy
+
+    def __deepcopy__(self, memo: dict) -> "CoverageSet":
+        return self.__copy__() # The positions dict belongs to the KB: share it
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source: Any, handler: Any) -> core_schema.CoreSchema:
+        from_dict = core_schema.no_info_after_validator_function(
+            cls, core_schema.dict_schema(core_schema.str_schema(), core_schema.bool_schema())
+        )
+        return core_schema.json_or_python_schema(
+            json_schema=from_dict,
+            python_schema=core_schema.union_schema([core_schema.is_instance_schema(cls), from_dict]),
+            serialization=core_schema.plain_serializer_function_ser_schema(lambda coverage: coverage.to_dict()),
+        )
 
 class SessionState(BaseModel):
     """The live state of a practice session."""
@@ -81,7 +256,50 @@ class SessionState(BaseModel):
     current_topic: str
     node_states: Dict[str, UserSkillState] = Field(default_factory=dict)
     active_node_id: Optional[str] = None
-    coverage_map: Dict[str, bool] = Field(default_factory=dict)
+    coverage_map: CoverageSet = Field(default_factory=CoverageSet)
+
+    # Position in the KB's leaf order before which every leaf is covered. Transient: it is
+    # re-established by one scan after a load, so it stays valid if the KB was re-ingested.
+    _leaf_cursor: int = PrivateAttr(default=0)
+
+    def next_uncovered_leaf(self, leaf_order: List[str], leaf_positions: Dict[str, int]) -> Optional[str]:
+        """
+        First leaf of leaf_order not in coverage_map, or None if all are covered.
+        leaf_positions maps each leaf id to its index in leaf_order; coverage is bound to it on
+        the first call. Coverage only ever grows, so the scan resumes at the cursor: amortised O(1).
+        """
+        coverage = self.coverage_map
+        if coverage.positions is not leaf_positions:
+            coverage.bind(leaf_positions)
+            self._leaf_cursor = 0
+        cursor = self._leaf_cursor
+        while cursor < len(leaf_order) and coverage.has_position(cursor):
+            cursor += 1
+        self._leaf_cursor = cursor
+        return leaf_order[cursor] if cursor < len(leaf_order) else None
+
+    def apply_answer(self, event: AnswerEvent) -> UserSkillState:
+        """
+        State transition for one graded answer (streak, mastery, coverage).
+        Shared by live grading and event-log replay so both always agree.
+        """
+        node_state = self.node_states.setdefault(event.node_id, UserSkillState(node_id=event.node_id))
+        node_state.record(event.question_id, event.is_correct, event.generated)
+        if self.active_node_id is None and not self.coverage_map.get(event.node_id):
+            # Replay: the node being answered is the one the tutor had selected
+            self.active_node_id = event.node_id
+
+        if event.is_correct:
+            node_state.correct_streak += 1
+            if event.difficulty == Difficulty.ADVANCED and node_state.correct_streak >= Config.TUTOR_MASTERY_STREAK:
+                # Mastered. Clear active_node_id so the tutor picks the next leaf
+                if self.active_node_id == event.node_id:
+                    self.active_node_id = None
+                self.coverage_map[event.node_id] = True
+        else:
+            # Demotion handled implicitly by the tutor's difficulty selection next turn
+            node_state.correct_streak = 0
+        return node_state
 
 # Resolve forward refs
 KnowledgeNode.update_forward_refs()
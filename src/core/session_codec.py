@@ -0,0 +1,226 @@
+import os
+import sys
+import json
+import zlib
+import struct
+import threading
+from array import array
+from typing import Dict, List
+
+from src.core.schema import SessionState, UserSkillState
+from src.core.kb_view import NodeTable, NodeIndex
+from src.core.fs_utils import atomic_write_text
+
+_MAGIC = b"SPS2"
+_FINGERPRINT_BYTES = 16
+
+# Array typecodes by on-disk width: C int/long sizes vary by platform, so pick the one that is 4 bytes
+_U32 = next((t for t in ("I", "L") if array(t).itemsize == 4), None)
+if _U32 is None or array("d").itemsize != 8:
+    raise ImportError("session_codec needs a 4-byte unsigned array type and 8-byte doubles")
+
+
+def _bit(bits: bytearray, i: int) -> bool:
+    return bool(bits[i >> 3] >> (i & 7) & 1)
+
+
+def _set_bit(bits: bytearray, i: int):
+    bits[i >> 3] |= 1 << (i & 7)
+
+
+class CompactSessionState:
+    """
+    Dense encoding of a SessionState against a topic's NodeTable.
+
+    Node uuids become table indices: coverage and "has a skill state" are bitsets, and
+    attempts / streak / correct / mastery are fixed-width arrays, each len(table) long.
+    Seen question ids and the recent-answers ring are kept per node index. Entries for nodes
+    the table doesn't know (a session from an older ingestion of the topic) are carried
+    verbatim in `extra`, so converting to and from SessionState is lossless.
+    """
+
+    def __init__(self, table: NodeTable, user_id: str, current_topic: str):
+        n = len(table)
+        self.table = table
+        self.user_id = user_id
+        self.current_topic = current_topic
+        self.active: NodeIndex = -1
+        self.coverage = bytearray((n + 7) // 8)
+        self.has_state = bytearray((n + 7) // 8)
+        self.attempts = array(_U32, bytes(4 * n))
+        self.streak = array(_U32, bytes(4 * n))
+        self.correct = array(_U32, bytes(4 * n))
+        self.mastery = array("d", bytes(8 * n))
+        self.seen: Dict[NodeIndex, List[str]] = {}
+        self.recent: Dict[NodeIndex, List[str]] = {}
+        self.extra: dict = {} # JSON-ready leftovers: unknown nodes, explicit False coverage, etc.
+
+    def is_covered(self, i: NodeIndex) -> bool:
+        return _bit(self.coverage, i)
+
+    @classmethod
+    def from_session(cls, state: SessionState, table: NodeTable) -> "CompactSessionState":
+        compact = cls(table, state.user_id, state.current_topic)
+        extra_states, extra_coverage = {}, {}
+
+        for node_id, ns in state.node_states.items():
+            i = table.index_of(node_id)
+            if i is None or ns.node_id != node_id:
+                extra_states[node_id] = ns.model_dump(mode="json")
+                continue
+            _set_bit(compact.has_state, i)
+            compact.attempts[i] = ns.attempts
+            compact.streak[i] = ns.correct_streak
+            compact.correct[i] = ns.correct_count
+            compact.mastery[i] = ns.mastery_score
+            if ns.seen:
+                compact.seen[i] = sorted(ns.seen)
+            if ns.recent:
+                compact.recent[i] = list(ns.recent)
+
+        for node_id, covered in state.coverage_map.items():
+            i = table.index_of(node_id)
+            if i is None or covered is not True:
+                extra_coverage[node_id] = covered
+            else:
+                _set_bit(compact.coverage, i)
+
+        if state.active_node_id is not None:
+            i = table.index_of(state.active_node_id)
+            if i is None:
+                compact.extra["active_node_id"] = state.active_node_id
+            else:
+                compact.active = i
+
+        if extra_states:
+            compact.extra["node_states"] = extra_states
+        if extra_coverage:
+            compact.extra["coverage_map"] = extra_coverage
+        return compact
+
+    def to_session(self) -> SessionState:
+        ids = self.table.ids
+        node_states = {}
+        for i in range(len(ids)):
+            if _bit(self.has_state, i):
+                node_states[ids[i]] = UserSkillState(
+                    node_id=ids[i], mastery_score=self.mastery[i], attempts=self.attempts[i],
+                    correct_streak=self.streak[i], correct_count=self.correct[i],
+                    seen=set(self.seen.get(i, ())), recent=list(self.recent.get(i, []))
+                )
+        for node_id, data in self.extra.get("node_states", {}).items():
+            node_states[node_id] = UserSkillState.model_validate(data)
+
+        coverage_map = {ids[i]: True for i in range(len(ids)) if _bit(self.coverage, i)}
+        coverage_map.update(self.extra.get("coverage_map", {}))
+
+        return SessionState(
+            user_id=self.user_id,
+            current_topic=self.current_topic,
+            node_states=node_states,
+            active_node_id=ids[self.active] if self.active >= 0 else self.extra.get("active_node_id"),
+            coverage_map=coverage_map,
+        )
+
+    # --- Binary form ---
+    # MAGIC | table fingerprint (16 ascii) | zlib( header length (u32) | JSON header | bitsets | arrays )
+    # Arrays are little-endian: attempts, streak, correct as u32, mastery as f64.
+
+    def to_bytes(self) -> bytes:
+        header = json.dumps({
+            "user_id": self.user_id,
+            "topic": self.current_topic,
+            "n": len(self.table),
+            "active": self.active,
+            "seen": {str(i): qids for i, qids in self.seen.items()},
+            "recent": {str(i): qids for i, qids in self.recent.items()},
+            "extra": self.extra,
+        }, separators=(",", ":")).encode("utf-8")
+        body = b"".join([
+            struct.pack("<I", len(header)), header,
+            bytes(self.coverage), bytes(self.has_state),
+            _le_bytes(self.attempts), _le_bytes(self.streak), _le_bytes(self.correct), _le_bytes(self.mastery),
+        ])
+        return _MAGIC + self.table.fingerprint.encode("ascii") + zlib.compress(body)
+
+    @staticmethod
+    def fingerprint_of(data: bytes) -> str:
+        """The NodeTable fingerprint a blob was encoded against (needed to pick the table to decode with)."""
+        if data[:len(_MAGIC)] != _MAGIC:
+            raise ValueError("Not a compact session")
+        return data[len(_MAGIC):len(_MAGIC) + _FINGERPRINT_BYTES].decode("ascii")
+
+    @classmethod
+    def from_bytes(cls, data: bytes, table: NodeTable) -> "CompactSessionState":
+        if cls.fingerprint_of(data) != table.fingerprint:
+            raise ValueError("Compact session was encoded against a different node table")
+        body = zlib.decompress(data[len(_MAGIC) + _FINGERPRINT_BYTES:])
+        (header_len,) = struct.unpack_from("<I", body)
+        pos = 4 + header_len
+        header = json.loads(body[4:pos])
+
+        compact = cls(table, header["user_id"], header["topic"])
+        n = header["n"]
+        bits = (n + 7) // 8
+        compact.coverage = bytearray(body[pos:pos + bits]); pos += bits
+        compact.has_state = bytearray(body[pos:pos + bits]); pos += bits
+        for name, typecode, width in (("attempts", _U32, 4), ("streak", _U32, 4), ("correct", _U32, 4),
+                                      ("mastery", "d", 8)):
+            setattr(compact, name, _from_le_bytes(typecode, body[pos:pos + width * n]))
+            pos += width * n
+        compact.active = header["active"]
+        compact.seen = {int(i): qids for i, qids in header["seen"].items()}
+        compact.recent = {int(i): qids for i, qids in header["recent"].items()}
+        compact.extra = header["extra"]
+        return compact
+
+
+class NodeTableRegistry:
+    """
+    On-disk NodeTables by fingerprint, so a compact session can still be decoded after its topic
+    was re-ingested: one copy of each table is shared by every session encoded against it.
+    """
+
+    def __init__(self, tables_dir: str):
+        self.tables_dir = tables_dir
+        self._tables: Dict[str, NodeTable] = {}
+        self._lock = threading.Lock()
+
+    def register(self, table: NodeTable):
+        with self._lock:
+            if table.fingerprint in self._tables:
+                return
+        path = self._path(table.fingerprint)
+        if not os.path.exists(path):
+            atomic_write_text(path, json.dumps(table.ids))
+        with self._lock:
+            self._tables[table.fingerprint] = table
+
+    def get(self, fingerprint: str) -> NodeTable:
+        with self._lock:
+            table = self._tables.get(fingerprint)
+        if table is not None:
+            return table
+        with open(self._path(fingerprint), "r") as f:
+            table = NodeTable(json.load(f))
+        with self._lock:
+            self._tables[fingerprint] = table
+        return table
+
+    def _path(self, fingerprint: str) -> str:
+        return os.path.join(self.tables_dir, f"{fingerprint}.json")
+
+
+def _le_bytes(arr: array) -> bytes:
+    if sys.byteorder == "big":
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _from_le_bytes(typecode: str, data: bytes) -> array:
+    arr = array(typecode)
+    arr.frombytes(data)
+    if sys.byteorder == "big":
+        arr.byteswap()
+    return arr
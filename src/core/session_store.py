@@ -0,0 +1,630 @@
+import os
+import json
+import base64
+import uuid
+import time
+import fcntl
+import queue
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from src.core.schema import SessionState, AnswerEvent, UserSkillState, Question
+from src.core.config import Config
+from src.core.fs_utils import atomic_write_text
+from src.core.kb_cache import kb_cache
+from src.core.session_codec import CompactSessionState, NodeTableRegistry
+
+
+class SessionStore(ABC):
+    """
+    Where TutorAgent sessions live. Implementations must be safe to share across threads
+    and processes (API workers, the Streamlit UI).
+
+    Every write produces a new opaque revision string, so a process holding a session in
+    memory can tell (revision()) whether someone else has written to it since.
+    """
+
+    @abstractmethod
+    def load(self, session_id: str) -> Optional[SessionState]:
+        """Returns the saved session, or None if there is none."""
+
+    @abstractmethod
+    def save(self, session_id: str, state: SessionState) -> Optional[str]:
+        """
+        Replaces the stored session with `state` and returns the new revision. Only for new or
+        reset sessions: answers recorded by other writers since `state` was loaded are discarded.
+        """
+
+    @abstractmethod
+    def append(self, session_id: str, event: AnswerEvent, base_revision: Optional[str] = None) -> Optional[str]:
+        """
+        Records one graded answer. Must be cheap: this runs on every submit.
+        Returns the new revision if the session was still at `base_revision` before this write,
+        else None (someone else wrote in between: the caller's copy is stale).
+        """
+
+    @abstractmethod
+    def revision(self, session_id: str) -> Optional[str]:
+        """The session's current revision (None if there is no session). Cheap: checked on every request."""
+
+    @abstractmethod
+    def remember_question(self, session_id: str, node_id: str, question: Question):
+        """Keeps a served dynamic question gradeable from any process (the last SESSION_SERVED_QUESTIONS)."""
+
+    @abstractmethod
+    def recall_question(self, session_id: str, question_id: str) -> Optional[Tuple[str, Question]]:
+        """(node_id, question) for a dynamic question remembered for this session, if still kept."""
+
+
+class EventLogSessionStore(SessionStore):
+    """
+    Persists each session as a snapshot plus an append-only log of answer events.
+
+    Files per session (in sessions_dir):
+      {id}.json         - snapshot: {"log_id": ..., "format": "compact" | "json", "state": ...}
+      {id}.events.jsonl - header line {"log_id": ...} followed by one AnswerEvent per line
+      {id}.lock         - flock target serialising appends and compaction across processes
+      {id}.served.json  - the session's last few dynamic questions, for grading on any worker
+
+    Recording an answer is a single line append. Every `snapshot_every` events the log is
+    folded into a new snapshot. A compaction starts a new log_id, so a crash between writing
+    the snapshot and replacing the log is detected (stale log ids are ignored on load).
+    The revision is "<log_id>:<log size>": it changes with every append and compaction.
+
+    Compact snapshots hold a base64 CompactSessionState, encoded against the topic's node table
+    (kept once per KB version under node_tables/); "json" snapshots hold the SessionState itself.
+    """
+
+    def __init__(self, sessions_dir: str = Config.SESSIONS_DIR, snapshot_every: int = Config.SESSION_SNAPSHOT_EVERY,
+                 snapshot_format: str = Config.SESSION_SNAPSHOT_FORMAT):
+        self.sessions_dir = sessions_dir
+        self.snapshot_every = snapshot_every
+        self.snapshot_format = snapshot_format
+        self.node_tables = NodeTableRegistry(os.path.join(sessions_dir, "node_tables"))
+        self._pending: Dict[str, int] = {}  # Events appended since the last snapshot, per session
+        self._pending_lock = threading.Lock()
+
+    def snapshot_path(self, session_id: str) -> str:
+        return os.path.join(self.sessions_dir, f"{session_id}.json")
+
+    def log_path(self, session_id: str) -> str:
+        return os.path.join(self.sessions_dir, f"{session_id}.events.jsonl")
+
+    def load(self, session_id: str) -> Optional[SessionState]:
+        """Rebuilds a session by replaying its log on top of the last snapshot."""
+        if not os.path.exists(self.snapshot_path(session_id)):
+            return None
+        with self._locked(session_id, fcntl.LOCK_SH):
+            loaded = self._read(session_id)
+        if not loaded:
+            return None
+        state, events, log_id = loaded
+        if log_id is None:
+            # Legacy snapshot without a log: upgrade it so appends have a log to go to
+            return self._upgrade_legacy(session_id)
+
+        for event in events:
+            state.apply_answer(event)
+        self._set_pending(session_id, len(events))
+        return state
+
+    def save(self, session_id: str, state: SessionState) -> Optional[str]:
+        """
+        Writes a full snapshot and starts an empty log, dropping any logged events.
+        New or reset sessions only: everything else goes through append().
+        """
+        with self._locked(session_id, fcntl.LOCK_EX):
+            self._write_snapshot(session_id, state)
+            revision = self._revision_locked(session_id)
+        self._set_pending(session_id, 0)
+        return revision
+
+    def append(self, session_id: str, event: AnswerEvent, base_revision: Optional[str] = None) -> Optional[str]:
+        """Records one answer. O(1): a single line append, plus periodic compaction."""
+        line = (event.model_dump_json() + "\n").encode("utf-8")
+        with self._locked(session_id, fcntl.LOCK_EX):
+            # Re-open per append: compaction swaps the log file, and an old fd would write into the void.
+            with open(self.log_path(session_id), "ab+") as f:
+                before = self._revision_of(f)
+                f.write(line)
+
+            with self._pending_lock:
+                self._pending[session_id] = self._pending.get(session_id, 0) + 1
+                due = self._pending[session_id] >= self.snapshot_every
+            if due:
+                # Still under the lock, so the returned revision can't skip over another writer
+                self._compact_locked(session_id)
+            revision = self._revision_locked(session_id)
+        return revision if before == base_revision else None
+
+    def compact(self, session_id: str):
+        """Folds the log into a new snapshot. Replays from disk so events from other writers are kept."""
+        with self._locked(session_id, fcntl.LOCK_EX):
+            self._compact_locked(session_id)
+
+    def revision(self, session_id: str) -> Optional[str]:
+        if not os.path.exists(self.snapshot_path(session_id)):
+            return None
+        with self._locked(session_id, fcntl.LOCK_SH):
+            return self._revision_locked(session_id)
+
+    def remember_question(self, session_id: str, node_id: str, question: Question):
+        path = os.path.join(self.sessions_dir, f"{session_id}.served.json")
+        with self._locked(session_id, fcntl.LOCK_EX):
+            served = self._read_served(path)
+            served = [s for s in served if s["question"]["id"] != question.id]
+            served.append({"node_id": node_id, "question": question.model_dump(mode="json")})
+            atomic_write_text(path, json.dumps(served[-Config.SESSION_SERVED_QUESTIONS:]))
+
+    def recall_question(self, session_id: str, question_id: str) -> Optional[Tuple[str, Question]]:
+        path = os.path.join(self.sessions_dir, f"{session_id}.served.json")
+        with self._locked(session_id, fcntl.LOCK_SH):
+            served = self._read_served(path)
+        for s in served:
+            if s["question"]["id"] == question_id:
+                return s["node_id"], Question.model_validate(s["question"])
+        return None
+
+    # --- Helpers ---
+
+    def _compact_locked(self, session_id: str):
+        loaded = self._read(session_id)
+        if not loaded:
+            return
+        state, events, _ = loaded
+        for event in events:
+            state.apply_answer(event)
+        self._write_snapshot(session_id, state)
+        self._set_pending(session_id, 0)
+
+    def _revision_locked(self, session_id: str) -> Optional[str]:
+        try:
+            with open(self.log_path(session_id), "rb") as f:
+                return self._revision_of(f)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _revision_of(log_file) -> str:
+        log_file.seek(0)
+        header = log_file.readline()
+        log_id = json.loads(header).get("log_id") if header.endswith(b"\n") else None
+        return f"{log_id}:{os.fstat(log_file.fileno()).st_size}"
+
+    @staticmethod
+    def _read_served(path: str) -> List[dict]:
+        if not os.path.exists(path):
+            return []
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def _upgrade_legacy(self, session_id: str) -> Optional[SessionState]:
+        # Re-read under the exclusive lock: another process may have upgraded (and appended) meanwhile
+        with self._locked(session_id, fcntl.LOCK_EX):
+            loaded = self._read(session_id)
+            if not loaded:
+                return None
+            state, events, log_id = loaded
+            for event in events:
+                state.apply_answer(event)
+            if log_id is None:
+                self._write_snapshot(session_id, state)
+        self._set_pending(session_id, len(events))
+        return state
+
+    def _read(self, session_id: str) -> Optional[Tuple[SessionState, List[AnswerEvent], Optional[str]]]:
+        path = self.snapshot_path(session_id)
+        if not os.path.exists(path):
+            return None
+
+        with open(path, "r") as f:
+            data = json.load(f)
+        if "state" in data:
+            log_id = data.get("log_id")
+            state = self._decode_state(data.get("format", "json"), data["state"])
+        else:
+            # Legacy: a bare SessionState written before the event log existed
+            log_id = None
+            state = SessionState.model_validate(data)
+
+        events = []
+        log_path = self.log_path(session_id)
+        if log_id and os.path.exists(log_path):
+            with open(log_path, "r") as f:
+                header = f.readline()
+                if header and json.loads(header).get("log_id") == log_id:
+                    for line in f:
+                        # A torn final line (crash mid-write) is dropped rather than failing the load
+                        if not line.endswith("\n"): break
+                        events.append(AnswerEvent.model_validate_json(line))
+        return state, events, log_id
+
+    def _write_snapshot(self, session_id: str, state: SessionState):
+        log_id = uuid.uuid4().hex
+        snapshot_format, encoded = self._encode_state(state)
+        snapshot = {"log_id": log_id, "format": snapshot_format, "state": encoded}
+        atomic_write_text(self.snapshot_path(session_id), json.dumps(snapshot, indent=2))
+        atomic_write_text(self.log_path(session_id), json.dumps({"log_id": log_id}) + "\n")
+
+    def _encode_state(self, state: SessionState) -> Tuple[str, Any]:
+        if self.snapshot_format == "compact":
+            try:
+                table = kb_cache.get(state.current_topic).node_table
+            except FileNotFoundError:
+                table = None # Topic is gone: no node table to encode against
+            if table is not None:
+                self.node_tables.register(table)
+                blob = CompactSessionState.from_session(state, table).to_bytes()
+                return "compact", base64.b64encode(blob).decode("ascii")
+        return "json", state.model_dump(mode="json")
+
+    def _decode_state(self, snapshot_format: str, encoded: Any) -> SessionState:
+        if snapshot_format == "compact":
+            blob = base64.b64decode(encoded)
+            table = self.node_tables.get(CompactSessionState.fingerprint_of(blob))
+            return CompactSessionState.from_bytes(blob, table).to_session()
+        return SessionState.model_validate(encoded)
+
+    def _set_pending(self, session_id: str, count: int):
+        with self._pending_lock:
+            if count:
+                self._pending[session_id] = count
+            else:
+                self._pending.pop(session_id, None)
+
+    @contextmanager
+    def _locked(self, session_id: str, mode: int) -> Iterator[None]:
+        os.makedirs(self.sessions_dir, exist_ok=True)
+        with open(os.path.join(self.sessions_dir, f"{session_id}.lock"), "a") as lock_file:
+            fcntl.flock(lock_file.fileno(), mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions in one SQLite database (WAL mode), shared by API workers and the Streamlit UI.
+
+    Node states and attempts live in their own indexed tables, so an answer is an attempt
+    insert plus one node row upsert instead of a file rewrite. Answers are group-committed:
+    a writer thread commits everything queued meanwhile (up to commit_batch answers) in one
+    transaction. BEGIN IMMEDIATE serialises concurrent writers across processes, and each
+    node's transition is recomputed from the committed row so no update is lost.
+    The revision is a per-session counter bumped by every write.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id     TEXT PRIMARY KEY,
+            user_id        TEXT NOT NULL,
+            topic          TEXT NOT NULL,
+            active_node_id TEXT,
+            updated_at     REAL NOT NULL,
+            revision       INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS node_states (
+            session_id     TEXT NOT NULL,
+            node_id        TEXT NOT NULL,
+            mastery_score  REAL NOT NULL DEFAULT 0,
+            attempts       INTEGER NOT NULL DEFAULT 0,
+            correct_streak INTEGER NOT NULL DEFAULT 0,
+            correct_count  INTEGER NOT NULL DEFAULT 0,
+            mastered       INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (session_id, node_id)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS attempts (
+            id          INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id  TEXT NOT NULL,
+            node_id     TEXT NOT NULL,
+            question_id TEXT NOT NULL,
+            is_correct  INTEGER,
+            difficulty  TEXT,
+            timestamp   REAL,
+            generated   INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS served_questions (
+            session_id  TEXT NOT NULL,
+            question_id TEXT NOT NULL,
+            node_id     TEXT NOT NULL,
+            question    TEXT NOT NULL,
+            served_at   REAL NOT NULL,
+            PRIMARY KEY (session_id, question_id)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS adopted_history (
+            session_id  TEXT NOT NULL,
+            node_id     TEXT NOT NULL,
+            seen        TEXT NOT NULL, -- JSON list: static question ids answered before the session was stored here
+            recent      TEXT NOT NULL, -- JSON list: the recent ring at that point, oldest first
+            PRIMARY KEY (session_id, node_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_attempts_session ON attempts(session_id, id);
+        CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions(user_id);
+    """
+    # Columns added after the first release: (table, column, definition)
+    _MIGRATIONS = [
+        ("node_states", "correct_count", "INTEGER NOT NULL DEFAULT 0"),
+        ("attempts", "generated", "INTEGER NOT NULL DEFAULT 0"),
+        ("sessions", "revision", "INTEGER NOT NULL DEFAULT 0"),
+    ]
+
+    # Statements are constants so sqlite3's per-connection statement cache reuses the prepared form.
+    _SELECT_SESSION = "SELECT user_id, topic, active_node_id, revision FROM sessions WHERE session_id = ?"
+    _SELECT_REVISION = "SELECT revision FROM sessions WHERE session_id = ?"
+    _SELECT_NODES = """
+        SELECT node_id, mastery_score, attempts, correct_streak, correct_count, mastered
+        FROM node_states WHERE session_id = ?
+    """
+    _SELECT_NODE = """
+        SELECT mastery_score, attempts, correct_streak, correct_count, mastered
+        FROM node_states WHERE session_id = ? AND node_id = ?
+    """
+    _SELECT_SEEN = "SELECT DISTINCT node_id, question_id FROM attempts WHERE session_id = ? AND generated = 0"
+    _SELECT_RECENT = """
+        SELECT node_id, question_id FROM (
+            SELECT node_id, question_id, id,
+                   ROW_NUMBER() OVER (PARTITION BY node_id ORDER BY id DESC) AS age
+            FROM attempts WHERE session_id = ?
+        ) WHERE age <= ? ORDER BY id
+    """
+    _SELECT_ADOPTED = "SELECT node_id, seen, recent FROM adopted_history WHERE session_id = ?"
+    _UPSERT_SESSION = """
+        INSERT INTO sessions (session_id, user_id, topic, active_node_id, updated_at, revision) VALUES (?, ?, ?, ?, ?, 1)
+        ON CONFLICT(session_id) DO UPDATE SET
+            user_id = excluded.user_id, topic = excluded.topic,
+            active_node_id = excluded.active_node_id, updated_at = excluded.updated_at,
+            revision = sessions.revision + 1
+    """
+    _UPDATE_ACTIVE = "UPDATE sessions SET active_node_id = ?, updated_at = ?, revision = revision + 1 WHERE session_id = ?"
+    _UPSERT_NODE = """
+        INSERT INTO node_states (session_id, node_id, mastery_score, attempts, correct_streak, correct_count, mastered)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(session_id, node_id) DO UPDATE SET
+            mastery_score = excluded.mastery_score, attempts = excluded.attempts,
+            correct_streak = excluded.correct_streak, correct_count = excluded.correct_count,
+            mastered = excluded.mastered
+    """
+    _UPSERT_SERVED = """
+        INSERT INTO served_questions (session_id, question_id, node_id, question, served_at) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(session_id, question_id) DO UPDATE SET served_at = excluded.served_at
+    """
+    _PRUNE_SERVED = """
+        DELETE FROM served_questions WHERE session_id = ? AND question_id NOT IN (
+            SELECT question_id FROM served_questions WHERE session_id = ? ORDER BY served_at DESC LIMIT ?
+        )
+    """
+    _SELECT_SERVED = "SELECT node_id, question FROM served_questions WHERE session_id = ? AND question_id = ?"
+    _INSERT_ATTEMPT = """
+        INSERT INTO attempts (session_id, node_id, question_id, is_correct, difficulty, timestamp, generated)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """
+    _INSERT_ADOPTED = "INSERT INTO adopted_history (session_id, node_id, seen, recent) VALUES (?, ?, ?, ?)"
+
+    def __init__(self, db_path: str = Config.SESSION_DB_PATH, commit_batch: int = Config.SESSION_DB_COMMIT_BATCH):
+        self.db_path = db_path
+        self.commit_batch = max(1, commit_batch)
+        self._local = threading.local()
+        self._appends: "queue.Queue[_PendingAppend]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        conn = self._conn()
+        conn.executescript(self._SCHEMA)
+        self._migrate(conn)
+
+    def load(self, session_id: str) -> Optional[SessionState]:
+        conn = self._conn()
+        row = conn.execute(self._SELECT_SESSION, (session_id,)).fetchone()
+        if not row:
+            return None
+        user_id, topic, active_node_id, _ = row
+
+        node_states = {}
+        coverage_map = {}
+        for node_id, score, attempts, streak, correct, mastered in conn.execute(self._SELECT_NODES, (session_id,)):
+            node_states[node_id] = UserSkillState(
+                node_id=node_id, mastery_score=score, attempts=attempts, correct_streak=streak, correct_count=correct
+            )
+            if mastered:
+                coverage_map[node_id] = True
+
+        # History from before the session was stored here (e.g. an adopted legacy session) comes first
+        for node_id, seen, recent in conn.execute(self._SELECT_ADOPTED, (session_id,)):
+            if node_id in node_states:
+                node_states[node_id].seen.update(json.loads(seen))
+                node_states[node_id].recent.extend(json.loads(recent))
+        # The attempts table keeps every answer; only the seen ids and the last few answers are loaded
+        for node_id, question_id in conn.execute(self._SELECT_SEEN, (session_id,)):
+            if node_id in node_states:
+                node_states[node_id].seen.add(question_id)
+        for node_id, question_id in conn.execute(self._SELECT_RECENT, (session_id, Config.TUTOR_HISTORY_SIZE)):
+            if node_id in node_states:
+                node_states[node_id].recent.append(question_id)
+        for ns in node_states.values():
+            del ns.recent[:-Config.TUTOR_HISTORY_SIZE]
+
+        return SessionState(
+            user_id=user_id,
+            current_topic=topic,
+            node_states=node_states,
+            active_node_id=active_node_id,
+            coverage_map=coverage_map
+        )
+
+    def save(self, session_id: str, state: SessionState) -> Optional[str]:
+        # Replaces the stored session. Recorded attempts are dropped with it: a state built
+        # elsewhere (adopted legacy session) keeps its seen ids and recent ring in adopted_history,
+        # so the attempts table only ever holds graded answers.
+        node_rows = []
+        adopted_rows = []
+        for node_id, ns in state.node_states.items():
+            node_rows.append((session_id, node_id, ns.mastery_score, ns.attempts, ns.correct_streak,
+                              ns.correct_count, int(bool(state.coverage_map.get(node_id)))))
+            if ns.seen or ns.recent:
+                adopted_rows.append((session_id, node_id, json.dumps(sorted(ns.seen)), json.dumps(ns.recent)))
+        for node_id, covered in state.coverage_map.items():
+            if covered and node_id not in state.node_states:
+                node_rows.append((session_id, node_id, 0.0, 0, 0, 0, 1))
+
+        with self._transaction() as conn:
+            for table in ("node_states", "attempts", "adopted_history"):
+                conn.execute(f"DELETE FROM {table} WHERE session_id = ?", (session_id,))
+            conn.execute(self._UPSERT_SESSION, (session_id, state.user_id, state.current_topic,
+                                                state.active_node_id, time.time()))
+            conn.executemany(self._UPSERT_NODE, node_rows)
+            conn.executemany(self._INSERT_ADOPTED, adopted_rows)
+            (revision,) = conn.execute(self._SELECT_REVISION, (session_id,)).fetchone()
+        return str(revision)
+
+    def append(self, session_id: str, event: AnswerEvent, base_revision: Optional[str] = None) -> Optional[str]:
+        # Hand the answer to the writer thread and wait until its transaction has committed
+        pending = _PendingAppend(session_id, event, base_revision)
+        self._appends.put(pending)
+        self._ensure_writer()
+        pending.done.wait()
+        if pending.error:
+            raise pending.error
+        return pending.revision
+
+    def revision(self, session_id: str) -> Optional[str]:
+        row = self._conn().execute(self._SELECT_REVISION, (session_id,)).fetchone()
+        return str(row[0]) if row else None
+
+    def remember_question(self, session_id: str, node_id: str, question: Question):
+        with self._transaction() as conn:
+            conn.execute(self._UPSERT_SERVED, (session_id, question.id, node_id,
+                                               question.model_dump_json(), time.time()))
+            conn.execute(self._PRUNE_SERVED, (session_id, session_id, Config.SESSION_SERVED_QUESTIONS))
+
+    def recall_question(self, session_id: str, question_id: str) -> Optional[Tuple[str, Question]]:
+        row = self._conn().execute(self._SELECT_SERVED, (session_id, question_id)).fetchone()
+        return (row[0], Question.model_validate_json(row[1])) if row else None
+
+    # --- Helpers ---
+
+    def _ensure_writer(self):
+        with self._writer_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_appends, name="session-db-writer", daemon=True)
+                self._writer.start()
+
+    def _write_appends(self):
+        # Group commit: whatever queued up while the previous transaction ran goes into the next one
+        while True:
+            batch = [self._appends.get()]
+            while len(batch) < self.commit_batch:
+                try:
+                    batch.append(self._appends.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with self._transaction() as conn:
+                    for pending in batch:
+                        try:
+                            pending.revision = self._append_in(conn, pending.session_id, pending.event,
+                                                               pending.base_revision)
+                        except KeyError as e: # Unknown session: nothing was written for it
+                            pending.error = e
+            except Exception as e:
+                # The transaction rolled back: none of the batch was recorded
+                for pending in batch:
+                    pending.revision, pending.error = None, e
+            finally:
+                for pending in batch:
+                    pending.done.set()
+
+    def _append_in(self, conn: sqlite3.Connection, session_id: str, event: AnswerEvent,
+                   base_revision: Optional[str]) -> Optional[str]:
+        row = conn.execute(self._SELECT_SESSION, (session_id,)).fetchone()
+        if not row:
+            raise KeyError(f"Unknown session: {session_id}")
+        user_id, topic, active_node_id, revision = row
+
+        # Re-derive this node's transition from the committed row (another worker may have written it)
+        partial = SessionState(user_id=user_id, current_topic=topic, active_node_id=active_node_id)
+        node_row = conn.execute(self._SELECT_NODE, (session_id, event.node_id)).fetchone()
+        if node_row:
+            score, attempts, streak, correct, mastered = node_row
+            partial.node_states[event.node_id] = UserSkillState(
+                node_id=event.node_id, mastery_score=score, attempts=attempts,
+                correct_streak=streak, correct_count=correct
+            )
+            if mastered:
+                partial.coverage_map[event.node_id] = True
+        ns = partial.apply_answer(event)
+
+        conn.execute(self._INSERT_ATTEMPT, (session_id, event.node_id, event.question_id,
+                                            int(event.is_correct), event.difficulty.value, event.timestamp,
+                                            int(event.generated)))
+        conn.execute(self._UPSERT_NODE, (session_id, event.node_id, ns.mastery_score, ns.attempts,
+                                         ns.correct_streak, ns.correct_count,
+                                         int(bool(partial.coverage_map.get(event.node_id)))))
+        conn.execute(self._UPDATE_ACTIVE, (partial.active_node_id, event.timestamp, session_id))
+        return str(revision + 1) if str(revision) == base_revision else None
+
+    def _migrate(self, conn: sqlite3.Connection):
+        for table, column, definition in self._MIGRATIONS:
+            columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+            if column not in columns:
+                try:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+                except sqlite3.OperationalError as e:
+                    if "duplicate column" not in str(e): # Another process migrated first
+                        raise
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared between threads; keep one per thread.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, cached_statements=256)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")  # WAL + NORMAL: durable at checkpoints, no fsync per commit
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+class _PendingAppend:
+    """An answer waiting for SQLiteSessionStore's writer thread; `done` is set once it committed (or failed)."""
+
+    def __init__(self, session_id: str, event: AnswerEvent, base_revision: Optional[str]):
+        self.session_id = session_id
+        self.event = event
+        self.base_revision = base_revision
+        self.revision: Optional[str] = None
+        self.error: Optional[Exception] = None
+        self.done = threading.Event()
+
+
+_default_store: Optional[SessionStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """Process-wide store selected by Config.SESSION_STORE_BACKEND ("file" or "sqlite")."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            backend = Config.SESSION_STORE_BACKEND
+            if backend == "sqlite":
+                _default_store = SQLiteSessionStore()
+            elif backend == "file":
+                _default_store = EventLogSessionStore()
+            else:
+                raise ValueError(f"Unknown SESSION_STORE_BACKEND: {backend}")
+        return _default_store
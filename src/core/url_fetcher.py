@@ -0,0 +1,120 @@
+import os
+import json
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup
+
+from src.core.config import Config
+from src.core.fs_utils import atomic_write_text
+
+
+class UrlFetcher:
+    """
+    Fetches ingestion URLs in parallel over one pooled requests.Session.
+
+    Extracted text is cached on disk together with the response's ETag/Last-Modified,
+    so refetches are conditional (a 304 costs no body) and a URL that is down falls back
+    to its last good copy. Bodies are streamed and cut off at max_bytes; a body that doesn't
+    arrive within `timeout` counts as a failed fetch (an incomplete copy is never cached).
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = Config.URL_CACHE_DIR,
+        max_workers: int = Config.URL_FETCH_CONCURRENCY,
+        timeout: float = Config.URL_FETCH_TIMEOUT,
+        max_bytes: int = Config.URL_FETCH_MAX_BYTES,
+        max_chars: int = Config.URL_TEXT_MAX_CHARS,
+    ):
+        self.cache_dir = cache_dir # None disables the disk cache
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.max_chars = max_chars
+
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = "Mozilla/5.0"
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def fetch_all(self, urls: List[str]) -> Dict[str, str]:
+        """url -> extracted text ("" on failure), in the order given."""
+        unique = list(dict.fromkeys(urls))
+        if not unique: return {}
+        workers = max(1, min(self.max_workers, len(unique)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="url-fetch") as pool:
+            texts = list(pool.map(self.fetch, unique))
+        return dict(zip(unique, texts))
+
+    def fetch(self, url: str) -> str:
+        cached = self._read_cache(url)
+        headers = {}
+        if cached:
+            if cached.get("etag"): headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"): headers["If-Modified-Since"] = cached["last_modified"]
+
+        try:
+            with self.session.get(url, headers=headers, timeout=self.timeout, stream=True) as resp:
+                if resp.status_code == 304 and cached:
+                    return cached["text"]
+                resp.raise_for_status()
+                body = self._read_capped(resp)
+                text = self._extract_text(body, resp)
+                etag, last_modified = resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+        except Exception as e:
+            print(f"      ⚠️ Could not fetch {url}: {e}")
+            return cached["text"] if cached else "" # Serve the last good copy if we have one
+
+        if etag or last_modified:
+            self._write_cache(url, {"url": url, "etag": etag, "last_modified": last_modified, "text": text})
+        return text
+
+    # --- Helpers ---
+
+    def _read_capped(self, resp: requests.Response) -> bytes:
+        # `timeout` only bounds each socket read, so also bound the whole body.
+        deadline = time.monotonic() + self.timeout
+        chunks, size = [], 0
+        for chunk in resp.iter_content(chunk_size=64 * 1024):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= self.max_bytes:
+                break
+            if time.monotonic() > deadline:
+                # Unlike the size cap, where the cut lands depends on timing: don't keep it
+                raise TimeoutError(f"body not received within {self.timeout}s ({size} bytes read)")
+        return b"".join(chunks)[:self.max_bytes]
+
+    def _extract_text(self, body: bytes, resp: requests.Response) -> str:
+        content_type = resp.headers.get("Content-Type", "")
+        if "html" in content_type or not content_type:
+            # Hand bytes to BeautifulSoup so it can honour a <meta charset>
+            declared = resp.encoding if "charset" in content_type.lower() else None
+            soup = BeautifulSoup(body, 'html.parser', from_encoding=declared)
+            for s in soup(["script", "style", "nav", "footer"]): s.decompose()
+            return soup.get_text()[:self.max_chars]
+        return body.decode(resp.encoding or "utf-8", errors="replace")[:self.max_chars]
+
+    def _cache_path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, f"{hashlib.sha256(url.encode('utf-8')).hexdigest()}.json")
+
+    def _read_cache(self, url: str) -> Optional[dict]:
+        if not self.cache_dir: return None
+        try:
+            with open(self._cache_path(url), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_cache(self, url: str, entry: dict):
+        if not self.cache_dir: return
+        try:
+            atomic_write_text(self._cache_path(url), json.dumps(entry, ensure_ascii=False))
+        except OSError as e:
+            print(f"      ⚠️ Could not cache {url}: {e}")
@@ -1,7 +1,6 @@
 import os
 import sys
-import json
-from src.core.schema import KnowledgeBase
+from src.core.kb_store import load_knowledge_base
 from src.agents.tutor_agent import TutorAgent
 
 def main():
@@ -15,10 +14,8 @@ def main():
         print(f"❌ Error: Database not found at {db_path}. Run ingestion first.")
         return
 
-    with open(db_path, "r") as f:
-        data = json.load(f)
-        # Parse back into Pydantic model
-        kb = KnowledgeBase(**data)
+    # Parse back into Pydantic model (handles every on-disk KB format)
+    kb = load_knowledge_base(db_path)
 
     # 2. Init Tutor
     tutor = TutorAgent(kb)
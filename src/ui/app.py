@@ -1,7 +1,7 @@
 import streamlit as st
 import os
 import glob
-from src.agents.tutor_agent import TutorAgent
+from src.agents.tutor_agent import TutorAgent, QuestionUnavailableError
 from src.agents.ingestion_agent import IngestionAgent # For Ingest UI
 from src.core.config import Config
 
@@ -95,6 +95,15 @@ with st.sidebar:
 
 # --- Main Logic: Session Management ---
 
+def next_question():
+    """The agent's next question; None with `unavailable` set if none can be served right now."""
+    st.session_state.unavailable = None
+    try:
+        return st.session_state.agent.get_next_question()
+    except QuestionUnavailableError as e:
+        st.session_state.unavailable = str(e)
+        return None
+
 if "agent" not in st.session_state:
     st.session_state.agent = TutorAgent()
     st.session_state.current_q = None
@@ -106,7 +115,7 @@ if selected_topic and (not st.session_state.topic_started or st.session_state.ag
     try:
         st.session_state.agent.start_session("user_stream", selected_topic)
         st.session_state.topic_started = True
-        st.session_state.current_q = st.session_state.agent.get_next_question()
+        st.session_state.current_q = next_question()
         st.session_state.feedback = None
         st.rerun()
     except Exception as e:
@@ -124,6 +133,13 @@ if not selected_topic:
 
 q = st.session_state.current_q
 
+if not q and st.session_state.get("unavailable"):
+    st.warning(f"⏳ {st.session_state.unavailable} Please try again in a moment.")
+    if st.button("Try Again"):
+        st.session_state.current_q = next_question()
+        st.rerun()
+    st.stop()
+
 if not q:
     st.balloons()
     st.success("🎉 Topic Mastered! You have completed all available concepts in this library.")
@@ -140,45 +156,42 @@ def render_graph():
     edges = []
     
     agent = st.session_state.agent
-    if not agent.kb: return
-    
-    # BFS to build graph
-    stack = [agent.kb.root]
+    kb = agent.kb
+    if not kb: return
     
-    while stack:
-        node = stack.pop(0)
+    # Nodes are numbered in document order with parents first: one pass over the arrays
+    for i, node_id in enumerate(kb.ids):
+        parent = kb.parent[i]
         
         # Determine Color & Icon
         color = "#4B4B4B" # Default Gray
         label_color = "white"
         symbol_type = "circle" # default
         
-        if node.id == agent.session.active_node_id:
+        if node_id == agent.session.active_node_id:
             color = "#33b5e5" # Active Blue
             label_color = "#33b5e5"
             symbol_type = "diamond"
-        elif agent.session.coverage_map.get(node.id):
+        elif agent.session.coverage_map.get(node_id):
             color = "#00C851" # Mastered Green
             
         # Add Node
         nodes.append(Node(
-            id=node.id,
-            label=node.name,
-            size=25 if not node.parent_id else (20 if not node.is_leaf else 15),
+            id=node_id,
+            label=kb.name(i),
+            size=25 if parent < 0 else (20 if not kb.is_leaf(i) else 15),
             color=color,
             font={'color': label_color},
             symbolType=symbol_type
         ))
         
         # Add Edge
-        if node.parent_id:
+        if parent >= 0:
             edges.append(Edge(
-                source=node.parent_id,
-                target=node.id,
+                source=kb.ids[parent],
+                target=node_id,
                 color="#555555"
             ))
-            
-        stack.extend(node.children)
         
 
     config = GraphConfig(
@@ -201,10 +214,10 @@ with st.expander("🗺️ Knowledge Map (Interactive)", expanded=True):
 
 # 1. Breadcrumbs & Question Card
 active_node_id = st.session_state.agent.session.active_node_id
-active_node = st.session_state.agent.kb.node_map.get(active_node_id) if active_node_id else None
+active_node = st.session_state.agent.kb.index_of(active_node_id) if active_node_id else None
 
-if active_node:
-    breadcrumb = active_node.path.replace(" > ", "  /  ")
+if active_node is not None:
+    breadcrumb = st.session_state.agent.kb.path(active_node).replace(" > ", "  /  ")
     streak_val = st.session_state.agent.session.node_states[active_node_id].correct_streak
     streak_display = f"{streak_val} / {Config.TUTOR_MASTERY_STREAK}"
 else:
@@ -260,5 +273,5 @@ if st.session_state.feedback:
     
     if st.button("Next Question ➡️", type="primary"):
         st.session_state.feedback = None
-        st.session_state.current_q = st.session_state.agent.get_next_question()
+        st.session_state.current_q = next_question()
         st.rerun()
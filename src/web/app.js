@@ -2,11 +2,28 @@ const app = {
     state: {
         topic: null,
         currentQ: null,
-        user: "user_web"
+        nextQ: null, // Served with the answer's feedback, shown on "Continue"
+        nextStatus: null, // Status bar and graph changes for nextQ, applied with it
+        nextDelta: null,
+        sessionId: null,
+        user: null
+    },
+
+    userId: function () {
+        // One learner per browser: a random id kept across visits
+        let id = localStorage.getItem('sp_user_id');
+        if (!id) {
+            id = (window.crypto && crypto.randomUUID)
+                ? crypto.randomUUID()
+                : 'web-' + Date.now().toString(36) + Math.random().toString(36).slice(2);
+            localStorage.setItem('sp_user_id', id);
+        }
+        return id;
     },
 
     init: async function () {
         console.log("🚀 App v11 Initialized");
+        this.state.user = this.userId();
 
         // Wait briefly for Graph
         setTimeout(() => {
@@ -71,27 +88,60 @@ const app = {
         btn.innerHTML = '<i class="fa-solid fa-spinner fa-spin"></i>';
 
         try {
-            await fetch('/api/ingest', {
+            const res = await fetch('/api/ingest', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({ topic_name: name })
             });
+            const body = await res.json();
+            // 409: this topic is already being ingested - follow that job instead
+            const jobId = res.status === 409 ? body.detail.job_id : body.job_id;
+            if (!res.ok && res.status !== 409) throw new Error(body.detail || `HTTP ${res.status}`);
+
+            const job = await this.followIngestJob(jobId, (p) => {
+                btn.innerHTML = `<i class="fa-solid fa-spinner fa-spin"></i> ${this.formatIngestProgress(p)}`;
+            });
+            if (job.status !== 'succeeded') throw new Error(job.error || job.status);
             app.startSession(name);
         } catch (e) {
-            alert("Ingestion failed: " + e);
+            alert("Ingestion failed: " + e.message);
         }
         btn.innerHTML = origText;
     },
 
+    followIngestJob: function (jobId, onProgress) {
+        // Resolves with the final job status; progress arrives as Server-Sent Events.
+        return new Promise((resolve) => {
+            const source = new EventSource(`/api/ingest/jobs/${jobId}/events`);
+            source.addEventListener('progress', (e) => onProgress(JSON.parse(e.data)));
+            source.addEventListener('status', (e) => {
+                const data = JSON.parse(e.data);
+                if (['succeeded', 'failed', 'cancelled'].includes(data.status)) {
+                    source.close();
+                    resolve(data);
+                }
+            });
+        });
+    },
+
+    formatIngestProgress: function (p) {
+        if (p.stage !== 'questions') return p.stage === 'skeleton' ? 'Planning...' : 'Preparing...';
+        const eta = p.eta_seconds != null ? ` · ETA ${Math.ceil(p.eta_seconds)}s` : '';
+        return `${p.done}/${p.total}${eta}`;
+    },
+
     startSession: async function (topicName) {
         this.state.topic = topicName;
 
         try {
-            await fetch('/api/session/start', {
+            const res = await fetch('/api/session/start', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({ user_id: this.state.user, topic_name: topicName })
             });
+            if (!res.ok) throw new Error(`HTTP ${res.status}`);
+            const session = await res.json();
+            this.state.sessionId = session.session_id;
 
             document.getElementById('setup-panel').classList.add('hidden');
             document.getElementById('question-panel').classList.remove('hidden');
@@ -110,7 +160,16 @@ const app = {
         document.getElementById('question-content').innerHTML = '<div style="text-align:center; padding: 20px;"><i class="fa-solid fa-spinner fa-spin"></i> Generating...</div>';
 
         try {
-            const res = await fetch('/api/session/next');
+            const res = await fetch(`/api/session/next?session_id=${encodeURIComponent(this.state.sessionId)}`);
+            if (res.status === 503) {
+                // Nothing to serve for this concept yet (not the end of the topic): try again shortly
+                const wait = parseInt(res.headers.get('Retry-After') || '5', 10);
+                const body = await res.json();
+                document.getElementById('question-content').innerHTML =
+                    `<div style="text-align:center; padding: 20px;">⏳ ${body.detail} Retrying in ${wait}s...</div>`;
+                setTimeout(() => this.nextQuestion(), wait * 1000);
+                return;
+            }
             const q = await res.json();
             this.state.currentQ = q;
 
@@ -126,6 +185,24 @@ const app = {
         }
     },
 
+    showNextQuestion: function () {
+        // The answer response already carried the next question: no request needed
+        const q = this.state.nextQ;
+        this.renderStats(this.state.nextStatus);
+        if (window.Graph && this.state.nextDelta) Graph.applyDelta(this.state.nextDelta);
+        this.state.nextStatus = this.state.nextDelta = null;
+        if (!q) return this.nextQuestion();
+        this.state.nextQ = null;
+        this.state.currentQ = q;
+
+        document.getElementById('feedback-overlay').classList.add('hidden');
+        if (q.id === "DONE") {
+            this.renderDone();
+            return;
+        }
+        this.renderQuestion(q);
+    },
+
     renderQuestion: function (q) {
         document.getElementById('difficulty-badge').innerText = q.difficulty || "PRACTICE";
         document.getElementById('question-content').innerHTML = q.content;
@@ -158,16 +235,23 @@ const app = {
         buttons.forEach(b => b.disabled = true);
 
         try {
-            const res = await fetch('/api/session/submit', {
+            // Grades and advances in one round trip: feedback, next question, status and graph changes
+            const res = await fetch('/api/session/answer', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({
+                    session_id: this.state.sessionId,
                     question_id: this.state.currentQ.id,
                     user_answer: ans
                 })
             });
 
+            if (!res.ok) throw new Error(`HTTP ${res.status}`);
             const result = await res.json();
+            this.state.nextQ = result.next_question;
+            // Status and graph already point at the next node: keep them until "Continue"
+            this.state.nextStatus = result.status;
+            this.state.nextDelta = result.graph_delta;
 
             const overlay = document.getElementById('feedback-overlay');
             overlay.classList.remove('hidden');
@@ -179,11 +263,8 @@ const app = {
 
             // Explicit loop for continues button
             const nextBtn = overlay.querySelector('button');
-            if (nextBtn) nextBtn.onclick = () => this.nextQuestion();
+            if (nextBtn) nextBtn.onclick = () => this.showNextQuestion();
 
-            if (result.is_correct && window.Graph) {
-                Graph.loadData();
-            }
         } catch (e) {
             console.error("Submit Error", e);
             buttons.forEach(b => b.disabled = false);
@@ -194,15 +275,21 @@ const app = {
 
     updateStats: async function () {
         try {
-            const res = await fetch('/api/session/status');
-            const status = await res.json();
-            if (status.breadcrumb) {
-                document.getElementById('breadcrumb-text').innerText = status.breadcrumb;
-            }
-            document.getElementById('streak-display').innerText = `🔥 ${status.streak} Streak`;
+            const res = await fetch(`/api/session/status?session_id=${encodeURIComponent(this.state.sessionId)}`);
+            this.renderStats(await res.json());
         } catch (e) { }
     },
 
+    renderStats: function (status) {
+        if (!status) return;
+        if (status.breadcrumb) {
+            document.getElementById('breadcrumb-text').innerText = status.breadcrumb;
+        }
+        if (status.streak !== undefined) {
+            document.getElementById('streak-display').innerText = `🔥 ${status.streak} Streak`;
+        }
+    },
+
     renderDone: function () {
         document.getElementById('question-content').innerHTML = "<h1>🎉 Topic Mastered!</h1>";
         document.getElementById('options-grid').innerHTML = `<button onclick="location.reload()" class="btn-glow">Restart</button>`;
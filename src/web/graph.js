@@ -88,12 +88,12 @@ const Graph = {
     },
 
     loadData: async function () {
-        if (!this.cy) return;
+        if (!this.cy || !window.app || !app.state.sessionId) return;
 
         try {
             this.stopPulse();
 
-            const response = await fetch('/api/kb/graph');
+            const response = await fetch(`/api/kb/graph?session_id=${encodeURIComponent(app.state.sessionId)}`);
             const data = await response.json();
 
             this.cy.elements().remove();
@@ -137,6 +137,18 @@ const Graph = {
         }
     },
 
+    applyDelta: function (delta) {
+        // Recolours only the nodes whose status changed; the layout stays put
+        if (!this.cy || !delta || delta.length === 0) return;
+
+        this.stopPulse();
+        delta.forEach(change => {
+            const node = this.cy.getElementById(change.id);
+            if (node.nonempty()) node.data('status', change.status);
+        });
+        this.startPulse();
+    },
+
     startPulse: function () {
         const activeNode = this.cy.nodes('[status = "active"]');
         if (activeNode.length === 0) return;
@@ -0,0 +1,128 @@
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+import src.api.server as server
+from src.api.session_manager import SessionManager
+from src.core.config import Config
+from src.core.kb_cache import kb_cache
+from src.core.kb_store import save_knowledge_base
+from src.core.schema import Difficulty, KnowledgeBase, KnowledgeNode, Question, QuestionType, UserSkillState
+from src.core.session_store import EventLogSessionStore
+
+BUCKETS = {Difficulty.BEGINNER: 2, Difficulty.INTERMEDIATE: 2, Difficulty.ADVANCED: 3}
+
+
+def _question(difficulty: Difficulty) -> Question:
+    return Question(id=str(uuid.uuid4()), difficulty=difficulty, type=QuestionType.MULTIPLE_CHOICE,
+                    content="Pick the right one", options=["right", "wrong"], correct_answer="A",
+                    explanation="Because")
+
+
+def _leaf(node_id: str, empty: bool = False) -> KnowledgeNode:
+    questions = {} if empty else {d: [_question(d) for _ in range(n)] for d, n in BUCKETS.items()}
+    return KnowledgeNode(id=node_id, name=node_id.title(), description="", path=f"Topic > {node_id.title()}",
+                         parent_id="root", is_leaf=True, questions=questions)
+
+
+def _save_topic(db_dir, topic: str, *leaves: KnowledgeNode):
+    root = KnowledgeNode(id="root", name="Topic", description="", path="Topic", children=list(leaves))
+    save_knowledge_base(KnowledgeBase(topic_name=topic, root=root), str(db_dir / f"{topic}.json"))
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    db_dir = tmp_path / "db"
+    db_dir.mkdir()
+    _save_topic(db_dir, "topic", _leaf("first"), _leaf("second"))
+    _save_topic(db_dir, "gap", _leaf("first"), _leaf("empty", empty=True))
+    # No LLM: dynamic questions and prefetching are off, static questions are served
+    monkeypatch.setattr(Config, "GEMINI_API_KEY", None)
+    monkeypatch.setattr(kb_cache, "db_dir", str(db_dir))
+    store = EventLogSessionStore(str(tmp_path / "sessions"), snapshot_format="json")
+    monkeypatch.setattr(server, "session_manager", SessionManager(store=store))
+    yield TestClient(server.app)
+    for topic in ("topic", "gap"):
+        kb_cache.invalidate(topic)
+
+
+def _start(client, topic: str = "topic") -> str:
+    return client.post("/api/session/start", json={"user_id": "learner", "topic_name": topic}).json()["session_id"]
+
+
+def _answer(client, session_id: str, question_id: str, user_answer: str = "A") -> dict:
+    response = client.post("/api/session/answer", json={
+        "session_id": session_id, "question_id": question_id, "user_answer": user_answer
+    })
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_answer_grades_records_and_advances(client):
+    session_id = _start(client)
+    question = client.get("/api/session/next", params={"session_id": session_id}).json()
+
+    body = _answer(client, session_id, question["id"], user_answer="right")
+    assert body["is_correct"] and body["next_question"]["id"] not in ("DONE", question["id"])
+    assert body["status"] == client.get("/api/session/status", params={"session_id": session_id}).json()
+    assert body["graph_delta"] == []
+
+    body = _answer(client, session_id, body["next_question"]["id"], user_answer="B")
+    assert not body["is_correct"] and body["status"]["streak"] == 0
+    # Both answers are in the store, not just in the live agent
+    stored = server.session_manager.store.load(session_id)
+    assert stored.node_states["first"].attempts == 2
+
+
+def test_answering_through_the_topic_reports_each_mastered_leaf(client):
+    session_id = _start(client)
+    question = client.get("/api/session/next", params={"session_id": session_id}).json()
+    deltas = []
+    for _ in range(40):
+        body = _answer(client, session_id, question["id"])
+        deltas.extend((change["id"], change["status"]) for change in body["graph_delta"])
+        question = body["next_question"]
+        if question["id"] == "DONE":
+            break
+
+    assert question["id"] == "DONE" and body["status"] == {"active": True, "mastered_all": True}
+    assert deltas == [("first", "mastered"), ("second", "active"), ("second", "mastered")]
+
+
+def test_empty_leaf_gives_no_next_question_instead_of_done(client):
+    session_id = _start(client, "gap")
+    question = client.get("/api/session/next", params={"session_id": session_id}).json()
+    for _ in range(20):
+        body = _answer(client, session_id, question["id"])
+        question = body["next_question"]
+        if question is None:
+            break
+        assert question["id"] != "DONE"
+
+    assert question is None and body["status"]["active"] and "mastered_all" not in body["status"]
+    response = client.get("/api/session/next", params={"session_id": session_id})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(Config.TUTOR_RETRY_AFTER_SECONDS)
+
+
+def test_dynamic_question_recalled_from_the_store_is_graded_on_its_node(client):
+    session_id = _start(client)
+    client.get("/api/session/next", params={"session_id": session_id})
+    agent = server.session_manager._entries[session_id].agent
+
+    # Served by another worker on "first": only the session store knows it
+    question = _question(Difficulty.ADVANCED)
+    question.metadata["generated"] = True
+    agent.store.remember_question(session_id, "first", question)
+    agent.session.node_states["first"] = UserSkillState(node_id="first", attempts=2, correct_streak=2)
+    agent.session.active_node_id = "second"
+
+    body = _answer(client, session_id, question.id)
+    assert body["is_correct"]
+    assert body["graph_delta"] == [{"id": "first", "status": "mastered"}]
+
+
+def test_unknown_session_is_404(client):
+    response = client.post("/api/session/answer", json={"session_id": "nobody", "question_id": "q", "user_answer": "A"})
+    assert response.status_code == 404
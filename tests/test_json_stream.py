@@ -0,0 +1,50 @@
+import json
+
+from src.core.json_stream import TreeLeafScanner
+
+TREE = {
+    "name": "Python",
+    "children": [
+        {"name": "Basics", "description": "Braces { and [ in \"strings\" are text", "children": [
+            {"name": "Variables", "description": "x = {}", "keywords": ["a", "b"]},
+            {"name": "Types \\ Escapes", "description": "Line\nbreak", "children": []},
+        ]},
+        {"name": "Loops", "description": "Iteration", "children": [
+            {"name": "For", "description": "for x in y:"},
+        ]},
+    ],
+}
+
+
+def _scan(fragments):
+    leaves = []
+    scanner = TreeLeafScanner(lambda leaf, ancestors: leaves.append((leaf, ancestors)))
+    for fragment in fragments:
+        scanner.feed(fragment)
+    return scanner, leaves
+
+
+def test_leaves_are_reported_with_their_ancestors_whatever_the_fragmenting():
+    text = json.dumps(TREE, indent=2)
+    expected = [
+        ({"name": "Variables", "description": "x = {}", "keywords": ["a", "b"]}, ["Python", "Basics"]),
+        ({"name": "Types \\ Escapes", "description": "Line\nbreak", "children": []}, ["Python", "Basics"]),
+        ({"name": "For", "description": "for x in y:"}, ["Python", "Loops"]),
+    ]
+    for size in (1, 3, 17, len(text)):
+        scanner, leaves = _scan(text[i:i + size] for i in range(0, len(text), size))
+        assert leaves == expected
+        assert json.loads(scanner.text) == TREE
+
+
+def test_leaves_fire_before_the_tree_is_complete():
+    text = json.dumps(TREE)
+    cut = text.index('"Loops"')
+    _, leaves = _scan([text[:cut]])
+    assert [leaf["name"] for leaf, _ in leaves] == ["Variables", "Types \\ Escapes"]
+
+
+def test_parent_named_after_its_children():
+    text = '{"children": [{"children": [{"name": "Leaf"}], "name": "Late"}], "name": "Root"}'
+    _, leaves = _scan([text])
+    assert leaves == [({"name": "Leaf"}, [None, None])]
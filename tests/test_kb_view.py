@@ -0,0 +1,84 @@
+from src.core.kb_view import CompactKnowledgeBase
+from src.core.schema import AnswerKey, Difficulty, KnowledgeBase, KnowledgeNode, Question, QuestionType
+
+
+def _question(qid: str, difficulty: Difficulty, **fields) -> Question:
+    return Question(id=qid, difficulty=difficulty, type=fields.pop("type", QuestionType.MULTIPLE_CHOICE),
+                    content=f"Content of {qid}", options=fields.pop("options", ["one", "two", "two"]),
+                    correct_answer=fields.pop("correct_answer", "B"), explanation=f"Why {qid}",
+                    metadata=fields.pop("metadata", {"generated_by": "gemini", "model": "m"}))
+
+
+def _node(node_id: str, path: str, children=(), questions=None) -> KnowledgeNode:
+    return KnowledgeNode(id=node_id, name=node_id.title(), description=f"About {node_id}", path=path,
+                         children=list(children), is_leaf=not children, questions=questions or {})
+
+
+def _knowledge_base() -> KnowledgeBase:
+    leaf_a = _node("a", "Topic > Basics > A", questions={
+        Difficulty.BEGINNER: [_question("a1", Difficulty.BEGINNER), _question("a2", Difficulty.BEGINNER)],
+        Difficulty.ADVANCED: [_question("a3", Difficulty.ADVANCED, type=QuestionType.CODE_CORRECTION,
+                                        options=None, correct_answer="x = 1", metadata={})],
+    })
+    leaf_b = _node("b", "Topic > Basics > B")  # An empty leaf
+    leaf_c = _node("c", "Elsewhere > C", questions={  # Path that doesn't extend its parent's
+        Difficulty.INTERMEDIATE: [_question("c1", Difficulty.INTERMEDIATE, metadata={"source": "c.txt"})],
+    })
+    basics = _node("basics", "Topic > Basics", children=[leaf_a, leaf_b])
+    return KnowledgeBase(topic_name="topic", root=_node("root", "Topic", children=[basics, leaf_c]))
+
+
+def _walk(node: KnowledgeNode):
+    yield node
+    for child in node.children:
+        yield from _walk(child)
+
+
+def test_tree_matches_the_pydantic_model():
+    kb = _knowledge_base()
+    compact = CompactKnowledgeBase(kb)
+    nodes = list(_walk(kb.root))
+
+    # Document order: the root is 0 and the leaves in index order are the teaching order
+    assert compact.ids == [node.id for node in nodes]
+    assert compact.leaf_ids == ["a", "b", "c"]
+    assert compact.leaf_positions == {"a": 0, "b": 1, "c": 2}
+    for node in nodes:
+        i = compact.index_of(node.id)
+        assert compact.name(i) == node.name and compact.description(i) == node.description
+        assert compact.path(i) == node.path
+        assert compact.is_leaf(i) == node.is_leaf
+        assert [compact.ids[c] for c in compact.children(i)] == [child.id for child in node.children]
+    assert compact.index_of("missing") is None
+
+
+def test_questions_are_rebuilt_from_columns():
+    kb = _knowledge_base()
+    compact = CompactKnowledgeBase(kb)
+    for node in _walk(kb.root):
+        i = compact.index_of(node.id)
+        for difficulty in Difficulty:
+            expected = node.questions.get(difficulty, [])
+            assert compact.questions(i, difficulty) == expected
+            assert [compact.question_id(pos) for pos in compact.question_range(i, difficulty)] == [q.id for q in expected]
+            for q in expected:
+                entry = compact.get_question(q.id)
+                assert entry.node_id == node.id and entry.question == q
+                assert entry.answer_key == AnswerKey.for_question(q)
+        assert compact.all_questions(i) == [q for d in Difficulty for q in node.questions.get(d, [])]
+
+    # Rebuilt questions don't share mutable fields with the table
+    q = compact.get_question("a1").question
+    q.options.append("three")
+    q.metadata["touched"] = True
+    assert compact.get_question("a1").question == _question("a1", Difficulty.BEGINNER)
+
+
+def test_dynamic_questions_are_kept_gradeable_up_to_the_limit():
+    compact = CompactKnowledgeBase(_knowledge_base(), max_dynamic=2)
+    for qid in ("d1", "d2", "d3"):
+        compact.register_question("b", _question(qid, Difficulty.BEGINNER))
+    assert compact.get_question("d1") is None
+    assert compact.get_question("d3").node_id == "b"
+    # Dynamic questions are gradeable but not served from the node's buckets
+    assert compact.questions(compact.index_of("b"), Difficulty.BEGINNER) == []
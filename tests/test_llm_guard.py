@@ -0,0 +1,107 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.core.llm import agenerate_hedged
+from src.core.llm_guard import CircuitBreaker, LatencyTracker
+from src.core.rate_limiter import TokenBucketRateLimiter
+
+
+class _Model:
+    """Async stand-in model: each call takes the next (delay, text or exception) from the script."""
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.calls = 0
+        self.cancelled = 0
+
+    async def generate_content_async(self, prompt, generation_config=None):
+        delay, outcome = self.script[self.calls]
+        self.calls += 1
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if isinstance(outcome, Exception):
+            raise outcome
+        return SimpleNamespace(text=outcome, usage_metadata=None)
+
+
+def _hedged(model, hedge_after, latency=None):
+    limiter = TokenBucketRateLimiter(requests_per_minute=60000, tokens_per_minute=10 ** 9)
+    return asyncio.run(agenerate_hedged(model, "prompt", hedge_after, latency=latency,
+                                        retries=0, limiter=limiter, cache=None))
+
+
+def test_breaker_opens_probes_once_and_closes():
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_seconds=0.05)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.is_closed and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+
+    time.sleep(0.06)
+    # Half-open: exactly one probe gets through
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN and not breaker.allow()
+    breaker.record_success()
+    assert breaker.is_closed and breaker.failures == 0
+
+
+def test_failed_probe_reopens_and_lost_probe_is_retried():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_seconds=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+
+    # A probe that never reports back doesn't wedge the breaker half-open
+    time.sleep(0.06)
+    assert breaker.allow() and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+
+
+def test_latency_percentile_needs_min_samples():
+    latency = LatencyTracker(window=10, min_samples=5)
+    for seconds in (0.1, 0.2, 0.3, 0.4):
+        latency.record(seconds)
+    assert latency.percentile(95) is None
+    for seconds in (0.5, 0.6, 0.7, 0.8, 0.9, 1.0, 1.1):
+        latency.record(seconds)
+    # Only the last 10 samples are kept
+    assert latency.percentile(0) == 0.2
+    assert latency.percentile(100) == 1.1
+
+
+def test_hedge_wins_over_a_slow_first_call():
+    model = _Model((1.0, "slow"), (0.01, "fast"))
+    latency = LatencyTracker(min_samples=1)
+    start = time.monotonic()
+    assert _hedged(model, hedge_after=0.05, latency=latency).text == "fast"
+    assert time.monotonic() - start < 0.5
+    assert model.calls == 2 and model.cancelled == 1
+    assert latency.percentile(50) < 0.5
+
+
+def test_failed_first_call_hedges_immediately():
+    model = _Model((0.0, RuntimeError("boom")), (0.01, "second"))
+    start = time.monotonic()
+    assert _hedged(model, hedge_after=10).text == "second"
+    assert time.monotonic() - start < 1
+
+
+def test_hedging_disabled_and_all_failed():
+    model = _Model((0.01, RuntimeError("first")), (0.01, "unused"))
+    with pytest.raises(RuntimeError, match="first"):
+        _hedged(model, hedge_after=None)
+    assert model.calls == 1
+
+    model = _Model((0.0, RuntimeError("first")), (0.01, RuntimeError("second")))
+    with pytest.raises(RuntimeError, match="second"):
+        _hedged(model, hedge_after=0.05)
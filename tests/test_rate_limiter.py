@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+import pytest
+
+from src.core.rate_limiter import TokenBucketRateLimiter
+
+
+def _limiter(**overrides) -> TokenBucketRateLimiter:
+    settings = dict(requests_per_minute=60, tokens_per_minute=600, burst_seconds=2,
+                    min_fraction=0.1, recovery_step=0.05)
+    settings.update(overrides)
+    return TokenBucketRateLimiter(**settings)
+
+
+def test_idle_quota_is_capped_at_the_burst():
+    limiter = _limiter()  # 1 request/s, bursts of 2
+    assert limiter._try_acquire(0) is None
+    assert limiter._try_acquire(0) is None
+    # The bucket is empty: the next request is a second away
+    assert 0.9 < limiter._try_acquire(0) <= 1.0
+
+
+def test_token_bucket_waits_for_tokens_and_lets_oversized_calls_through():
+    limiter = _limiter(requests_per_minute=6000, burst_seconds=1)  # 10 tokens/s, at most 10 held
+    assert limiter._try_acquire(8) is None
+    assert limiter._try_acquire(8) == pytest.approx(0.6, abs=0.05)
+
+    # A call larger than the whole bucket goes once the bucket is full
+    limiter._tokens = limiter._max_tokens()
+    assert limiter._try_acquire(50) is None
+
+
+def test_reconcile_refunds_overestimated_tokens():
+    limiter = _limiter(requests_per_minute=6000, burst_seconds=1)
+    assert limiter._try_acquire(8) is None
+    limiter.reconcile(estimated_tokens=8, actual_tokens=2)
+    assert limiter._try_acquire(8) is None
+
+
+def test_throttle_halves_capacity_and_success_recovers_it():
+    limiter = _limiter()
+    limiter.on_throttle()
+    assert limiter.capacity_fraction == 0.5
+    # What we thought we had is drained: the next call must wait (at the halved rate)
+    assert limiter._try_acquire(0) > 0
+
+    for _ in range(5):
+        limiter.on_throttle()
+    assert limiter.capacity_fraction == 0.1  # Floor
+
+    for _ in range(4):
+        limiter.on_success()
+    assert limiter.capacity_fraction == pytest.approx(0.3)
+    for _ in range(100):
+        limiter.on_success()
+    assert limiter.capacity_fraction == 1.0
+
+
+def test_async_acquire_spaces_out_concurrent_callers():
+    limiter = _limiter(requests_per_minute=600, burst_seconds=0.1)  # 10 requests/s, one at a time
+
+    async def run():
+        start = time.monotonic()
+        await asyncio.gather(*(limiter.acquire_async() for _ in range(3)))
+        return time.monotonic() - start
+
+    assert asyncio.run(run()) >= 0.15
@@ -0,0 +1,37 @@
+from src.core.config import Config
+from src.core.schema import AnswerEvent, Difficulty, SessionState, UserSkillState
+
+
+def test_seen_is_a_set_and_recent_is_bounded():
+    ns = UserSkillState(node_id="leaf")
+    answers = [(f"q{i % 3}", i % 2 == 0) for i in range(Config.TUTOR_HISTORY_SIZE + 5)]
+    for question_id, is_correct in answers:
+        ns.record(question_id, is_correct)
+    ns.record("dynamic", is_correct=True, generated=True)
+
+    assert ns.attempts == len(answers) + 1
+    assert ns.correct_count == sum(is_correct for _, is_correct in answers) + 1
+    # Dynamic questions are never served twice, so they are not tracked as seen
+    assert ns.seen == {"q0", "q1", "q2"}
+    assert len(ns.recent) == Config.TUTOR_HISTORY_SIZE and ns.recent[-1] == "dynamic"
+
+
+def test_legacy_history_is_upgraded():
+    history = [f"q{i}" for i in range(Config.TUTOR_HISTORY_SIZE + 10)]
+    ns = UserSkillState.model_validate({"node_id": "leaf", "attempts": len(history), "history": history})
+    assert ns.seen == set(history)
+    assert ns.recent == history[-Config.TUTOR_HISTORY_SIZE:]
+    assert "history" not in ns.model_dump()
+
+
+def test_replay_matches_live_grading():
+    events = [AnswerEvent(question_id=f"q{i}", node_id="leaf", is_correct=i != 1,
+                          difficulty=Difficulty.ADVANCED, timestamp=float(i)) for i in range(5)]
+    state = SessionState(user_id="learner", current_topic="topic")
+    for event in events:
+        state.apply_answer(event)
+
+    ns = state.node_states["leaf"]
+    assert (ns.attempts, ns.correct_count, ns.correct_streak) == (5, 4, 3)
+    assert ns.recent == [e.question_id for e in events]
+    assert state.coverage_map.get("leaf") is True and state.active_node_id is None
@@ -0,0 +1,71 @@
+import zlib
+
+import pytest
+
+from src.core.kb_view import NodeTable
+from src.core.schema import SessionState, UserSkillState
+from src.core.session_codec import CompactSessionState, NodeTableRegistry
+
+TABLE = NodeTable(["root", "a", "b", "c", "d", "e", "f", "g", "h"])
+
+
+def _session() -> SessionState:
+    return SessionState(
+        user_id="learner",
+        current_topic="topic",
+        node_states={
+            "a": UserSkillState(node_id="a", mastery_score=0.75, attempts=7, correct_streak=3, correct_count=5,
+                                seen={"q1", "q2"}, recent=["q1", "q2", "q1"]),
+            "h": UserSkillState(node_id="h", attempts=1),
+            # From an older ingestion of the topic: not in the table
+            "gone": UserSkillState(node_id="gone", attempts=2, seen={"q9"}, recent=["q9"]),
+        },
+        active_node_id="h",
+        coverage_map={"a": True, "b": True, "g": True, "c": False, "gone": True},
+    )
+
+
+def test_round_trip_is_lossless():
+    state = _session()
+    blob = CompactSessionState.from_session(state, TABLE).to_bytes()
+    assert CompactSessionState.fingerprint_of(blob) == TABLE.fingerprint
+
+    restored = CompactSessionState.from_bytes(blob, TABLE).to_session()
+    assert restored == state
+    assert restored.model_dump(mode="json") == state.model_dump(mode="json")
+
+    # An active node the table doesn't know survives too
+    state.active_node_id = "gone"
+    assert CompactSessionState.from_bytes(
+        CompactSessionState.from_session(state, TABLE).to_bytes(), TABLE
+    ).to_session().active_node_id == "gone"
+
+
+def test_arrays_have_fixed_widths():
+    compact = CompactSessionState.from_session(_session(), TABLE)
+    assert compact.is_covered(TABLE.index_of("g")) and not compact.is_covered(TABLE.index_of("c"))
+
+    blob = compact.to_bytes()
+    body = zlib.decompress(blob[4 + 16:])
+    header_len = int.from_bytes(body[:4], "little")
+    n = len(TABLE)
+    # Two bitsets, three u32 arrays and one f64 array per node, whatever the platform's C int/long
+    assert len(body) == 4 + header_len + 2 * ((n + 7) // 8) + (3 * 4 + 8) * n
+
+
+def test_rejects_other_tables_and_foreign_blobs():
+    blob = CompactSessionState.from_session(_session(), TABLE).to_bytes()
+    with pytest.raises(ValueError):
+        CompactSessionState.from_bytes(blob, NodeTable(TABLE.ids + ["new"]))
+    with pytest.raises(ValueError):
+        CompactSessionState.fingerprint_of(b"SPS1" + blob[4:])
+
+
+def test_registry_keeps_tables_for_decoding(tmp_path):
+    NodeTableRegistry(str(tmp_path)).register(TABLE)
+    blob = CompactSessionState.from_session(_session(), TABLE).to_bytes()
+
+    # A fresh process finds the table on disk by the blob's fingerprint
+    table = NodeTableRegistry(str(tmp_path)).get(CompactSessionState.fingerprint_of(blob))
+    assert table.ids == TABLE.ids
+    assert CompactSessionState.from_bytes(blob, table).to_session() == _session()
@@ -0,0 +1,174 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import pytest
+
+from src.core.schema import AnswerEvent, Difficulty, SessionState, UserSkillState
+from src.core.session_store import EventLogSessionStore, SQLiteSessionStore
+
+
+def _event(question_id: str, node_id: str = "leaf-a", is_correct: bool = True) -> AnswerEvent:
+    return AnswerEvent(question_id=question_id, node_id=node_id, is_correct=is_correct,
+                       difficulty=Difficulty.INTERMEDIATE, timestamp=0.0)
+
+
+def _new_session() -> SessionState:
+    return SessionState(user_id="learner", current_topic="topic")
+
+
+@pytest.fixture
+def stores(tmp_path):
+    """Two stores over the same directory, standing in for two workers."""
+    return (EventLogSessionStore(str(tmp_path), snapshot_every=7, snapshot_format="json"),
+            EventLogSessionStore(str(tmp_path), snapshot_every=7, snapshot_format="json"))
+
+
+def test_concurrent_appends_from_two_stores_are_all_kept(stores):
+    first, second = stores
+    first.save("s", _new_session())
+
+    def answer(store, prefix):
+        for i in range(30):
+            store.append("s", _event(f"{prefix}{i}", node_id=f"leaf-{prefix}", is_correct=i % 2 == 0))
+
+    threads = [threading.Thread(target=answer, args=(store, prefix))
+               for store, prefix in ((first, "a"), (second, "b"), (first, "c"), (second, "d"))]
+    for t in threads: t.start()
+    for t in threads: t.join()
+
+    # Compactions ran on both stores meanwhile; a fresh load from either sees every answer
+    for store in stores:
+        state = store.load("s")
+        assert sorted(state.node_states) == ["leaf-a", "leaf-b", "leaf-c", "leaf-d"]
+        for ns in state.node_states.values():
+            assert (ns.attempts, ns.correct_count, len(ns.seen)) == (30, 15, 30)
+
+
+def test_stale_revision_is_reported_and_refresh_catches_up(stores):
+    first, second = stores
+    revision = first.save("s", _new_session())
+    assert first.revision("s") == second.revision("s") == revision
+
+    revision = first.append("s", _event("q1"), base_revision=revision)
+    assert revision is not None and second.revision("s") == revision
+
+    # Another worker writes in between: the first store's copy is now stale
+    assert second.append("s", _event("q2"), base_revision=revision) is not None
+    assert first.append("s", _event("q3"), base_revision=revision) is None
+    assert first.revision("s") != revision
+
+    refreshed = first.load("s")
+    assert refreshed.node_states["leaf-a"].recent == ["q1", "q2", "q3"]
+
+
+def test_torn_final_line_is_dropped(stores):
+    store, _ = stores
+    store.save("s", _new_session())
+    store.append("s", _event("q1"))
+    with open(store.log_path("s"), "a") as f:
+        f.write('{"question_id": "q2", "node_')
+    assert store.load("s").node_states["leaf-a"].recent == ["q1"]
+
+
+def test_save_drops_logged_events(stores):
+    store, _ = stores
+    store.save("s", _new_session())
+    store.append("s", _event("q1"))
+    store.save("s", _new_session())
+    assert store.load("s").node_states == {}
+    assert store.load("missing") is None and store.revision("missing") is None
+
+
+@pytest.fixture
+def db_stores(tmp_path):
+    """Two SQLite stores over the same database, standing in for two workers."""
+    path = str(tmp_path / "sessions.db")
+    return SQLiteSessionStore(path), SQLiteSessionStore(path)
+
+
+def test_sqlite_concurrent_appends_and_revisions(db_stores):
+    first, second = db_stores
+    for i in range(4):
+        first.save(f"s{i}", _new_session())
+    revisions = {f"s{i}": first.revision(f"s{i}") for i in range(4)}
+
+    def answer(store, session_id, prefix):
+        for i in range(25):
+            store.append(session_id, _event(f"{prefix}{i}", is_correct=i % 5 != 0))
+
+    threads = [threading.Thread(target=answer, args=(store, f"s{i}", f"{prefix}-"))
+               for i in range(4) for store, prefix in ((first, "x"), (second, "y"))]
+    for t in threads: t.start()
+    for t in threads: t.join()
+
+    for i in range(4):
+        for store in db_stores:
+            ns = store.load(f"s{i}").node_states["leaf-a"]
+            assert (ns.attempts, ns.correct_count, len(ns.seen)) == (50, 40, 50)
+        # Every append bumped the revision, whichever store wrote it
+        assert int(second.revision(f"s{i}")) == int(revisions[f"s{i}"]) + 50
+
+
+def test_sqlite_stale_revision_and_unknown_session(db_stores):
+    first, second = db_stores
+    revision = first.save("s", _new_session())
+    revision = first.append("s", _event("q1"), base_revision=revision)
+    assert revision == second.revision("s")
+    assert second.append("s", _event("q2"), base_revision=revision) is not None
+    assert first.append("s", _event("q3"), base_revision=revision) is None
+    assert first.load("s").node_states["leaf-a"].recent == ["q1", "q2", "q3"]
+
+    with pytest.raises(KeyError):
+        first.append("missing", _event("q1"))
+
+
+def test_sqlite_appends_queued_meanwhile_share_one_commit(db_stores, monkeypatch):
+    store, _ = db_stores
+    store.save("s", _new_session())
+
+    transactions = []
+    original = store._transaction
+
+    @contextmanager
+    def counted():
+        transactions.append(1)
+        with original() as conn:
+            yield conn
+    monkeypatch.setattr(store, "_transaction", counted)
+
+    def wait_for(condition):
+        deadline = time.time() + 5
+        while not condition() and time.time() < deadline:
+            time.sleep(0.01)
+
+    # Another writer holds the database: the first append blocks in BEGIN IMMEDIATE...
+    blocker = sqlite3.connect(store.db_path, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    threads = [threading.Thread(target=store.append, args=("s", _event(f"q{i}"))) for i in range(10)]
+    threads[0].start()
+    wait_for(lambda: transactions)
+    # ...and the other nine queue up behind it
+    for t in threads[1:]: t.start()
+    wait_for(lambda: store._appends.qsize() == 9)
+    blocker.execute("ROLLBACK")
+    blocker.close()
+    for t in threads: t.join()
+
+    assert len(transactions) == 2
+    assert store.load("s").node_states["leaf-a"].attempts == 10
+
+
+def test_sqlite_save_keeps_adopted_history_out_of_attempts(db_stores):
+    store, _ = db_stores
+    state = _new_session()
+    state.node_states["leaf-a"] = UserSkillState(node_id="leaf-a", attempts=3, correct_count=2,
+                                                 seen={"q1", "q2"}, recent=["q1", "q2", "q1"])
+    store.save("s", state)
+    count = store._conn().execute("SELECT COUNT(*) FROM attempts WHERE session_id = ?", ("s",)).fetchone()
+    assert count == (0,)
+
+    store.append("s", _event("q3"))
+    ns = store.load("s").node_states["leaf-a"]
+    assert (ns.attempts, ns.seen, ns.recent) == (4, {"q1", "q2", "q3"}, ["q1", "q2", "q1", "q3"])
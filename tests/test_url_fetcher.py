@@ -0,0 +1,94 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.core.url_fetcher import UrlFetcher
+
+PAGE = b"<html><body><p>Hello from the stand-in server.</p><script>ignored()</script></body></html>"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Serves /page (with an ETag) and /drip (a body that arrives too slowly)."""
+    etag = '"v1"'
+    drip_delay = 0.0
+
+    def do_GET(self):
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = PAGE
+        if self.path == "/missing":
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("ETag", self.etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.path == "/drip":
+            for i in range(len(body)):
+                self.wfile.write(body[i:i + 1])
+                self.wfile.flush()
+                time.sleep(type(self).drip_delay)
+        else:
+            self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    _Handler.drip_delay = 0.0
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_fetch_extracts_text_and_revalidates(server, tmp_path):
+    fetcher = UrlFetcher(cache_dir=str(tmp_path))
+    first = fetcher.fetch(f"{server}/page")
+    assert "Hello from the stand-in server." in first
+    assert "ignored()" not in first
+    # Cached with its ETag: the refetch is a 304 served from the cache
+    assert fetcher.fetch(f"{server}/page") == first
+
+
+def test_body_cut_by_deadline_is_not_cached(server, tmp_path):
+    _Handler.drip_delay = 0.01 # ~0.9s for the whole body
+    fetcher = UrlFetcher(cache_dir=str(tmp_path), timeout=0.3)
+    assert fetcher.fetch(f"{server}/drip") == ""
+    assert not list(tmp_path.iterdir())
+
+    # Once the server is fast again, the full page comes back (not a 304 on a truncated copy)
+    _Handler.drip_delay = 0.0
+    assert "Hello from the stand-in server." in fetcher.fetch(f"{server}/drip")
+
+
+def test_failure_falls_back_to_last_good_copy(server, tmp_path):
+    fetcher = UrlFetcher(cache_dir=str(tmp_path), timeout=0.3)
+    good = fetcher.fetch(f"{server}/drip")
+    assert "Hello from the stand-in server." in good
+
+    # The page changed (new ETag) but now arrives too slowly: keep serving the last good copy
+    _Handler.etag = '"v2"'
+    _Handler.drip_delay = 0.01
+    try:
+        assert fetcher.fetch(f"{server}/drip") == good
+    finally:
+        _Handler.etag = '"v1"'
+    assert fetcher.fetch(f"{server}/missing") == ""
+
+
+def test_fetch_all_dedupes_and_keeps_order(server, tmp_path):
+    fetcher = UrlFetcher(cache_dir=None)
+    urls = [f"{server}/page", f"{server}/missing", f"{server}/page"]
+    texts = fetcher.fetch_all(urls)
+    assert list(texts) == [f"{server}/page", f"{server}/missing"]
+    assert "Hello" in texts[f"{server}/page"] and texts[f"{server}/missing"] == ""